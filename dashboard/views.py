@@ -1,16 +1,21 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count, Sum, Avg
-from django.db.models.functions import TruncMonth, TruncDay
+from django.db.models import Count, Sum, Avg, F, Q
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
 from orders.models import Order
 from marketplace.models import Product
 from inventory.models import Inventory
-from payments.models import PaymentTransaction
+from payments.fx import converted, rate_expression, reporting_currency, unrated
+from payments.models import RevenueRollup
 from users.models import User
 
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_summary(request):
@@ -20,25 +25,26 @@ def dashboard_summary(request):
 
     # Orders metrics
     total_orders = Order.objects.count()
-    recent_orders = Order.objects.filter(created_at__date__gte=thirty_days_ago).count()
+    recent_orders = Order.objects.filter(created_at__gte=_start_of_day(thirty_days_ago)).count()
     pending_orders = Order.objects.filter(status='pending').count()
     completed_orders = Order.objects.filter(status='delivered').count()
 
-    # Revenue metrics
-    total_revenue = PaymentTransaction.objects.filter(status='completed').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-
-    recent_revenue = PaymentTransaction.objects.filter(
-        status='completed',
-        created_at__date__gte=thirty_days_ago
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Revenue metrics, read from the daily rollups (see payments/rollups.py) in the reporting currency
+    total_revenue = RevenueRollup.objects.aggregate(total=Sum(converted('completed_amount')))['total'] or 0
+    recent_revenue = RevenueRollup.objects.filter(
+        day__gte=thirty_days_ago
+    ).aggregate(total=Sum(converted('completed_amount')))['total'] or 0
+    # Currencies without a loaded rate are missing from both totals
+    unconverted_currencies = sorted(
+        unrated(RevenueRollup.objects.all()).values_list('currency', flat=True).distinct().order_by()
+    )
 
     # Product metrics
     total_products = Product.objects.count()
     active_products = Product.objects.filter(is_active=True).count()
+    # available_quantity is a property (quantity - reserved_quantity), so compare the columns
     low_stock_products = Inventory.objects.filter(
-        available_quantity__lte=models.F('low_stock_threshold')
+        quantity__lte=F('reserved_quantity') + F('low_stock_threshold')
     ).count()
 
     # User metrics
@@ -54,7 +60,9 @@ def dashboard_summary(request):
         },
         'revenue': {
             'total': total_revenue,
-            'recent': recent_revenue
+            'recent': recent_revenue,
+            'currency': reporting_currency(),
+            'unconverted_currencies': unconverted_currencies
         },
         'products': {
             'total': total_products,
@@ -70,37 +78,51 @@ def dashboard_summary(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def sales_reports(request):
-    """Get sales reports with filtering options"""
+    """Get sales reports with filtering options; amounts are converted to the reporting currency"""
     period = request.query_params.get('period', 'monthly')
     start_date = request.query_params.get('start_date')
     end_date = request.query_params.get('end_date')
 
-    queryset = PaymentTransaction.objects.filter(status='completed')
+    queryset = RevenueRollup.objects.all()
 
     if start_date and end_date:
-        queryset = queryset.filter(created_at__date__gte=start_date, created_at__date__lte=end_date)
+        queryset = queryset.filter(day__gte=parse_date(str(start_date)), day__lte=parse_date(str(end_date)))
 
     if period == 'monthly':
-        data = queryset.annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            total_sales=Sum('amount'),
-            order_count=Count('id')
-        ).order_by('month')
+        group = 'month'
+        queryset = queryset.annotate(month=TruncMonth('day'))
     elif period == 'daily':
-        data = queryset.annotate(
-            day=TruncDay('created_at')
-        ).values('day').annotate(
-            total_sales=Sum('amount'),
-            order_count=Count('id')
-        ).order_by('day')
+        group = 'day'
+    else:
+        group = 'gateway'
+
+    # Totals per group and currency in one query; rows in a currency without a
+    # loaded rate are left out of total_sales and their currency is listed instead
+    rows = queryset.annotate(fx_rate=rate_expression()).values(group, 'currency').annotate(
+        total_sales=Sum(converted('completed_amount')),
+        order_count=Sum('completed_count'),
+        unrated=Count('id', filter=Q(fx_rate__isnull=True))
+    ).order_by()
+    groups = {}
+    for row in rows:
+        entry = groups.setdefault(row[group], {
+            group: row[group], 'total_sales': None, 'order_count': 0, 'unconverted_currencies': []
+        })
+        entry['order_count'] += row['order_count']
+        if row['total_sales'] is not None:
+            entry['total_sales'] = (entry['total_sales'] or 0) + row['total_sales']
+        if row['unrated']:
+            entry['unconverted_currencies'].append(row['currency'])
+
+    data = list(groups.values())
+    for entry in data:
+        entry['unconverted_currencies'].sort()
+    if group == 'gateway':
+        data.sort(key=lambda entry: (entry['total_sales'] is None, -(entry['total_sales'] or 0)))
     else:
-        data = queryset.values('gateway').annotate(
-            total_sales=Sum('amount'),
-            order_count=Count('id')
-        ).order_by('-total_sales')
+        data.sort(key=lambda entry: entry[group])
 
-    return Response(list(data))
+    return Response(data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -110,7 +132,7 @@ def inventory_reports(request):
 
     if report_type == 'low_stock':
         data = Inventory.objects.select_related('product', 'warehouse').filter(
-            available_quantity__lte=models.F('low_stock_threshold')
+            available_quantity__lte=F('low_stock_threshold')
         ).values(
             'product__name', 'product__sku', 'warehouse__name',
             'quantity', 'available_quantity', 'low_stock_threshold'
@@ -128,7 +150,7 @@ def inventory_reports(request):
             'total_products': Inventory.objects.values('product').distinct().count(),
             'total_quantity': Inventory.objects.aggregate(total=Sum('quantity'))['total'] or 0,
             'low_stock_alerts': Inventory.objects.filter(
-                available_quantity__lte=models.F('low_stock_threshold')
+                available_quantity__lte=F('low_stock_threshold')
             ).count(),
             'out_of_stock': Inventory.objects.filter(quantity=0).count()
         }
@@ -238,7 +238,7 @@ const SellerCommissionTracking: React.FC<SellerCommissionTrackingProps> = ({ sel
                     </Typography>
                   </TableCell>
                   <TableCell>
-                    {commission.commission_rate}%
+                    {(commission.commission_rate * 100).toFixed(2)}%
                   </TableCell>
                   <TableCell align="right">
                     <Typography variant="body1" fontWeight="bold" color="success.main">
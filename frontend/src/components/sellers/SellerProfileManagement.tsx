@@ -251,7 +251,7 @@ const SellerProfileManagement: React.FC<SellerProfileManagementProps> = ({ selle
             <TextField
               fullWidth
               label="Commission Rate"
-              value={`${currentSeller.commission_rate}%`}
+              value={`${(currentSeller.commission_rate * 100).toFixed(2)}%`}
               disabled
             />
           </Grid>
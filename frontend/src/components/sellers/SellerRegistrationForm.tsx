@@ -72,7 +72,8 @@ const SellerRegistrationForm: React.FC = () => {
     if (!validateForm()) return;
 
     try {
-      await dispatch(registerSeller(formData));
+      // The form takes a percentage; the API stores the rate as a fraction
+      await dispatch(registerSeller({ ...formData, commission_rate: formData.commission_rate / 100 }));
       // Reset form on success
       setFormData({
         business_name: '',
@@ -228,7 +228,7 @@ const SellerVerificationWorkflow: React.FC = () => {
                       size="small"
                     />
                   </TableCell>
-                  <TableCell>{seller.commission_rate}%</TableCell>
+                  <TableCell>{(seller.commission_rate * 100).toFixed(2)}%</TableCell>
                   <TableCell>
                     {new Date(seller.created_at).toLocaleDateString()}
                   </TableCell>
@@ -337,7 +337,7 @@ const SellerVerificationWorkflow: React.FC = () => {
                     <ListItem>
                       <ListItemText
                         primary="Commission Rate"
-                        secondary={`${currentSeller.commission_rate}%`}
+                        secondary={`${(currentSeller.commission_rate * 100).toFixed(2)}%`}
                       />
                     </ListItem>
                     <ListItem>
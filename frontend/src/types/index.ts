@@ -334,6 +334,7 @@ export interface Seller {
   tax_id?: string;
   verification_status: 'pending' | 'verified' | 'rejected';
   verification_documents: SellerDocument[];
+  // Fraction of the gross, e.g. 0.1 for 10%
   commission_rate: number;
   total_sales: number;
   total_revenue: number;
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'payments',
     'marketplace',
     'dashboard',
+    'returns',
 ]
 
 MIDDLEWARE = [
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     'payments',
     'marketplace',
     'dashboard',
+    'returns',
 ]
 
 MIDDLEWARE = [
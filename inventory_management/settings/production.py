@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 from datetime import timedelta
@@ -35,6 +36,7 @@ INSTALLED_APPS = [
     'payments',
     'marketplace',
     'dashboard',
+    'returns',
 ]
 
 MIDDLEWARE = [
@@ -117,6 +119,27 @@ if os.environ.get('AWS_STORAGE_BUCKET_NAME'):
     STATIC_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/static/'
     STATICFILES_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
+# Cold-order archive storage (see orders/archive.py); any S3-compatible endpoint works
+if os.environ.get('ORDER_ARCHIVE_BUCKET'):
+    ORDER_ARCHIVE_STORAGE = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('ORDER_ARCHIVE_BUCKET'),
+            'endpoint_url': os.environ.get('ORDER_ARCHIVE_ENDPOINT_URL'),
+            'default_acl': 'private',
+            'file_overwrite': False,
+        },
+    }
+else:
+    ORDER_ARCHIVE_STORAGE = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': BASE_DIR / 'archive'},
+    }
+
+# Order numbers are reserved from the database in blocks per worker process
+ORDER_NUMBER_PREFIX = os.environ.get('ORDER_NUMBER_PREFIX', 'ORD')
+ORDER_NUMBER_BLOCK_SIZE = int(os.environ.get('ORDER_NUMBER_BLOCK_SIZE', 100))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -290,6 +313,91 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Label batches start a process pool, which Celery's daemonic prefork children
+# cannot; their queue is served by a --pool=solo worker (see docker-compose.yml)
+CELERY_TASK_ROUTES = {
+    'shipping.tasks.render_label_document': {'queue': 'labels'},
+}
+CELERY_BEAT_SCHEDULE = {
+    'poll-carrier-tracking': {
+        'task': 'shipping.tasks.poll_carrier_tracking',
+        'schedule': int(os.environ.get('SHIPPING_TRACKING_POLL_INTERVAL', 900)),
+    },
+    'settle-seller-commissions': {
+        'task': 'marketplace.tasks.settle_seller_commissions',
+        'schedule': 24 * 60 * 60,
+    },
+    'process-webhook-inbox': {
+        'task': 'payments.tasks.process_webhook_inbox',
+        'schedule': int(os.environ.get('PAYMENT_WEBHOOK_PROCESS_INTERVAL', 5)),
+    },
+}
+
+# A running commission run whose worker has not written for this long is
+# taken over by the next settlement (seconds, see marketplace/commissions.py)
+COMMISSION_RUN_STALE_AFTER = int(os.environ.get('COMMISSION_RUN_STALE_AFTER', 3600))
+
+# Payment gateway clients (see payments/gateways.py), e.g.
+# {'stripe': {'GATEWAY': 'payments.gateways.HTTPGateway',
+#             'OPTIONS': {'endpoint': ..., 'api_key': ..., 'timeout': 5}}}
+PAYMENT_GATEWAYS = json.loads(os.environ.get('PAYMENT_GATEWAYS', '{}'))
+PAYMENT_DEFAULT_GATEWAY = os.environ.get('PAYMENT_DEFAULT_GATEWAY') or None
+
+# Currency revenue reports are converted to (see payments/fx.py)
+REPORTING_CURRENCY = os.environ.get('REPORTING_CURRENCY', 'USD')
+
+# Gateway webhook signing secrets (POST /api/payments/webhooks/<gateway>/)
+PAYMENT_WEBHOOK_SECRETS = {
+    'stripe': os.environ.get('STRIPE_WEBHOOK_SECRET', ''),
+    'paypal': os.environ.get('PAYPAL_WEBHOOK_SECRET', ''),
+}
+# Events for payments not recorded yet are retried, then marked missing (seconds)
+PAYMENT_WEBHOOK_RETRY_DELAY = int(os.environ.get('PAYMENT_WEBHOOK_RETRY_DELAY', 30))
+PAYMENT_WEBHOOK_MISSING_AFTER = int(os.environ.get('PAYMENT_WEBHOOK_MISSING_AFTER', 3600))
+
+# Carrier tracking adapters (see shipping/carriers.py), e.g.
+# {'ups': {'ADAPTER': 'shipping.carriers.HTTPCarrierAdapter',
+#          'OPTIONS': {'endpoint': ..., 'rate_limit': 10}}}
+SHIPPING_CARRIER_ADAPTERS = json.loads(os.environ.get('SHIPPING_CARRIER_ADAPTERS', '{}'))
+SHIPPING_DEFAULT_CARRIER_ADAPTER = os.environ.get('SHIPPING_DEFAULT_CARRIER_ADAPTER') or None
+
+# Public tracking lookups (GET /api/shipping/track/<number>/)
+SHIPPING_TRACKING_LOOKUP_RATE = os.environ.get('SHIPPING_TRACKING_LOOKUP_RATE', '60/min')
+SHIPPING_TRACKING_MAX_AGE = int(os.environ.get('SHIPPING_TRACKING_MAX_AGE', 60))
+
+# Shipping labels: batches above the sync limit are rendered by Celery into label storage
+SHIPPING_LABEL_SYNC_LIMIT = int(os.environ.get('SHIPPING_LABEL_SYNC_LIMIT', 100))
+SHIPPING_LABEL_WORKERS = int(os.environ.get('SHIPPING_LABEL_WORKERS', 0)) or None
+if os.environ.get('SHIPPING_LABEL_BUCKET'):
+    SHIPPING_LABEL_STORAGE = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('SHIPPING_LABEL_BUCKET'),
+            'default_acl': 'private',
+            'file_overwrite': False,
+        },
+    }
+else:
+    SHIPPING_LABEL_STORAGE = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': BASE_DIR / 'labels'},
+    }
+
+# Dispute evidence files; only their storage keys are kept in the database
+if os.environ.get('DISPUTE_EVIDENCE_BUCKET'):
+    DISPUTE_EVIDENCE_STORAGE = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('DISPUTE_EVIDENCE_BUCKET'),
+            'default_acl': 'private',
+            'file_overwrite': False,
+        },
+    }
+else:
+    DISPUTE_EVIDENCE_STORAGE = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': BASE_DIR / 'evidence'},
+    }
 
 # Monitoring
 if os.environ.get('SENTRY_DSN'):
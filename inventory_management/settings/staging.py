@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'payments',
     'marketplace',
     'dashboard',
+    'returns',
 ]
 
 MIDDLEWARE = [
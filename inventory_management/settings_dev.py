@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     'payments',
     'marketplace',
     'dashboard',
+    'returns',
 ]
 
 MIDDLEWARE = [
@@ -195,8 +196,53 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        # Gateway client connection traces (see payments/gateways.py)
+        'httpcore': {
+            'level': 'WARNING',
+        },
+        'httpx': {
+            'level': 'WARNING',
+        },
     },
 }
 
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
+
+# Cold-order archive storage (see orders/archive.py)
+ORDER_ARCHIVE_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': BASE_DIR.parent / 'archive'},
+}
+
+# Carrier tracking adapters (see shipping/carriers.py); locally every carrier is faked
+SHIPPING_CARRIER_ADAPTERS = {}
+SHIPPING_DEFAULT_CARRIER_ADAPTER = 'shipping.carriers.FakeCarrierAdapter'
+
+# Currency revenue reports are converted to (see payments/fx.py)
+REPORTING_CURRENCY = 'USD'
+
+# Gateway webhook signing secrets (see payments/webhooks.py)
+PAYMENT_WEBHOOK_SECRETS = {
+    'stripe': os.environ.get('STRIPE_WEBHOOK_SECRET', 'whsec_dev'),
+    'paypal': os.environ.get('PAYPAL_WEBHOOK_SECRET', 'paypal-webhook-dev'),
+}
+
+# Payment gateway clients (see payments/gateways.py); locally every gateway is stubbed
+PAYMENT_GATEWAYS = {}
+PAYMENT_DEFAULT_GATEWAY = 'payments.gateways.StubGateway'
+
+# Dispute evidence files (see payments/disputes.py)
+DISPUTE_EVIDENCE_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': BASE_DIR.parent / 'evidence'},
+}
+
+# Rendered shipping label batches (see shipping/labels.py)
+SHIPPING_LABEL_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': BASE_DIR.parent / 'labels'},
+}
+
+# SQLite ignores the INCLUDE columns of covering indexes; PostgreSQL uses them
+SILENCED_SYSTEM_CHECKS = ['models.W040']
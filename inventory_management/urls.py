@@ -27,4 +27,5 @@ urlpatterns = [
     path('api/payments/', include('payments.urls')),
     path('api/marketplace/', include('marketplace.urls')),
     path('api/dashboard/', include('dashboard.urls')),
+    path('api/returns/', include('returns.urls')),
 ]
@@ -0,0 +1,174 @@
+"""
+Seller commission settlement.
+
+A CommissionRun settles one period (inclusive dates). Order lines count once
+their shipment is delivered within the period and belong to the seller of
+their product. Lines of cancelled or refunded orders do not count. Seller
+commission rates are fractions of the gross (0.10 for 10%).
+
+Per-seller totals come from one aggregate query per run, ordered by seller
+and streamed in batches. Each batch is written in one transaction: the
+SellerStatements (a multi-row INSERT), their commission journal entries (see
+payments.ledger) and the run's checkpoint, the last settled seller id. A
+run that fails or is interrupted resumes after its checkpoint; a completed
+run is not settled again, and a period overlapping another run's is refused,
+so no line is settled twice. A run another worker is settling (its
+heartbeat_at, refreshed by every batch, is younger than
+COMMISSION_RUN_STALE_AFTER seconds) is returned as is instead of being
+settled twice in parallel.
+"""
+
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.utils import timezone
+
+from payments.ledger import LedgerWriter, sales_account
+from shipping.models import ShipmentLine
+
+from .models import CommissionRun, SellerStatement
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_STALE_AFTER = 3600
+CENT = Decimal('0.01')
+EXCLUDED_ORDER_STATUSES = ['cancelled', 'refunded']
+
+
+class CommissionError(Exception):
+    pass
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def previous_month(today=None):
+    """(first day, last day) of the month before today"""
+    first_of_month = (today or timezone.localdate()).replace(day=1)
+    last = first_of_month - timedelta(days=1)
+    return last.replace(day=1), last
+
+
+def seller_totals(period_start, period_end, after_seller_id=0):
+    """Delivered line count and gross amount per seller, in seller order"""
+    return ShipmentLine.objects.filter(
+        shipment__status='delivered',
+        shipment__delivered_at__gte=_start_of_day(period_start),
+        shipment__delivered_at__lt=_start_of_day(period_end + timedelta(days=1)),
+        order_item__product__seller_id__gt=after_seller_id,
+    ).exclude(
+        order_item__order__status__in=EXCLUDED_ORDER_STATUSES
+    ).values(
+        seller=F('order_item__product__seller_id'),
+        commission_rate=F('order_item__product__seller__commission_rate'),
+    ).annotate(
+        line_count=Count('id'),
+        gross_amount=Sum(
+            F('quantity') * F('order_item__unit_price'), output_field=DecimalField(max_digits=16, decimal_places=2)
+        ),
+    ).order_by('seller')
+
+
+def seller_payable_account(seller_id, currency):
+    return (f'liability:seller:{seller_id}:{currency}', f'Payable to seller {seller_id}', 'liability', currency)
+
+
+def commission_account(currency):
+    return (f'revenue:commissions:{currency}', 'Marketplace commissions', 'revenue', currency)
+
+
+def _write_batch(run, rows):
+    """Write one batch of statements and ledger entries and advance the checkpoint"""
+    currency = getattr(settings, 'MARKETPLACE_COMMISSION_CURRENCY', 'USD')
+    statements = []
+    for row in rows:
+        gross = Decimal(row['gross_amount']).quantize(CENT, ROUND_HALF_UP)
+        commission = (gross * row['commission_rate']).quantize(CENT, ROUND_HALF_UP)
+        # Rates are fractions of the gross; a seller is never owed less than nothing
+        if not 0 <= row['commission_rate'] <= 1 or commission > gross:
+            raise CommissionError(f"Seller {row['seller']} has commission rate {row['commission_rate']}, not 0 to 1")
+        statements.append(SellerStatement(
+            run=run,
+            seller_id=row['seller'],
+            period_start=run.period_start,
+            period_end=run.period_end,
+            line_count=row['line_count'],
+            gross_amount=gross,
+            commission_rate=row['commission_rate'],
+            commission_amount=commission,
+            net_amount=gross - commission,
+        ))
+
+    with transaction.atomic():
+        SellerStatement.objects.bulk_create(statements)
+        # Sales collected for sellers move to what we owe them, less our commission
+        with LedgerWriter(batch_size=len(statements) + 1) as ledger:
+            for statement in statements:
+                ledger.add('commission', [
+                    (sales_account(currency), statement.gross_amount),
+                    (seller_payable_account(statement.seller_id, currency), -statement.net_amount),
+                    (commission_account(currency), -statement.commission_amount),
+                ], reference=f'commission-run:{run.id}:{statement.seller_id}')
+        CommissionRun.objects.filter(pk=run.pk).update(
+            heartbeat_at=timezone.now(),
+            checkpoint_seller_id=statements[-1].seller_id,
+            seller_count=F('seller_count') + len(statements),
+            line_count=F('line_count') + sum(statement.line_count for statement in statements),
+            gross_amount=F('gross_amount') + sum(statement.gross_amount for statement in statements),
+            commission_amount=F('commission_amount') + sum(statement.commission_amount for statement in statements),
+        )
+    run.checkpoint_seller_id = statements[-1].seller_id
+
+
+def settle_commissions(period_start, period_end, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Settle a period, resuming an earlier run of it from its checkpoint. A run
+    that is completed or still being settled elsewhere is returned unchanged.
+    """
+    if isinstance(period_start, str):
+        period_start, period_end = date.fromisoformat(period_start), date.fromisoformat(period_end)
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'COMMISSION_RUN_STALE_AFTER', DEFAULT_STALE_AFTER))
+    with transaction.atomic():
+        overlapping = CommissionRun.objects.select_for_update().filter(
+            period_start__lte=period_end, period_end__gte=period_start
+        ).exclude(period_start=period_start, period_end=period_end).order_by('period_start').first()
+        if overlapping is not None:
+            raise CommissionError(
+                f"{period_start} - {period_end} overlaps the run for "
+                f"{overlapping.period_start} - {overlapping.period_end}"
+            )
+        run, created = CommissionRun.objects.get_or_create(
+            period_start=period_start, period_end=period_end, defaults={'heartbeat_at': now}
+        )
+        if not created:
+            # Claim the run under its row lock, so only one worker settles it
+            run = CommissionRun.objects.select_for_update().get(pk=run.pk)
+            if run.status == 'completed':
+                return run
+            if run.status == 'running' and run.heartbeat_at and run.heartbeat_at >= stale_before:
+                return run
+            run.status = 'running'
+            run.error = ''
+            run.heartbeat_at = now
+            run.save(update_fields=['status', 'error', 'heartbeat_at'])
+
+    batch = []
+    try:
+        for row in seller_totals(period_start, period_end, run.checkpoint_seller_id).iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _write_batch(run, batch)
+                batch = []
+        if batch:
+            _write_batch(run, batch)
+    except Exception as exc:
+        CommissionRun.objects.filter(pk=run.pk).update(status='failed', error=str(exc))
+        raise
+
+    CommissionRun.objects.filter(pk=run.pk).update(status='completed', completed_at=timezone.now())
+    run.refresh_from_db()
+    return run
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from marketplace.commissions import DEFAULT_BATCH_SIZE, CommissionError, previous_month, settle_commissions
+
+
+class Command(BaseCommand):
+    help = 'Settle seller commissions for a period, resuming an interrupted run from its checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day of the period (YYYY-MM-DD, default: first day of last month)')
+        parser.add_argument('--end', help='Last day of the period (YYYY-MM-DD, default: last day of last month)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Sellers written per transaction')
+
+    def handle(self, *args, **options):
+        if bool(options['start']) != bool(options['end']):
+            raise CommandError('Pass both --start and --end, or neither')
+        if options['start']:
+            period_start, period_end = parse_date(options['start']), parse_date(options['end'])
+            if period_start is None or period_end is None or period_end < period_start:
+                raise CommandError('Invalid period')
+        else:
+            period_start, period_end = previous_month()
+
+        try:
+            run = settle_commissions(period_start, period_end, batch_size=options['batch_size'])
+        except CommissionError as exc:
+            raise CommandError(str(exc))
+        if run.status == 'running':
+            self.stdout.write(f"{run.period_start} - {run.period_end} is being settled by another worker")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Settled {run.period_start} - {run.period_end}: {run.seller_count} sellers, {run.line_count} lines, "
+            f"{run.gross_amount} gross, {run.commission_amount} commission"
+        ))
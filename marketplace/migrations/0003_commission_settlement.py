@@ -0,0 +1,61 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='marketplace.seller'),
+        ),
+        migrations.CreateModel(
+            name='CommissionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('checkpoint_seller_id', models.IntegerField(default=0)),
+                ('seller_count', models.PositiveIntegerField(default=0)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('commission_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+                'constraints': [models.UniqueConstraint(fields=('period_start', 'period_end'), name='commission_run_period_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SellerStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('line_count', models.PositiveIntegerField()),
+                ('gross_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('commission_rate', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('commission_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('net_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statements', to='marketplace.commissionrun')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='statements', to='marketplace.seller')),
+            ],
+            options={
+                'ordering': ['-period_start', 'seller'],
+                'indexes': [models.Index(fields=['seller', 'period_start'], name='seller_statement_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('run', 'seller'), name='seller_statement_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-19 10:23
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def percentages_to_fractions(apps, schema_editor):
+    """Rates entered as percentages (above 1) become fractions of the gross"""
+    Seller = apps.get_model('marketplace', 'Seller')
+    Seller.objects.filter(commission_rate__gt=1).update(commission_rate=models.F('commission_rate') / 100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_commission_settlement'),
+    ]
+
+    operations = [
+        # Wide enough for both units while existing percentages are converted
+        migrations.AlterField(
+            model_name='seller',
+            name='commission_rate',
+            field=models.DecimalField(decimal_places=4, default=0.1, max_digits=7),
+        ),
+        migrations.RunPython(percentages_to_fractions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='seller',
+            name='commission_rate',
+            field=models.DecimalField(decimal_places=4, default=0.1, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='sellerstatement',
+            name='commission_rate',
+            field=models.DecimalField(decimal_places=4, max_digits=5),
+        ),
+    ]
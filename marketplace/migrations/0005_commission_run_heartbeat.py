@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-19 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0004_commission_rate_fraction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commissionrun',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
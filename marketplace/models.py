@@ -1,3 +1,4 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 class Category(models.Model):
@@ -18,6 +19,8 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     brand = models.CharField(max_length=100)
+    # Seller whose delivered order lines earn commission (see marketplace.commissions)
+    seller = models.ForeignKey('Seller', on_delete=models.SET_NULL, null=True, blank=True, related_name='products')
     images = models.JSONField()  # Array of image URLs
     attributes = models.JSONField()  # Size, color, etc.
     is_active = models.BooleanField(default=True)
@@ -40,12 +43,68 @@ class Seller(models.Model):
     business_name = models.CharField(max_length=100)
     business_address = models.TextField()
     tax_id = models.CharField(max_length=50)
-    commission_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0.10)
+    # Fraction of the gross, e.g. 0.10 for 10%
+    commission_rate = models.DecimalField(
+        max_digits=5, decimal_places=4, default=0.10, validators=[MinValueValidator(0), MaxValueValidator(1)]
+    )
     is_verified = models.BooleanField(default=False)
 
     def __str__(self):
         return self.business_name
 
+class CommissionRun(models.Model):
+    """Settlement of one period's delivered lines; checkpoint_seller_id lets an interrupted run resume"""
+    period_start = models.DateField()
+    period_end = models.DateField()
+    status = models.CharField(max_length=20, default='running', choices=[
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed')
+    ])
+    checkpoint_seller_id = models.IntegerField(default=0)
+    seller_count = models.PositiveIntegerField(default=0)
+    line_count = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    commission_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    # Last write by the worker settling the run; a running run that goes quiet can be taken over
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Commission run {self.period_start} - {self.period_end} ({self.status})"
+
+    class Meta:
+        ordering = ['-period_start']
+        constraints = [
+            models.UniqueConstraint(fields=['period_start', 'period_end'], name='commission_run_period_unique'),
+        ]
+
+class SellerStatement(models.Model):
+    run = models.ForeignKey(CommissionRun, on_delete=models.CASCADE, related_name='statements')
+    seller = models.ForeignKey(Seller, on_delete=models.PROTECT, related_name='statements')
+    period_start = models.DateField()
+    period_end = models.DateField()
+    line_count = models.PositiveIntegerField()
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    commission_rate = models.DecimalField(max_digits=5, decimal_places=4)
+    commission_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.seller_id} {self.period_start} - {self.period_end}: {self.net_amount}"
+
+    class Meta:
+        ordering = ['-period_start', 'seller']
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'seller'], name='seller_statement_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'period_start'], name='seller_statement_period_idx'),
+        ]
+
 class MarketplaceIntegration(models.Model):
     name = models.CharField(max_length=100)  # Amazon, Shopify, etc.
     api_key = models.CharField(max_length=255)
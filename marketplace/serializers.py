@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Category, Product, Seller, MarketplaceIntegration, MarketplaceProduct
+from .models import (
+    Category, Product, Seller, MarketplaceIntegration, MarketplaceProduct, CommissionRun, SellerStatement
+)
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,7 +17,7 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'sku', 'name', 'description', 'price', 'category',
-            'category_name', 'brand', 'images', 'attributes', 'is_active',
+            'category_name', 'brand', 'seller', 'images', 'attributes', 'is_active',
             'available_quantity', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -69,4 +71,31 @@ class SyncDataSerializer(serializers.Serializer):
         ('orders', 'Orders'),
         ('inventory', 'Inventory')
     ])
-    data = serializers.ListField(child=serializers.DictField(), required=False)
\ No newline at end of file
+    data = serializers.ListField(child=serializers.DictField(), required=False)
+
+class CommissionRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CommissionRun
+        fields = [
+            'id', 'period_start', 'period_end', 'status', 'seller_count', 'line_count',
+            'gross_amount', 'commission_amount', 'error', 'started_at', 'completed_at'
+        ]
+
+class CommissionRunCreateSerializer(serializers.Serializer):
+    period_start = serializers.DateField()
+    period_end = serializers.DateField()
+
+    def validate(self, data):
+        if data['period_end'] < data['period_start']:
+            raise serializers.ValidationError("period_end must not be before period_start")
+        return data
+
+class SellerStatementSerializer(serializers.ModelSerializer):
+    business_name = serializers.CharField(source='seller.business_name', read_only=True)
+
+    class Meta:
+        model = SellerStatement
+        fields = [
+            'id', 'run', 'seller', 'business_name', 'period_start', 'period_end', 'line_count',
+            'gross_amount', 'commission_rate', 'commission_amount', 'net_amount', 'created_at'
+        ]
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from .commissions import previous_month, settle_commissions
+
+
+@shared_task
+def settle_seller_commissions(period_start=None, period_end=None):
+    """Settle a period's commissions (default: last month); settled periods are skipped"""
+    if period_start is None:
+        period_start, period_end = previous_month()
+    run = settle_commissions(period_start, period_end)
+    return {'run': run.id, 'status': run.status, 'sellers': run.seller_count}
@@ -1,3 +1,131 @@
-from django.test import TestCase
+import importlib
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from marketplace import commissions
+from marketplace.models import Category, CommissionRun, Product, Seller, SellerStatement
+from orders.models import Order, OrderItem
+from payments.models import LedgerAccount
+from shipping.models import Shipment, ShipmentLine
+from users.models import User
+
+class CommissionSettlementTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', user_type='admin'
+        )
+        category = Category.objects.create(name='Test Category')
+        self.sellers = []
+        self.products = []
+        for i, rate in enumerate(['0.10', '0.25']):
+            user = User.objects.create_user(username=f'seller{i}', password='testpass123', user_type='seller')
+            seller = Seller.objects.create(
+                user=user, business_name=f'Seller {i}', business_address='A', tax_id=f'T{i}', commission_rate=rate
+            )
+            self.sellers.append(seller)
+            self.products.append(Product.objects.create(
+                name=f'Product {i}', sku=f'SKU{i}', description='', price=10.00, seller=seller,
+                category=category, brand='Brand', images=[], attributes={}
+            ))
+        self.client.force_authenticate(self.admin)
+
+    def deliver(self, product, quantity, delivered_on, order_status='delivered'):
+        order = Order.objects.create(
+            customer=self.admin, status=order_status, total_amount=10 * quantity,
+            shipping_address='A', billing_address='B', payment_method='card',
+            shipping_method='standard'
+        )
+        item = OrderItem.objects.create(
+            order=order, product=product, quantity=quantity, unit_price=10.00, total_price=10 * quantity
+        )
+        shipment = Shipment.objects.create(
+            order=order, tracking_number=f'T{order.id}', carrier='ups', status='delivered',
+            delivered_at=timezone.make_aware(datetime.combine(delivered_on, datetime.min.time()))
+        )
+        ShipmentLine.objects.create(shipment=shipment, order_item=item, quantity=quantity)
+
+    def test_period_is_settled_in_resumable_batches(self):
+        self.deliver(self.products[0], 2, date(2026, 9, 1))
+        self.deliver(self.products[0], 1, date(2026, 9, 30))
+        self.deliver(self.products[1], 4, date(2026, 9, 15))
+        self.deliver(self.products[1], 5, date(2026, 10, 1))
+        self.deliver(self.products[1], 3, date(2026, 9, 15), order_status='refunded')
+
+        write_batch = commissions._write_batch
+        calls = []
+
+        def flaky_write(run, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('lost connection')
+            write_batch(run, rows)
+
+        with mock.patch.object(commissions, '_write_batch', flaky_write):
+            with self.assertRaises(RuntimeError):
+                commissions.settle_commissions(date(2026, 9, 1), date(2026, 9, 30), batch_size=1)
+        run = CommissionRun.objects.get()
+        self.assertEqual((run.status, run.checkpoint_seller_id, run.seller_count), ('failed', self.sellers[0].id, 1))
+
+        run = commissions.settle_commissions(date(2026, 9, 1), date(2026, 9, 30), batch_size=1)
+        self.assertEqual((run.status, run.seller_count, run.line_count), ('completed', 2, 3))
+        self.assertEqual((run.gross_amount, run.commission_amount), (70, 13))
+        statements = {s.seller_id: (s.gross_amount, s.commission_amount, s.net_amount)
+                      for s in SellerStatement.objects.all()}
+        self.assertEqual(statements, {self.sellers[0].id: (30, 3, 27), self.sellers[1].id: (40, 10, 30)})
+
+        self.assertEqual(commissions.settle_commissions(date(2026, 9, 1), date(2026, 9, 30)).id, run.id)
+        self.assertEqual(SellerStatement.objects.count(), 2)
+        balances = dict(LedgerAccount.objects.values_list('code', 'balance'))
+        self.assertEqual(balances['revenue:commissions:USD'], -13)
+        self.assertEqual(balances[f'liability:seller:{self.sellers[1].id}:USD'], -30)
+
+        # Overlapping periods would settle the same lines again
+        with self.assertRaises(commissions.CommissionError):
+            commissions.settle_commissions(date(2026, 9, 15), date(2026, 10, 14))
+        self.assertEqual(CommissionRun.objects.count(), 1)
+        self.assertEqual(commissions.settle_commissions(date(2026, 10, 1), date(2026, 10, 31)).seller_count, 1)
+
+        self.client.force_authenticate(self.sellers[0].user)
+        response = self.client.get(reverse('seller-statement-list'))
+        self.assertEqual([s['seller'] for s in response.data['results']], [self.sellers[0].id])
+        # Run totals cover every seller
+        self.assertEqual(self.client.get(reverse('commission-run-list')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_run_in_progress_is_not_settled_twice(self):
+        self.deliver(self.products[0], 2, date(2026, 9, 1))
+        run = CommissionRun.objects.create(
+            period_start=date(2026, 9, 1), period_end=date(2026, 9, 30), heartbeat_at=timezone.now()
+        )
+        self.assertEqual(commissions.settle_commissions(date(2026, 9, 1), date(2026, 9, 30)).status, 'running')
+        self.assertFalse(SellerStatement.objects.exists())
+
+        # A run whose worker went quiet is taken over
+        CommissionRun.objects.filter(pk=run.pk).update(heartbeat_at=timezone.now() - timedelta(hours=2))
+        run = commissions.settle_commissions(date(2026, 9, 1), date(2026, 9, 30))
+        self.assertEqual((run.status, run.seller_count), ('completed', 1))
+
+    def test_commission_rates_are_fractions(self):
+        response = self.client.patch(
+            reverse('seller-detail', args=[self.sellers[0].id]), {'commission_rate': '25'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Rates entered as percentages are converted
+        migration = importlib.import_module('marketplace.migrations.0004_commission_rate_fraction')
+        Seller.objects.filter(pk=self.sellers[0].pk).update(commission_rate='7.5')
+        migration.percentages_to_fractions(apps, None)
+        self.sellers[0].refresh_from_db()
+        self.assertEqual(str(self.sellers[0].commission_rate), '0.0750')
+
+        # A rate that would make the commission exceed the gross fails the run
+        Seller.objects.filter(pk=self.sellers[1].pk).update(commission_rate='2')
+        self.deliver(self.products[1], 1, date(2026, 9, 15))
+        with self.assertRaises(commissions.CommissionError):
+            commissions.settle_commissions(date(2026, 9, 1), date(2026, 9, 30))
+        self.assertEqual(CommissionRun.objects.get().status, 'failed')
+        self.assertFalse(SellerStatement.objects.exists())
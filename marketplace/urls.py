@@ -13,6 +13,11 @@ urlpatterns = [
     path('sellers/', views.SellerListCreateView.as_view(), name='seller-list'),
     path('sellers/<int:pk>/', views.SellerDetailView.as_view(), name='seller-detail'),
 
+    # Commission settlement
+    path('commissions/runs/', views.CommissionRunListView.as_view(), name='commission-run-list'),
+    path('commissions/runs/start/', views.start_commission_run, name='commission-run-start'),
+    path('commissions/statements/', views.SellerStatementListView.as_view(), name='seller-statement-list'),
+
     # Marketplace integration
     path('marketplaces/', views.MarketplaceListView.as_view(), name='marketplace-list'),
     path('marketplaces/connect/', views.connect_marketplace, name='marketplace-connect'),
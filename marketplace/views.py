@@ -5,13 +5,17 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from django.db import transaction
-from .models import Category, Product, Seller, MarketplaceIntegration, MarketplaceProduct
+from .models import (
+    Category, Product, Seller, MarketplaceIntegration, MarketplaceProduct, CommissionRun, SellerStatement
+)
 from .serializers import (
     CategorySerializer, ProductSerializer, SellerSerializer,
     MarketplaceIntegrationSerializer, MarketplaceProductSerializer,
-    MarketplaceConnectSerializer, SyncDataSerializer
+    MarketplaceConnectSerializer, SyncDataSerializer,
+    CommissionRunSerializer, CommissionRunCreateSerializer, SellerStatementSerializer
 )
-from users.permissions import IsSellerOrAdmin
+from users.permissions import IsAdmin, IsAdminOrReadOnly, IsSellerOrAdmin
+from .tasks import settle_seller_commissions
 
 # Product Management
 class ProductListCreateView(generics.ListCreateAPIView):
@@ -156,3 +160,35 @@ def push_product_to_marketplace(request, marketplace_id):
 
     serializer = MarketplaceProductSerializer(pushed_products, many=True)
     return Response(serializer.data)
+
+# Commission settlement
+class CommissionRunListView(generics.ListAPIView):
+    """Commission runs carry platform-wide totals, so only admins may list them"""
+    queryset = CommissionRun.objects.all()
+    serializer_class = CommissionRunSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    filterset_fields = ['status']
+
+class SellerStatementListView(generics.ListAPIView):
+    """Commission statements; sellers only see their own"""
+    serializer_class = SellerStatementSerializer
+    permission_classes = [permissions.IsAuthenticated, IsSellerOrAdmin]
+    filterset_fields = ['seller', 'run', 'period_start']
+
+    def get_queryset(self):
+        statements = SellerStatement.objects.select_related('seller')
+        if self.request.user.user_type != 'admin':
+            statements = statements.filter(seller__user=self.request.user)
+        return statements
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsAdminOrReadOnly])
+def start_commission_run(request):
+    serializer = CommissionRunCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    period_start = serializer.validated_data['period_start']
+    period_end = serializer.validated_data['period_end']
+    settle_seller_commissions.delay(period_start.isoformat(), period_end.isoformat())
+    return Response({'period_start': period_start, 'period_end': period_end}, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,239 @@
+"""
+Cold-order archival.
+
+Old delivered/refunded orders are streamed, together with their items, payments,
+shipments (with their lines and tracking events), returns (with their items) and
+pick wave membership, into gzip-compressed NDJSON segment files on the configured
+archive storage (local disk or any S3-compatible bucket through django-storages).
+Orders that still share rows with other orders or with open work (consolidated
+shipments, open returns, unfinished pick waves) are left in place, since
+deleting them would cascade into rows the document does not own.
+Each segment is a sequence of independently compressed blocks, so a single
+archived order is rehydrated by reading and inflating one block only. The
+hot rows are deleted in batches once their segment has been written, and a
+small ArchivedOrder index row keeps the location of every archived order.
+"""
+
+import gzip
+import io
+import json
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Order, OrderItem, ArchivedOrder
+
+ARCHIVABLE_STATUSES = ['delivered', 'refunded']
+OPEN_RETURN_STATUSES = ['authorized', 'received']
+OPEN_WAVE_STATUSES = ['open', 'picking']
+
+DEFAULT_ARCHIVE_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': settings.BASE_DIR / 'archive'},
+}
+
+
+def get_archive_storage():
+    config = getattr(settings, 'ORDER_ARCHIVE_STORAGE', DEFAULT_ARCHIVE_STORAGE)
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def _order_documents(order_ids):
+    """Build one JSON-ready document per order with a fixed number of queries"""
+    from payments.models import PaymentTransaction
+    from returns.models import ReturnAuthorization, ReturnItem
+    from shipping.models import Shipment, ShipmentLine, TrackingEvent
+    from warehouse.models import PickWaveOrder
+
+    documents = {
+        order['id']: dict(order, items=[], payments=[], shipments=[], returns=[], pick_wave_id=None)
+        for order in Order.objects.filter(id__in=order_ids).values(
+            'id', 'order_number', 'customer_id', 'customer__username',
+            'customer__first_name', 'customer__last_name', 'status',
+            'total_amount', 'shipping_address', 'billing_address',
+            'payment_method', 'shipping_method', 'created_at', 'updated_at'
+        )
+    }
+    for item in OrderItem.objects.filter(order_id__in=order_ids).values(
+        'id', 'order_id', 'product_id', 'product_name', 'product_sku',
+        'product_attributes', 'quantity', 'unit_price', 'total_price', 'created_at'
+    ):
+        documents[item['order_id']]['items'].append(item)
+    for payment in PaymentTransaction.objects.filter(order_id__in=order_ids).values():
+        documents[payment['order_id']]['payments'].append(payment)
+    shipments = {}
+    for shipment in Shipment.objects.filter(order_id__in=order_ids).values():
+        shipments[shipment['id']] = dict(shipment, lines=[], events=[])
+        documents[shipment['order_id']]['shipments'].append(shipments[shipment['id']])
+    for line in ShipmentLine.objects.filter(shipment_id__in=shipments).values():
+        shipments[line['shipment_id']]['lines'].append(line)
+    for event in TrackingEvent.objects.filter(shipment_id__in=shipments).values():
+        shipments[event['shipment_id']]['events'].append(event)
+    returns = {}
+    for rma in ReturnAuthorization.objects.filter(order_id__in=order_ids).values():
+        returns[rma['id']] = dict(rma, items=[])
+        documents[rma['order_id']]['returns'].append(returns[rma['id']])
+    for item in ReturnItem.objects.filter(rma_id__in=returns).values():
+        returns[item['rma_id']]['items'].append(item)
+    for order_id, wave_id in PickWaveOrder.objects.filter(order_id__in=order_ids).values_list('order_id', 'wave_id'):
+        documents[order_id]['pick_wave_id'] = wave_id
+    return [documents[order_id] for order_id in order_ids if order_id in documents]
+
+
+def _compress_block(documents):
+    lines = ''.join(json.dumps(doc, cls=DjangoJSONEncoder) + '\n' for doc in documents)
+    return gzip.compress(lines.encode('utf-8'))
+
+
+class SegmentWriter:
+    """Accumulates compressed blocks for one segment and remembers their offsets"""
+
+    def __init__(self, name):
+        self.name = name
+        self.buffer = io.BytesIO()
+        self.index_rows = []
+
+    def add_block(self, documents):
+        block = _compress_block(documents)
+        offset = self.buffer.tell()
+        self.buffer.write(block)
+        now = timezone.now()
+        for doc in documents:
+            self.index_rows.append(ArchivedOrder(
+                order_id=doc['id'],
+                order_number=doc['order_number'],
+                customer_id=doc['customer_id'],
+                status=doc['status'],
+                total_amount=doc['total_amount'],
+                created_at=doc['created_at'],
+                segment=self.name,
+                block_offset=offset,
+                block_length=len(block),
+                archived_at=now,
+            ))
+
+    def save(self, storage):
+        # Storage backends may pick a different name if it is already taken
+        self.name = storage.save(self.name, ContentFile(self.buffer.getvalue()))
+        for row in self.index_rows:
+            row.segment = self.name
+
+
+def archivable_orders(cutoff, statuses=None):
+    """Orders whose rows, and everything that cascades from them, fit in their own archive document"""
+    from shipping.models import ShipmentLine
+
+    return Order.objects.filter(
+        created_at__lt=cutoff,
+        status__in=statuses or ARCHIVABLE_STATUSES
+    ).exclude(
+        returns__status__in=OPEN_RETURN_STATUSES
+    ).exclude(
+        pick_wave_entry__wave__status__in=OPEN_WAVE_STATUSES
+    ).exclude(
+        # Consolidated shipments: lines of other orders in its shipments, or its lines in theirs
+        Exists(ShipmentLine.objects.filter(shipment__order=OuterRef('pk')).exclude(order_item__order=OuterRef('pk')))
+    ).exclude(
+        Exists(ShipmentLine.objects.filter(order_item__order=OuterRef('pk')).exclude(shipment__order=OuterRef('pk')))
+    )
+
+
+def archive_orders(cutoff, statuses=None, batch_size=500, segment_size=10000, storage=None, stdout=None):
+    """
+    Archive orders created before cutoff whose status is in statuses (see
+    archivable_orders for the ones that are skipped).
+
+    Orders are read in id order, batch_size at a time; every batch becomes one
+    compressed block and every segment_size orders a new segment file. The
+    segment is written before its rows are deleted, so an interrupted run
+    leaves at worst an orphan segment and never loses an order.
+    Returns the number of archived orders.
+    """
+    storage = storage or get_archive_storage()
+    queryset = archivable_orders(cutoff, statuses).order_by('id')
+
+    archived = 0
+    last_id = 0
+    while True:
+        writer = SegmentWriter(f"orders/{timezone.now():%Y/%m/%Y%m%dT%H%M%S%f}.ndjson.gz")
+        segment_ids = []
+        while len(segment_ids) < segment_size:
+            batch = list(queryset.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+            documents = _order_documents(batch)
+            if documents:
+                writer.add_block(documents)
+                segment_ids.extend(doc['id'] for doc in documents)
+
+        if not segment_ids:
+            return archived
+
+        writer.save(storage)
+        for i in range(0, len(segment_ids), batch_size):
+            ids = segment_ids[i:i + batch_size]
+            with transaction.atomic():
+                ArchivedOrder.objects.bulk_create(writer.index_rows[i:i + batch_size])
+                Order.objects.filter(id__in=ids).delete()
+
+        archived += len(segment_ids)
+        if stdout:
+            stdout.write(f"Archived {len(segment_ids)} orders to {writer.name}")
+
+
+def load_archived_order(entry, storage=None):
+    """Read the archived document for an ArchivedOrder index row"""
+    storage = storage or get_archive_storage()
+    with storage.open(entry.segment, 'rb') as segment:
+        segment.seek(entry.block_offset)
+        block = segment.read(entry.block_length)
+
+    for line in gzip.decompress(block).decode('utf-8').splitlines():
+        document = json.loads(line)
+        if document['id'] == entry.order_id:
+            return document
+    return None
+
+
+def archived_order_representation(document):
+    """Shape an archived document like OrderSerializer output"""
+    customer_name = f"{document['customer__first_name']} {document['customer__last_name']}".strip()
+    return {
+        'id': document['id'],
+        'order_number': document['order_number'],
+        'customer': document['customer_id'],
+        'customer_name': customer_name,
+        'status': document['status'],
+        'total_amount': document['total_amount'],
+        'shipping_address': document['shipping_address'],
+        'billing_address': document['billing_address'],
+        'payment_method': document['payment_method'],
+        'shipping_method': document['shipping_method'],
+        'items': [
+            {
+                'id': item['id'],
+                'product': item['product_id'],
+                'product_name': item['product_name'],
+                'product_sku': item['product_sku'],
+                'product_attributes': item['product_attributes'],
+                'quantity': item['quantity'],
+                'unit_price': item['unit_price'],
+                'total_price': item['total_price'],
+            }
+            for item in document['items']
+        ],
+        'total_items': len(document['items']),
+        'payments': document['payments'],
+        'shipments': document['shipments'],
+        # Documents archived before returns were kept have none
+        'returns': document.get('returns', []),
+        'created_at': document['created_at'],
+        'updated_at': document['updated_at'],
+        'archived': True,
+    }
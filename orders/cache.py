@@ -0,0 +1,50 @@
+"""
+Per-customer caching of the order history projection.
+
+Cached pages are keyed by a per-customer version number; any write to one of
+the customer's orders bumps the version, which orphans every cached page of
+that customer at once (they then expire through their TTL). Single saves are
+covered by the post_save signal; code that moves orders with a bulk UPDATE
+calls invalidate_order_histories with the affected orders.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+DEFAULT_HISTORY_CACHE_TIMEOUT = 300
+
+
+def _version_key(customer_id):
+    return f"orders:history:version:{customer_id}"
+
+
+def history_cache_key(customer_id, query_string):
+    version = cache.get_or_set(_version_key(customer_id), 1, timeout=None)
+    return f"orders:history:{customer_id}:{version}:{query_string}"
+
+
+def history_cache_timeout():
+    return getattr(settings, 'ORDER_HISTORY_CACHE_TIMEOUT', DEFAULT_HISTORY_CACHE_TIMEOUT)
+
+
+def invalidate_order_history(customer_id):
+    try:
+        cache.incr(_version_key(customer_id))
+    except ValueError:
+        # No version stored yet, so nothing is cached for this customer
+        pass
+
+
+def invalidate_order_histories(orders):
+    """
+    Invalidate the history of every customer owning one of orders (a queryset)
+    once the current transaction commits. Call it before the bulk UPDATE, while
+    the queryset still selects the orders it is about to change.
+    """
+    customer_ids = set(orders.order_by().values_list('customer_id', flat=True).distinct())
+
+    def invalidate():
+        for customer_id in customer_ids:
+            invalidate_order_history(customer_id)
+    transaction.on_commit(invalidate)
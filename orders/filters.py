@@ -0,0 +1,44 @@
+import re
+
+from django.db.models import Q
+from rest_framework.filters import SearchFilter
+
+from users.models import User
+
+# Sequential order numbers (ORD-0000012345-5) and their prefixes
+ORDER_NUMBER_PATTERN = re.compile(r'^[A-Za-z]{2,5}-\d+(-\d?)?$')
+# Trigram indexes only help once the term has at least three characters
+MIN_TRIGRAM_LENGTH = 3
+
+
+class OrderSearchFilter(SearchFilter):
+    """
+    Order search backed by the indexes created in orders migration 0007.
+
+    Terms shaped like an order number take a fast path: a prefix match served
+    by a pattern-ops btree index, which also covers exact lookups of a full
+    number. Other terms are matched as substrings of the order number and of
+    the customer's username or email; the customer part runs as an id subquery
+    on the users table instead of a join, so each side can use its own trigram
+    index on PostgreSQL. The same lookups run unchanged on SQLite.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        term = ' '.join(terms)
+        if ORDER_NUMBER_PATTERN.match(term):
+            return queryset.filter(order_number__startswith=term.upper())
+
+        if len(term) < MIN_TRIGRAM_LENGTH:
+            customers = User.objects.filter(
+                Q(username__istartswith=term) | Q(email__istartswith=term)
+            ).values('id')
+            return queryset.filter(Q(order_number__istartswith=term) | Q(customer_id__in=customers))
+
+        customers = User.objects.filter(
+            Q(username__icontains=term) | Q(email__icontains=term)
+        ).values('id')
+        return queryset.filter(Q(order_number__icontains=term) | Q(customer_id__in=customers))
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.archive import ARCHIVABLE_STATUSES, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move old delivered and refunded orders into compressed archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=730,
+            help='Archive orders created more than this many days ago'
+        )
+        parser.add_argument(
+            '--status', action='append', choices=ARCHIVABLE_STATUSES,
+            help='Only archive orders with this status (may be repeated)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--segment-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        archived = archive_orders(
+            cutoff,
+            statuses=options['status'],
+            batch_size=options['batch_size'],
+            segment_size=options['segment_size'],
+            stdout=self.stdout
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} orders created before {cutoff:%Y-%m-%d}"))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions for the order tables and optionally drop expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='Number of future monthly partitions to keep created'
+        )
+        parser.add_argument(
+            '--retain-months', type=int,
+            help='Drop partitions older than this many months (retention delete)'
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            raise CommandError('Table partitioning requires PostgreSQL')
+
+        this_month = partitioning.month_start(timezone.now())
+        last_month = partitioning.add_months(this_month, options['months_ahead'])
+
+        for table in partitioning.PARTITIONED_TABLES:
+            if not partitioning.is_partitioned(table):
+                self.stdout.write(f"{table} is not partitioned, run partition_order_tables first")
+                continue
+
+            for month in partitioning.iter_months(this_month, last_month):
+                if partitioning.create_partition(table, month):
+                    self.stdout.write(f"Created {partitioning.partition_name(table, month)}")
+
+            if options['retain_months'] is not None:
+                cutoff = partitioning.add_months(this_month, -options['retain_months'])
+                for name in partitioning.drop_partitions_before(table, cutoff):
+                    self.stdout.write(f"Dropped {name}")
+
+        self.stdout.write(self.style.SUCCESS('Order partitions are up to date'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Convert the order, order item and payment tables to monthly range partitions (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table', action='append', choices=list(partitioning.PARTITIONED_TABLES),
+            help='Convert only this table (may be repeated). Defaults to all partitioned tables.'
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='Number of future monthly partitions to create'
+        )
+        parser.add_argument(
+            '--batch-months', type=int, default=1,
+            help='Number of months of existing rows to copy per INSERT'
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            raise CommandError('Table partitioning requires PostgreSQL')
+
+        for table in options['table'] or partitioning.PARTITIONED_TABLES:
+            if partitioning.is_partitioned(table):
+                self.stdout.write(f"{table} is already partitioned, skipping")
+                continue
+
+            self.stdout.write(f"Converting {table}...")
+            partitioning.convert_table(
+                table,
+                months_ahead=options['months_ahead'],
+                batch_months=options['batch_months'],
+                stdout=self.stdout
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{table} converted; the original rows remain in {table}_legacy until you drop it"
+            ))
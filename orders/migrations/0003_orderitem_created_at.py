@@ -0,0 +1,26 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunSQL(
+            sql=(
+                "UPDATE orders_orderitem SET created_at = ("
+                "SELECT created_at FROM orders_order WHERE orders_order.id = orders_orderitem.order_id)"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_orderitem_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(unique=True)),
+                ('order_number', models.CharField(max_length=50, unique=True)),
+                ('customer_id', models.BigIntegerField(db_index=True)),
+                ('status', models.CharField(max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('segment', models.CharField(max_length=255)),
+                ('block_offset', models.BigIntegerField()),
+                ('block_length', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.order'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE SEQUENCE IF NOT EXISTS orders_order_number_seq")
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP SEQUENCE IF EXISTS orders_order_number_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_archivedorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(blank=True, max_length=50, unique=True),
+        ),
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
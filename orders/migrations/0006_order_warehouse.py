@@ -0,0 +1,26 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_sequential_order_numbers'),
+        ('warehouse', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='warehouse.warehouse'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['warehouse', 'status', 'created_at'], name='order_fulfillment_idx'),
+        ),
+    ]
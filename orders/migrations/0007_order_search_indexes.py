@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Expression indexes matching the SQL Django emits for the lookups used by
+# orders.filters.OrderSearchFilter: startswith compiles to "col"::text LIKE,
+# icontains/istartswith to UPPER("col"::text) LIKE UPPER(...).
+SEARCH_INDEXES = [
+    ('order_number_prefix_idx', 'orders_order', '(("order_number"::text) text_pattern_ops)', 'btree'),
+    ('order_number_trgm_idx', 'orders_order', '(UPPER("order_number"::text) gin_trgm_ops)', 'gin'),
+    ('user_username_trgm_idx', 'users_user', '(UPPER("username"::text) gin_trgm_ops)', 'gin'),
+    ('user_email_trgm_idx', 'users_user', '(UPPER("email"::text) gin_trgm_ops)', 'gin'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, expression, method in SEARCH_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING {method} {expression}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, expression, method in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_warehouse'),
+        ('users', '0003_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
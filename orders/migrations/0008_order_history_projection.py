@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_search_indexes'),
+        ('warehouse', '0002_pick_waves'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql=(
+                "UPDATE orders_order SET item_count = ("
+                "SELECT COUNT(*) FROM orders_orderitem WHERE orders_orderitem.order_id = orders_order.id)"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-created_at'], include=('order_number', 'status', 'total_amount', 'item_count'), name='order_customer_history_idx'),
+        ),
+    ]
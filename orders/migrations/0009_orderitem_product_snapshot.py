@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_initial'),
+        ('orders', '0008_order_history_projection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_attributes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_sku',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunSQL(
+            sql=(
+                "UPDATE orders_orderitem SET "
+                "product_sku = (SELECT sku FROM marketplace_product p WHERE p.id = orders_orderitem.product_id), "
+                "product_name = (SELECT name FROM marketplace_product p WHERE p.id = orders_orderitem.product_id), "
+                "product_attributes = (SELECT attributes FROM marketplace_product p WHERE p.id = orders_orderitem.product_id)"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.5 on 2026-10-19 10:07
+
+from django.db import migrations, models
+
+# RMA and tracking numbers used to come from the order number sequence, so the
+# new sequences start where it stands to avoid reissuing any earlier number.
+NEW_SEQUENCES = {
+    'rma': 'returns_rma_number_seq',
+    'tracking': 'shipping_tracking_number_seq',
+}
+
+
+def create_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT last_value FROM orders_order_number_seq")
+            (current,) = cursor.fetchone()
+        for sequence in NEW_SEQUENCES.values():
+            schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence}")
+            schema_editor.execute("SELECT setval(%s, %s)", [sequence, current])
+        return
+
+    OrderNumberCounter = apps.get_model('orders', 'OrderNumberCounter')
+    orders = OrderNumberCounter.objects.filter(name='orders').first()
+    for name in NEW_SEQUENCES:
+        OrderNumberCounter.objects.get_or_create(name=name, defaults={'value': orders.value if orders else 0})
+
+
+def drop_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sequence in NEW_SEQUENCES.values():
+            schema_editor.execute(f"DROP SEQUENCE IF EXISTS {sequence}")
+        return
+
+    OrderNumberCounter = apps.get_model('orders', 'OrderNumberCounter')
+    OrderNumberCounter.objects.filter(name__in=list(NEW_SEQUENCES)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_orderitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordernumbercounter',
+            name='name',
+            field=models.CharField(default='orders', max_length=50, unique=True),
+        ),
+        migrations.RunPython(create_sequences, drop_sequences),
+    ]
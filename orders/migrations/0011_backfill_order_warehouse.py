@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+# Orders that still have to be picked and shipped
+OPEN_STATUSES = ['pending', 'confirmed', 'processing']
+
+
+def backfill_warehouse(apps, schema_editor):
+    """Assign open orders created before Order.warehouse existed to the warehouse stocking their first product"""
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Inventory = apps.get_model('inventory', 'Inventory')
+    first_product = OrderItem.objects.filter(order_id=OuterRef(OuterRef('pk'))).order_by('id').values('product_id')[:1]
+    Order.objects.filter(warehouse__isnull=True, status__in=OPEN_STATUSES).update(warehouse_id=Subquery(
+        Inventory.objects.filter(product_id=Subquery(first_product)).order_by('id').values('warehouse_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_number_sequences'),
+        ('inventory', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_warehouse, migrations.RunPython.noop),
+    ]
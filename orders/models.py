@@ -1,8 +1,8 @@
 from django.db import models
-import uuid
+from django.utils import timezone
 
 class Order(models.Model):
-    order_number = models.CharField(max_length=50, unique=True, default=uuid.uuid4)
+    order_number = models.CharField(max_length=50, unique=True, blank=True)
     customer = models.ForeignKey('users.User', on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=[
         ('pending', 'Pending'),
@@ -18,27 +18,80 @@ class Order(models.Model):
     billing_address = models.TextField()
     payment_method = models.CharField(max_length=50)
     shipping_method = models.CharField(max_length=50)
+    # Warehouse the order's stock was reserved in and that fulfills it
+    warehouse = models.ForeignKey('warehouse.Warehouse', on_delete=models.SET_NULL, null=True, blank=True)
+    # Number of order lines, kept on the order so history listings need no join
+    item_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Order {self.order_number}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['warehouse', 'status', 'created_at'], name='order_fulfillment_idx'),
+            # Covers the customer order-history projection (index-only scans on PostgreSQL)
+            models.Index(
+                fields=['customer', '-created_at'],
+                include=['order_number', 'status', 'total_amount', 'item_count'],
+                name='order_customer_history_idx'
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.order_number:
-            self.order_number = str(uuid.uuid4())[:8].upper()
+            from .numbering import next_order_number
+            self.order_number = next_order_number()
         super().save(*args, **kwargs)
 
 class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey('marketplace.Product', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Snapshot of the product taken when the order was placed; order history and
+    # exports read these instead of joining the (mutable) catalog
+    product_sku = models.CharField(max_length=100, blank=True)
+    product_name = models.CharField(max_length=255, blank=True)
+    product_attributes = models.JSONField(default=dict, blank=True)
+    # Copy of the order's created_at so items share the order's monthly partition
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
+        return f"{self.product_name or self.product.name} x {self.quantity}"
+
+    def snapshot_product(self, product):
+        self.product_sku = product.sku
+        self.product_name = product.name
+        self.product_attributes = product.attributes or {}
 
     def save(self, *args, **kwargs):
         self.total_price = self.unit_price * self.quantity
+        if self._state.adding and not self.product_sku:
+            self.snapshot_product(self.product)
+        if self._state.adding and OrderItem.order.is_cached(self) and self.order.created_at:
+            self.created_at = self.order.created_at
         super().save(*args, **kwargs)
+
+class ArchivedOrder(models.Model):
+    """Index row for an order moved to archive storage by orders.archive"""
+    order_id = models.BigIntegerField(unique=True)
+    order_number = models.CharField(max_length=50, unique=True)
+    customer_id = models.BigIntegerField(db_index=True)
+    status = models.CharField(max_length=20)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    segment = models.CharField(max_length=255)
+    block_offset = models.BigIntegerField()
+    block_length = models.PositiveIntegerField()
+    archived_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived order {self.order_number}"
+
+class OrderNumberCounter(models.Model):
+    """Number block counter for databases without sequences, one row per sequence (see orders.numbering)"""
+    name = models.CharField(max_length=50, unique=True, default='orders')
+    value = models.BigIntegerField(default=0)
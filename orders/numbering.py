@@ -0,0 +1,131 @@
+"""
+Sequential, human-friendly order numbers.
+
+Each worker process reserves a block of values from the database in one round
+trip (a PostgreSQL sequence, or a counter row on other databases) and hands
+them out locally, so numbering an order normally costs no query. Numbers
+increase monotonically within a process and share a fixed width, which keeps
+inserts into the unique order_number index at its right edge.
+
+Without sequences the counter bump is transactional, so a block is only
+cached once its bump is committed. Outside a transaction that is immediate.
+Inside one, the value is reserved on its own (one query, rolled back with the
+transaction), and the allocator's on_commit callback refills the cache after
+the commit. A rollback discards the callback, so values whose bump was rolled
+back never reach the cache and are never handed out twice.
+
+Order, RMA and tracking numbers each draw from their own sequence (SEQUENCES).
+
+Format: <prefix>-<10 digit sequence value>-<Luhn check digit>, e.g. ORD-0000012345-5
+"""
+
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+# Counter name -> PostgreSQL sequence
+SEQUENCES = {
+    'orders': 'orders_order_number_seq',
+    'rma': 'returns_rma_number_seq',
+    'tracking': 'shipping_tracking_number_seq',
+}
+SEQUENCE_NAME = SEQUENCES['orders']
+DEFAULT_BLOCK_SIZE = 100
+DEFAULT_PREFIX = 'ORD'
+SEQUENCE_WIDTH = 10
+
+
+def luhn_check_digit(digits):
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        value = int(char)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def format_order_number(value, prefix=None):
+    prefix = prefix or getattr(settings, 'ORDER_NUMBER_PREFIX', DEFAULT_PREFIX)
+    digits = f"{value:0{SEQUENCE_WIDTH}d}"
+    return f"{prefix}-{digits}-{luhn_check_digit(digits)}"
+
+
+def is_valid_order_number(order_number):
+    """Check the structure and check digit of a sequential order number"""
+    parts = str(order_number).split('-')
+    if len(parts) != 3 or not parts[1].isdigit() or not parts[2].isdigit():
+        return False
+    return luhn_check_digit(parts[1]) == parts[2]
+
+
+def _reserve_block(size, name='orders'):
+    """Fetch size fresh values of the named sequence from the database in a single query"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                [SEQUENCES[name], size]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    from .models import OrderNumberCounter
+    with transaction.atomic():
+        counter, _ = OrderNumberCounter.objects.select_for_update().get_or_create(name=name)
+        OrderNumberCounter.objects.filter(pk=counter.pk).update(value=F('value') + size)
+    return list(range(counter.value + 1, counter.value + size + 1))
+
+
+class OrderNumberAllocator:
+    def __init__(self, block_size=None, name='orders'):
+        self.block_size = block_size
+        self.name = name
+        self._lock = threading.Lock()
+        self._values = []
+        self._pid = None
+
+    def _block_size(self):
+        return self.block_size or getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+
+    def _refill(self):
+        """on_commit callback: cache a block reserved outside the committed transaction"""
+        with self._lock:
+            # Only the first refill queued by a transaction finds the cache empty
+            if not self._values and self._pid == os.getpid():
+                self._values = _reserve_block(self._block_size(), self.name)
+                self._values.reverse()
+
+    def next_value(self):
+        with self._lock:
+            # A forked worker must not reuse the block reserved by its parent
+            if self._pid != os.getpid():
+                self._values = []
+                self._pid = os.getpid()
+            if not self._values:
+                if connection.vendor != 'postgresql' and connection.in_atomic_block:
+                    transaction.on_commit(self._refill)
+                    return _reserve_block(1, self.name)[0]
+                self._values = _reserve_block(self._block_size(), self.name)
+                self._values.reverse()
+            return self._values.pop()
+
+    def next_order_number(self):
+        return format_order_number(self.next_value())
+
+    def reset(self):
+        with self._lock:
+            self._values = []
+
+
+allocator = OrderNumberAllocator()
+rma_allocator = OrderNumberAllocator(name='rma')
+tracking_allocator = OrderNumberAllocator(name='tracking')
+
+
+def next_order_number():
+    return allocator.next_order_number()
@@ -0,0 +1,328 @@
+"""
+Monthly range partitioning of the order tables by created_at (PostgreSQL only).
+
+Partitioning is opt-in: tables stay ordinary heap tables until
+`manage.py partition_order_tables` converts them. Once converted,
+`manage.py create_order_partitions` keeps future months created ahead of time
+and can drop partitions that fall outside the retention window.
+"""
+
+from datetime import date, datetime, time, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Tables partitioned by month on their created_at column; their indexes are
+# carried over from the catalog when they are converted
+PARTITIONED_TABLES = ['orders_order', 'orders_orderitem', 'payments_paymenttransaction']
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def month_start(value):
+    """Return the first day of the month containing value"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(start, end):
+    """Yield month starts from start up to and including end"""
+    month = month_start(start)
+    end = month_start(end)
+    while month <= end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def month_bounds(month):
+    """Return timezone-aware [lower, upper) datetimes for a monthly partition"""
+    lower = datetime.combine(month, time.min, tzinfo=dt_timezone.utc)
+    upper = datetime.combine(add_months(month, 1), time.min, tzinfo=dt_timezone.utc)
+    return lower, upper
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(table):
+    """Return the names of the partitions attached to table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s ORDER BY child.relname",
+            [table]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(table, month, parent=None):
+    """
+    Create the partition of table for month. Returns False if it already existed.
+
+    parent is the partitioned table to attach it to when that is not (yet)
+    named table, e.g. while a conversion fills its staging table.
+    """
+    parent = parent or table
+    name = partition_name(table, month)
+    if name in existing_partitions(parent):
+        return False
+
+    lower, upper = month_bounds(month)
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(parent)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper]
+        )
+    return True
+
+
+def drop_partitions_before(table, cutoff):
+    """Drop every monthly partition of table that ends on or before cutoff"""
+    qn = connection.ops.quote_name
+    cutoff_name = partition_name(table, month_start(cutoff))
+    dropped = []
+    for name in existing_partitions(table):
+        # Partition names sort chronologically, so a string compare is enough
+        if name.startswith(f"{table}_p") and name < cutoff_name:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {qn(name)}")
+            dropped.append(name)
+    return dropped
+
+
+def _date_range(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(created_at), MAX(created_at) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()
+
+
+def _inbound_foreign_keys(table):
+    """Return (referencing table, constraint name) pairs pointing at table"""
+    with connection.cursor() as cursor:
+        # Constraints a partitioned table cascades to its partitions go with the parent's
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = %s::regclass AND conparentid = 0",
+            [table]
+        )
+        return cursor.fetchall()
+
+
+def _outbound_foreign_keys(table):
+    """
+    Return (constraint name, definition) of the foreign keys table holds on
+    other tables, except those pointing at a partitioned table (whose primary
+    key includes created_at, so id alone cannot be referenced)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT con.conname, pg_get_constraintdef(con.oid) FROM pg_constraint con "
+            "WHERE con.contype = 'f' AND con.conrelid = %s::regclass AND con.conparentid = 0 "
+            "AND NOT EXISTS (SELECT 1 FROM pg_partitioned_table pt WHERE pt.partrelid = con.confrelid) "
+            "ORDER BY con.conname",
+            [table]
+        )
+        return cursor.fetchall()
+
+
+def _indexes(table):
+    """
+    (name, unique, key columns, definition from USING on) of every index of
+    table except the primary key; key columns is None for expression or
+    partial indexes
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, i.indisunique, i.indexprs IS NULL AND i.indpred IS NULL, "
+            "ARRAY(SELECT a.attname FROM generate_series(0, i.indnkeyatts - 1) AS n "
+            "      JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[n] ORDER BY n), "
+            "pg_get_indexdef(i.indexrelid) "
+            "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = %s::regclass AND NOT i.indisprimary ORDER BY c.relname",
+            [table]
+        )
+        return [
+            (name, unique, list(columns) if plain else None, definition[definition.index(' USING '):])
+            for name, unique, plain, columns, definition in cursor.fetchall()
+        ]
+
+
+def _create_unique_guard(cursor, table, name, columns):
+    """
+    Enforce uniqueness of columns across all partitions: a trigger keeps their
+    values in a small side table whose own unique constraint does the check.
+    """
+    qn = connection.ops.quote_name
+    guard = f"{name[:57]}_guard"
+    column_list = ', '.join(qn(column) for column in columns)
+    old = ', '.join(f'OLD.{qn(column)}' for column in columns)
+    new = ', '.join(f'NEW.{qn(column)}' for column in columns)
+    cursor.execute(
+        f"CREATE TABLE {qn(guard)} AS SELECT {column_list} FROM {qn(table)} WITH NO DATA"
+    )
+    cursor.execute(f"ALTER TABLE {qn(guard)} ADD CONSTRAINT {qn(guard + '_key')} UNIQUE ({column_list})")
+    cursor.execute(
+        f"CREATE FUNCTION {qn(guard + '_sync')}() RETURNS trigger LANGUAGE plpgsql AS $$\n"
+        f"BEGIN\n"
+        f"  IF TG_OP IN ('UPDATE', 'DELETE') THEN\n"
+        f"    DELETE FROM {qn(guard)} WHERE ({column_list}) = ({old});\n"
+        f"  END IF;\n"
+        f"  IF TG_OP IN ('INSERT', 'UPDATE') THEN\n"
+        f"    INSERT INTO {qn(guard)} ({column_list}) VALUES ({new});\n"
+        f"  END IF;\n"
+        f"  RETURN NULL;\n"
+        f"END $$"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER {qn(guard + '_sync')} AFTER INSERT OR DELETE OR UPDATE OF {column_list} "
+        f"ON {qn(table)} FOR EACH ROW EXECUTE FUNCTION {qn(guard + '_sync')}()"
+    )
+    return guard
+
+
+def add_unique_guard(table, name, columns):
+    """
+    Enforce uniqueness of columns on an already partitioned table through a
+    <name>_guard table (see _create_unique_guard) seeded with its current values
+    """
+    qn = connection.ops.quote_name
+    column_list = ', '.join(qn(column) for column in columns)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {qn(table)} IN SHARE ROW EXCLUSIVE MODE")
+        guard = _create_unique_guard(cursor, table, name, columns)
+        cursor.execute(f"INSERT INTO {qn(guard)} ({column_list}) SELECT {column_list} FROM {qn(table)}")
+    return guard
+
+
+def drop_unique_guard(table, name):
+    qn = connection.ops.quote_name
+    guard = f"{name[:57]}_guard"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {qn(guard + '_sync')} ON {qn(table)}")
+        cursor.execute(f"DROP FUNCTION IF EXISTS {qn(guard + '_sync')}()")
+        cursor.execute(f"DROP TABLE IF EXISTS {qn(guard)}")
+
+
+def convert_table(table, months_ahead=3, batch_months=1, stdout=None):
+    """
+    Convert an existing table into a range-partitioned table.
+
+    A partitioned <table>_partitioned with the same columns, defaults and CHECK
+    constraints is created, monthly partitions are created to cover the
+    existing data plus months_ahead, and rows are copied into it batch_months
+    at a time. Only then is the original table renamed to <table>_legacy and
+    the new one swapped in under its name, so the live table never lacks
+    history. Everything runs in one transaction that holds an EXCLUSIVE lock
+    on the original table: reads keep being served from it, but writes wait
+    until the swap commits, so run the conversion in a maintenance window.
+
+    Every index of the original table is recreated on the parent under its
+    original name (the legacy copies are renamed out of the way), and its
+    foreign keys to other tables (customer_id, warehouse_id, order_id, ...)
+    are recreated on the parent once the rows are in, which validates them.
+
+    The primary key becomes (id, created_at) because PostgreSQL requires the
+    partition key in every unique index, so foreign keys that reference the
+    table are dropped and integrity is kept by the application; for the same
+    reason a table's foreign key on an already partitioned table is not
+    recreated. Unique indexes without created_at (order_number,
+    payment_gateway_txn_unique) become plain indexes; where they are on plain
+    columns, uniqueness is still enforced by a trigger-maintained
+    <index>_guard table. Dropping old partitions leaves their values in the
+    guard tables, so those values stay taken.
+    """
+    qn = connection.ops.quote_name
+    legacy = f"{table}_legacy"
+    staging = f"{table}_partitioned"
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Blocks writes but not reads until the swap commits
+            cursor.execute(f"LOCK TABLE {qn(table)} IN EXCLUSIVE MODE")
+        indexes = _indexes(table)
+        foreign_keys = _outbound_foreign_keys(table)
+
+        with connection.cursor() as cursor:
+            for name, _, _, _ in indexes:
+                cursor.execute(f"ALTER INDEX {qn(name)} RENAME TO {qn(name[:56] + '_legacy')}")
+            cursor.execute(
+                f"CREATE TABLE {qn(staging)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING IDENTITY "
+                f"INCLUDING STORAGE INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)"
+            )
+            cursor.execute(f"ALTER TABLE {qn(staging)} ADD PRIMARY KEY (id, created_at)")
+            if not any(columns == ['created_at'] for _, _, columns, _ in indexes):
+                cursor.execute(f"CREATE INDEX {qn(table + '_created_at_idx')} ON {qn(staging)} (created_at)")
+            for name, unique, columns, definition in indexes:
+                keeps_unique = unique and columns is not None and 'created_at' in columns
+                cursor.execute(
+                    f"CREATE {'UNIQUE ' if keeps_unique else ''}INDEX {qn(name)} ON {qn(staging)}{definition}"
+                )
+                if unique and not keeps_unique:
+                    if columns is None:
+                        if stdout:
+                            stdout.write(f"  {table}: {name} is no longer unique (expression or partial index)")
+                        continue
+                    guard = _create_unique_guard(cursor, staging, name, columns)
+                    if stdout:
+                        stdout.write(f"  {table}: uniqueness of {name} is enforced through {guard}")
+
+        earliest, latest = _date_range(table)
+        today = timezone.now()
+        first = earliest or today
+        last = add_months(month_start(max(latest or today, today)), months_ahead)
+        for month in iter_months(first, last):
+            create_partition(table, month, parent=staging)
+
+        months = list(iter_months(first, month_start(latest or today)))
+        for i in range(0, len(months), batch_months):
+            lower = month_bounds(months[i])[0]
+            upper = month_bounds(months[min(i + batch_months, len(months)) - 1])[1]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {qn(staging)} SELECT * FROM {qn(table)} "
+                    f"WHERE created_at >= %s AND created_at < %s",
+                    [lower, upper]
+                )
+                if stdout:
+                    stdout.write(f"  {table}: copied {cursor.rowcount} rows for {months[i]:%Y-%m}")
+
+        with connection.cursor() as cursor:
+            for referencing_table, constraint in _inbound_foreign_keys(table):
+                cursor.execute(f"ALTER TABLE {referencing_table} DROP CONSTRAINT {qn(constraint)}")
+            cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+            cursor.execute(f"ALTER TABLE {qn(staging)} RENAME TO {qn(table)}")
+            for constraint, definition in foreign_keys:
+                cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(constraint)} {definition}")
+
+            # The copied identity column gets a fresh sequence; continue after the legacy ids
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {qn(legacy)}), 0) + 1, false)",
+                [table]
+            )
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {qn(table)}")
@@ -3,16 +3,13 @@ from .models import Order, OrderItem
 from marketplace.models import Product
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_name = serializers.CharField(source='product.name', read_only=True)
-    product_sku = serializers.CharField(source='product.sku', read_only=True)
-
     class Meta:
         model = OrderItem
         fields = [
-            'id', 'product', 'product_name', 'product_sku',
+            'id', 'product', 'product_name', 'product_sku', 'product_attributes',
             'quantity', 'unit_price', 'total_price'
         ]
-        read_only_fields = ['id', 'total_price']
+        read_only_fields = ['id', 'product_name', 'product_sku', 'product_attributes', 'total_price']
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
@@ -30,7 +27,16 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'order_number', 'created_at', 'updated_at']
 
     def get_total_items(self, obj):
-        return obj.items.count()
+        return len(obj.items.all())
+
+class OrderHistorySerializer(serializers.Serializer):
+    """Slim order projection for customer order history, read from .values() rows"""
+    id = serializers.IntegerField()
+    order_number = serializers.CharField()
+    status = serializers.CharField()
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    item_count = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     items = serializers.ListField(
@@ -52,32 +58,35 @@ class OrderCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
+        order = Order.objects.create(status='pending', total_amount=0, **validated_data)
+        products = Product.objects.in_bulk([item_data['product_id'] for item_data in items_data])
 
         total_amount = 0
         for item_data in items_data:
             product_id = item_data['product_id']
             quantity = item_data['quantity']
 
-            try:
-                product = Product.objects.get(id=product_id)
-            except Product.DoesNotExist:
+            product = products.get(product_id)
+            if product is None:
                 raise serializers.ValidationError(f"Product with id {product_id} does not exist")
 
             unit_price = product.price
             total_price = unit_price * quantity
 
-            OrderItem.objects.create(
+            item = OrderItem(
                 order=order,
                 product=product,
                 quantity=quantity,
                 unit_price=unit_price,
                 total_price=total_price
             )
+            item.snapshot_product(product)
+            item.save()
 
             total_amount += total_price
 
         order.total_amount = total_amount
+        order.item_count = len(items_data)
         order.save()
         return order
 
@@ -1,3 +1,341 @@
+import tempfile
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from orders import partitioning
+from orders.numbering import OrderNumberAllocator, format_order_number, is_valid_order_number
+from orders.archive import archive_orders, load_archived_order
+from orders.models import Order, OrderItem, ArchivedOrder
+from marketplace.models import Product, Category
+from users.models import User
 
-# Create your tests here.
+class OrderTestMixin:
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.product = Product.objects.create(
+            name='Test Product',
+            sku='TEST001',
+            description='Test Description',
+            price=10.00,
+            category=self.category,
+            brand='Test Brand',
+            images=[],
+            attributes={}
+        )
+
+    def create_order(self, **kwargs):
+        defaults = {
+            'customer': self.customer,
+            'status': 'pending',
+            'total_amount': 20.00,
+            'shipping_address': 'Ship Address',
+            'billing_address': 'Bill Address',
+            'payment_method': 'card',
+            'shipping_method': 'standard',
+        }
+        defaults.update(kwargs)
+        return Order.objects.create(**defaults)
+
+class PartitioningTest(OrderTestMixin, TestCase):
+    def test_month_helpers(self):
+        self.assertEqual(partitioning.month_start(date(2025, 3, 17)), date(2025, 3, 1))
+        self.assertEqual(partitioning.add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(partitioning.add_months(date(2025, 1, 1), -1), date(2024, 12, 1))
+        months = list(partitioning.iter_months(date(2025, 11, 20), date(2026, 1, 5)))
+        self.assertEqual(months, [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1)])
+
+    def test_partition_name_and_bounds(self):
+        month = date(2025, 12, 1)
+        self.assertEqual(partitioning.partition_name('orders_order', month), 'orders_order_p2025_12')
+        lower, upper = partitioning.month_bounds(month)
+        self.assertEqual((lower.year, lower.month, lower.day), (2025, 12, 1))
+        self.assertEqual((upper.year, upper.month, upper.day), (2026, 1, 1))
+
+    def test_commands_require_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command('create_order_partitions')
+        with self.assertRaises(CommandError):
+            call_command('partition_order_tables')
+
+    def test_order_item_shares_order_created_at(self):
+        order = self.create_order()
+        item = OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            quantity=2,
+            unit_price=10.00,
+            total_price=20.00
+        )
+        self.assertEqual(item.created_at, order.created_at)
+
+class OrderNumberTest(OrderTestMixin, TestCase):
+    def test_format_and_check_digit(self):
+        self.assertEqual(format_order_number(12345, prefix='ORD'), 'ORD-0000012345-5')
+        self.assertTrue(is_valid_order_number('ORD-0000012345-5'))
+        self.assertFalse(is_valid_order_number('ORD-0000012345-4'))
+        self.assertFalse(is_valid_order_number('cb0b6a73-5326-4fa9'))
+
+    def test_allocator_reserves_blocks(self):
+        allocator = OrderNumberAllocator(block_size=5)
+        # Inside a transaction the first value is reserved alone; the block follows the commit
+        with self.captureOnCommitCallbacks(execute=True):
+            first = allocator.next_value()
+        with self.assertNumQueries(0):
+            rest = [allocator.next_value() for _ in range(5)]
+        self.assertEqual(rest, list(range(first + 1, first + 6)))
+        other = OrderNumberAllocator(block_size=5)
+        self.assertEqual(other.next_value(), first + 6)
+
+    def test_block_reserved_in_rolled_back_transaction_is_dropped(self):
+        allocator = OrderNumberAllocator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    allocator.next_value()
+                    raise RuntimeError('order creation failed')
+        # The rolled back savepoint took its refill with it
+        self.assertEqual(callbacks, [])
+        other = OrderNumberAllocator(block_size=5)
+        values = [other.next_value(), allocator.next_value(), other.next_value()]
+        self.assertEqual(len(set(values)), 3)
+
+    def test_rma_and_tracking_numbers_have_their_own_sequences(self):
+        orders = OrderNumberAllocator(block_size=5)
+        rmas = OrderNumberAllocator(block_size=5, name='rma')
+        first = orders.next_value()
+        self.assertEqual(rmas.next_value(), 1)
+        self.assertEqual(OrderNumberAllocator(block_size=5).next_value(), first + 1)
+
+    def test_orders_get_sequential_numbers(self):
+        first = self.create_order()
+        second = self.create_order()
+        self.assertTrue(is_valid_order_number(first.order_number))
+        self.assertLess(first.order_number, second.order_number)
+
+class OrderSearchTest(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.create_order()
+        other = User.objects.create_user(username='someone', email='someone@shop.test', password='testpass123')
+        self.other_order = self.create_order(customer=other)
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', user_type='admin'
+        )
+        self.client.force_authenticate(self.admin)
+
+    def search(self, term):
+        response = self.client.get(reverse('order-list'), {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {order['id'] for order in response.data['results']}
+
+    def test_order_number_fast_path(self):
+        self.assertEqual(self.search(self.order.order_number), {self.order.id})
+        self.assertEqual(self.search(self.order.order_number.lower()), {self.order.id})
+        self.assertEqual(self.search('ORD-'), {self.order.id, self.other_order.id})
+
+    def test_customer_substring(self):
+        self.assertEqual(self.search('shop.test'), {self.other_order.id})
+        self.assertEqual(self.search('CUSTOM'), {self.order.id})
+
+    def test_short_terms_match_prefixes(self):
+        self.assertEqual(self.search('so'), {self.other_order.id})
+
+class ProductSnapshotTest(OrderTestMixin, APITestCase):
+    def test_order_lines_keep_product_snapshot(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(reverse('order-list'), {
+            'customer': self.customer.id,
+            'shipping_address': 'Ship Address',
+            'billing_address': 'Bill Address',
+            'payment_method': 'card',
+            'shipping_method': 'standard',
+            'items': [{'product_id': self.product.id, 'quantity': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.product.name = 'Renamed Product'
+        self.product.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['results'][0]['items'][0]
+        self.assertEqual(item['product_name'], 'Test Product')
+        self.assertEqual(item['product_sku'], 'TEST001')
+        self.assertFalse(any('marketplace_product' in query['sql'] for query in queries.captured_queries))
+
+class CustomerOrderHistoryTest(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.orders = [self.create_order(item_count=i) for i in range(3)]
+        self.client.force_authenticate(self.customer)
+
+    def test_history_is_slim_and_keyset_paginated(self):
+        response = self.client.get(reverse('order-history'), {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'id', 'order_number', 'status', 'total_amount', 'item_count', 'created_at'}
+        )
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertNotIn('page=', response.data['next'])
+
+    def test_history_cache_invalidated_on_order_write(self):
+        url = reverse('order-history')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        self.orders[0].status = 'cancelled'
+        self.orders[0].save()
+        response = self.client.get(url)
+        statuses = {order['id']: order['status'] for order in response.data['results']}
+        self.assertEqual(statuses[self.orders[0].id], 'cancelled')
+
+    def test_history_cache_invalidated_on_bulk_status_update(self):
+        from payments.models import PaymentTransaction
+        from payments.settlement import apply_payment_status
+        payment = PaymentTransaction.objects.create(
+            order=self.orders[0], amount='10.00', gateway='stripe', transaction_id='txn_1', status='pending'
+        )
+        url = reverse('order-history')
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_payment_status([payment.id], 'completed')
+        response = self.client.get(url)
+        statuses = {order['id']: order['status'] for order in response.data['results']}
+        self.assertEqual(statuses[self.orders[0].id], 'confirmed')
+
+class ArchiveTest(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = FileSystemStorage(location=tempfile.mkdtemp())
+        self.old_order = self.create_order(status='delivered')
+        Order.objects.filter(pk=self.old_order.pk).update(
+            created_at=timezone.now() - timedelta(days=800)
+        )
+        OrderItem.objects.create(
+            order=self.old_order,
+            product=self.product,
+            quantity=2,
+            unit_price=10.00,
+            total_price=20.00
+        )
+        self.recent_order = self.create_order(status='delivered')
+
+    def test_archive_moves_old_orders(self):
+        archived = archive_orders(
+            timezone.now() - timedelta(days=730),
+            batch_size=1,
+            storage=self.storage
+        )
+        self.assertEqual(archived, 1)
+        self.assertFalse(Order.objects.filter(pk=self.old_order.pk).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=self.old_order.pk).exists())
+        self.assertTrue(Order.objects.filter(pk=self.recent_order.pk).exists())
+
+        entry = ArchivedOrder.objects.get(order_id=self.old_order.pk)
+        document = load_archived_order(entry, storage=self.storage)
+        self.assertEqual(document['order_number'], self.old_order.order_number)
+        self.assertEqual(len(document['items']), 1)
+        self.assertEqual(document['items'][0]['product_sku'], 'TEST001')
+
+    def test_shipments_and_returns_are_archived_with_the_order(self):
+        from returns.models import ReturnAuthorization, ReturnItem
+        from shipping.models import Shipment, ShipmentLine, TrackingEvent
+
+        item = self.old_order.items.get()
+        shipment = Shipment.objects.create(order=self.old_order, tracking_number='TRK1', carrier='ups',
+                                           status='delivered')
+        ShipmentLine.objects.create(shipment=shipment, order_item=item, quantity=2)
+        TrackingEvent.objects.create(shipment=shipment, event_code='DL', status='delivered', occurred_at=timezone.now())
+        rma = ReturnAuthorization.objects.create(order=self.old_order, shipment=shipment, status='processed')
+        ReturnItem.objects.create(rma=rma, order_item=item, quantity=1, inspection_result='restock')
+
+        # An order with a return still open stays hot
+        open_return = self.create_order(status='delivered')
+        Order.objects.filter(pk=open_return.pk).update(created_at=timezone.now() - timedelta(days=800))
+        ReturnAuthorization.objects.create(order=open_return)
+
+        self.assertEqual(archive_orders(timezone.now() - timedelta(days=730), storage=self.storage), 1)
+        self.assertTrue(Order.objects.filter(pk=open_return.pk).exists())
+        self.assertFalse(Shipment.objects.filter(pk=shipment.pk).exists())
+
+        document = load_archived_order(ArchivedOrder.objects.get(order_id=self.old_order.pk), storage=self.storage)
+        archived_shipment = document['shipments'][0]
+        self.assertEqual(archived_shipment['tracking_number'], 'TRK1')
+        self.assertEqual([(line['order_item_id'], line['quantity']) for line in archived_shipment['lines']],
+                         [(item.id, 2)])
+        self.assertEqual([event['event_code'] for event in archived_shipment['events']], ['DL'])
+        self.assertEqual(document['returns'][0]['rma_number'], rma.rma_number)
+        self.assertEqual([(row['order_item_id'], row['quantity']) for row in document['returns'][0]['items']],
+                         [(item.id, 1)])
+
+    def test_orders_sharing_a_consolidated_shipment_stay_hot(self):
+        from shipping.models import Shipment, ShipmentLine
+
+        other = self.create_order(status='delivered')
+        Order.objects.filter(pk=other.pk).update(created_at=timezone.now() - timedelta(days=800))
+        other_item = OrderItem.objects.create(order=other, product=self.product, quantity=1, unit_price=10.00,
+                                              total_price=10.00)
+        shipment = Shipment.objects.create(order=self.old_order, tracking_number='TRK2', carrier='ups')
+        ShipmentLine.objects.create(shipment=shipment, order_item=self.old_order.items.get(), quantity=2)
+        ShipmentLine.objects.create(shipment=shipment, order_item=other_item, quantity=1)
+
+        self.assertEqual(archive_orders(timezone.now() - timedelta(days=730), storage=self.storage), 0)
+        self.assertEqual(ShipmentLine.objects.filter(shipment=shipment).count(), 2)
+
+    def test_detail_view_rehydrates_archived_order(self):
+        archive_orders(timezone.now() - timedelta(days=730), storage=self.storage)
+        self.client.force_authenticate(self.customer)
+        with self.settings(ORDER_ARCHIVE_STORAGE={
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': self.storage.location},
+        }):
+            response = self.client.get(reverse('order-detail', args=[self.old_order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['archived'])
+        self.assertEqual(response.data['total_items'], 1)
+
+    def test_staff_see_archived_orders_and_missing_segments_are_404(self):
+        archive_orders(timezone.now() - timedelta(days=730), storage=self.storage)
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', user_type='warehouse_staff'
+        )
+        self.client.force_authenticate(staff)
+        url = reverse('order-detail', args=[self.old_order.pk])
+        with self.settings(ORDER_ARCHIVE_STORAGE={
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': self.storage.location},
+        }):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.data['archived'])
+
+            self.storage.delete(ArchivedOrder.objects.get(order_id=self.old_order.pk).segment)
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_archived_order_hidden_from_other_customers(self):
+        archive_orders(timezone.now() - timedelta(days=730), storage=self.storage)
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client.force_authenticate(other)
+        response = self.client.get(reverse('order-detail', args=[self.old_order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,27 +1,33 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.cache import cache
 from django.db import transaction
-from .models import Order
-from .serializers import OrderSerializer, OrderCreateSerializer, OrderStatusUpdateSerializer
+from django.db.models import F
+from django.http import Http404
+from .models import Order, ArchivedOrder
+from .archive import load_archived_order, archived_order_representation
+from .filters import OrderSearchFilter
+from .serializers import OrderSerializer, OrderCreateSerializer, OrderStatusUpdateSerializer, OrderHistorySerializer
+from .cache import history_cache_key, history_cache_timeout
 from users.permissions import IsOwnerOrAdmin
 
 class OrderListCreateView(generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderSearchFilter, OrderingFilter]
     filterset_fields = ['status', 'customer', 'payment_method', 'shipping_method']
-    search_fields = ['order_number', 'customer__username', 'customer__email']
     ordering_fields = ['created_at', 'updated_at', 'total_amount']
     ordering = ['-created_at']
 
     def get_queryset(self):
         user = self.request.user
         if user.user_type == 'customer':
-            return Order.objects.filter(customer=user).prefetch_related('items__product')
-        return Order.objects.all().prefetch_related('items__product')
+            return Order.objects.filter(customer=user).prefetch_related('items')
+        return Order.objects.all().prefetch_related('items')
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -36,14 +42,44 @@ class OrderListCreateView(generics.ListCreateAPIView):
                 from inventory.models import Inventory
                 # For simplicity, reserve from first available warehouse
                 inventory = Inventory.objects.filter(
-                    product=item.product,
-                    available_quantity__gte=item.quantity
+                    product_id=item.product_id,
+                    quantity__gte=F('reserved_quantity') + item.quantity
                 ).first()
                 if inventory:
                     inventory.reserved_quantity += item.quantity
                     inventory.save()
+                    if order.warehouse_id is None:
+                        order.warehouse_id = inventory.warehouse_id
+            if order.warehouse_id is not None:
+                Order.objects.filter(pk=order.pk).update(warehouse_id=order.warehouse_id)
             return order
 
+class OrderHistoryPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
+
+class CustomerOrderHistoryView(generics.ListAPIView):
+    """Keyset-paginated order history of the requesting user, served from a covering index"""
+    serializer_class = OrderHistorySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderHistoryPagination
+    filter_backends = []
+
+    def get_queryset(self):
+        return Order.objects.filter(customer=self.request.user).values(
+            'id', 'order_number', 'status', 'total_amount', 'item_count', 'created_at'
+        )
+
+    def list(self, request, *args, **kwargs):
+        key = history_cache_key(request.user.id, request.query_params.urlencode())
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, history_cache_timeout())
+        return Response(data)
+
 class OrderDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
@@ -51,8 +87,27 @@ class OrderDetailView(generics.RetrieveUpdateAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.user_type == 'customer':
-            return Order.objects.filter(customer=user).prefetch_related('items__product')
-        return Order.objects.all().prefetch_related('items__product')
+            return Order.objects.filter(customer=user).prefetch_related('items')
+        return Order.objects.all().prefetch_related('items')
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Fall back to the archive for orders moved out of the hot tables
+            entry = ArchivedOrder.objects.filter(order_id=kwargs['pk']).first()
+            if entry is None:
+                raise
+            # Same visibility as get_queryset: customers only see their own orders
+            if request.user.user_type == 'customer' and entry.customer_id != request.user.id:
+                raise
+            try:
+                document = load_archived_order(entry)
+            except OSError:
+                raise Http404('Archived order is missing from storage')
+            if document is None:
+                raise
+            return Response(archived_order_representation(document))
 
 @api_view(['PUT'])
 @permission_classes([permissions.IsAuthenticated, IsOwnerOrAdmin])
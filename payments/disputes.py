@@ -0,0 +1,211 @@
+"""
+Disputes and chargebacks.
+
+Gateway dispute reports are streamed through the settlement CSV reader (see
+payments.settlement) and upserted into Dispute in batched multi-row INSERT
+... ON CONFLICT statements on (gateway, dispute_id), so a re-imported report
+updates its disputes in place. Afterwards, set-based UPDATEs over the rows the
+import touched link them to their payments through the (gateway,
+transaction_id) index, stamp newly resolved ones and refund the payments of
+lost disputes (keeping rollups and ledger current). A payment has no partially
+refunded state, so a lost dispute for less than its payment leaves the payment
+alone and is counted (and flagged as partial_chargeback) for a manual refund.
+
+Open disputes are indexed on evidence_due_by, so the "due within N hours"
+queue is a range scan of that partial index.
+
+Evidence files are written to DISPUTE_EVIDENCE_STORAGE; a DisputeEvidence
+row only keeps the storage key.
+"""
+
+import itertools
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.module_loading import import_string
+from django.utils.text import get_valid_filename
+
+from .models import Dispute, DisputeEvidence, PaymentTransaction
+from .settlement import apply_payment_status, parse_amount, read_csv
+
+HEADER_ALIASES = {
+    'dispute_id': ('dispute_id', 'dispute', 'case_id', 'case_number', 'chargeback_id', 'id'),
+    'transaction_id': ('transaction_id', 'txn_id', 'charge', 'charge_id', 'payment_intent', 'transaction'),
+    'amount': ('amount', 'disputed_amount', 'chargeback_amount'),
+    'currency': ('currency', 'currency_code'),
+    'status': ('status', 'state', 'dispute_status'),
+    'reason': ('reason', 'reason_code', 'category'),
+    'evidence_due_by': ('evidence_due_by', 'due_by', 'respond_by', 'response_due_date', 'deadline'),
+}
+REQUIRED_COLUMNS = ('dispute_id', 'transaction_id', 'amount', 'status')
+# Gateway dispute states mapped to (status, outcome)
+STATUS_ALIASES = {
+    'open': ('open', ''), 'needs_response': ('open', ''), 'warning_needs_response': ('open', ''),
+    'inquiry': ('open', ''), 'investigating': ('investigating', ''), 'under_review': ('investigating', ''),
+    'warning_under_review': ('investigating', ''), 'won': ('resolved', 'won'), 'lost': ('resolved', 'lost'),
+    'accepted': ('resolved', 'accepted'), 'charge_refunded': ('closed', ''), 'closed': ('closed', ''),
+    'warning_closed': ('closed', ''),
+}
+IMPORT_CHUNK_SIZE = 5000
+
+DEFAULT_EVIDENCE_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': settings.BASE_DIR / 'evidence'},
+}
+
+
+class DisputeError(Exception):
+    pass
+
+
+def get_evidence_storage():
+    config = getattr(settings, 'DISPUTE_EVIDENCE_STORAGE', DEFAULT_EVIDENCE_STORAGE)
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def _parse_deadline(value):
+    value = value.strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value), tz=dt_timezone.utc)
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        # A due date means the end of that day
+        moment = datetime.combine(day, time.max)
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def read_dispute_report(stream, gateway):
+    """Dispute fields the report provides, and a lazy iterator of an unsaved Dispute per line (None if invalid)"""
+    columns, rows = read_csv(stream, HEADER_ALIASES, REQUIRED_COLUMNS, error=DisputeError)
+    optional = {column: columns.get(column) for column in ('currency', 'reason', 'evidence_due_by')}
+    fields = ['transaction_id', 'amount', 'status', 'outcome'] + [
+        column for column, index in optional.items() if index is not None
+    ]
+
+    def disputes():
+        for _, row in rows:
+            try:
+                dispute_id = row[columns['dispute_id']].strip()
+                transaction_id = row[columns['transaction_id']].strip()
+                amount = parse_amount(row[columns['amount']])
+                state = STATUS_ALIASES.get(row[columns['status']].strip().lower())
+                values = {column: row[index] if index is not None else '' for column, index in optional.items()}
+                deadline = _parse_deadline(values['evidence_due_by'])
+            except (IndexError, InvalidOperation, ValueError, OverflowError):
+                yield None
+                continue
+            if not (dispute_id and transaction_id and state):
+                yield None
+                continue
+            yield Dispute(
+                gateway=gateway,
+                dispute_id=dispute_id[:100],
+                transaction_id=transaction_id[:100],
+                amount=amount,
+                currency=values['currency'].strip().upper()[:3] or 'USD',
+                reason=values['reason'].strip()[:100],
+                status=state[0],
+                outcome=state[1],
+                evidence_due_by=deadline,
+            )
+
+    return fields, disputes()
+
+
+def _upsert(disputes, fields):
+    # Postgres rejects one statement touching a row twice, so the last line of a dispute wins
+    unique = {dispute.dispute_id: dispute for dispute in disputes}
+    # Columns the report leaves out keep their stored values
+    Dispute.objects.bulk_create(
+        unique.values(), update_conflicts=True, unique_fields=['gateway', 'dispute_id'],
+        update_fields=fields + ['updated_at'],
+    )
+    return len(unique)
+
+
+def import_dispute_report(stream, gateway):
+    """Load a gateway dispute report in one transaction; returns line, import and match counts"""
+    started = timezone.now()
+    counts = {
+        'line_count': 0, 'imported_count': 0, 'invalid_count': 0, 'unmatched_count': 0, 'refunded_count': 0,
+        'partial_count': 0,
+    }
+    fields, rows = read_dispute_report(stream, gateway)
+    with transaction.atomic():
+        while batch := list(itertools.islice(rows, IMPORT_CHUNK_SIZE)):
+            disputes = [dispute for dispute in batch if dispute is not None]
+            counts['line_count'] += len(batch)
+            counts['invalid_count'] += len(batch) - len(disputes)
+            if disputes:
+                counts['imported_count'] += _upsert(disputes, fields)
+
+        imported = Dispute.objects.filter(gateway=gateway, updated_at__gte=started)
+        imported.update(payment_id=Subquery(
+            PaymentTransaction.objects.filter(
+                gateway=gateway, transaction_id=OuterRef('transaction_id')
+            ).values('id')[:1]
+        ))
+        imported.filter(status__in=['resolved', 'closed'], resolved_at__isnull=True).update(resolved_at=started)
+        imported.filter(status__in=Dispute.OPEN_STATUSES).update(resolved_at=None)
+        counts['unmatched_count'] = imported.filter(payment__isnull=True).count()
+        # A lost chargeback is money returned to the customer
+        lost = imported.filter(outcome='lost', payment__isnull=False).exclude(payment__status='refunded')
+        counts['partial_count'] = lost.filter(amount__lt=F('payment__amount')).count()
+        counts['refunded_count'] = apply_payment_status(
+            lost.filter(amount__gte=F('payment__amount')).values('payment_id'), 'refunded'
+        )
+    return counts
+
+
+def due_within(hours, disputes=None):
+    """Open disputes whose evidence is due in the next hours, soonest first; a scan of the deadline index"""
+    disputes = Dispute.objects.all() if disputes is None else disputes
+    now = timezone.now()
+    return disputes.filter(
+        status__in=Dispute.OPEN_STATUSES, evidence_due_by__gte=now, evidence_due_by__lt=now + timedelta(hours=hours)
+    ).order_by('evidence_due_by')
+
+
+def resolve_dispute(dispute, outcome, resolution='', user=None):
+    """
+    Close an open dispute by hand; losing it refunds the payment, unless the
+    dispute covers only part of it (see Dispute.is_partial)
+    """
+    with transaction.atomic():
+        status = Dispute.objects.select_for_update().values_list('status', flat=True).get(pk=dispute.pk)
+        if status not in Dispute.OPEN_STATUSES:
+            raise DisputeError(f"Dispute {dispute.dispute_id} is already {status}")
+        dispute.status = 'resolved'
+        dispute.outcome = outcome
+        dispute.resolution = resolution
+        dispute.resolved_by = user
+        dispute.resolved_at = timezone.now()
+        dispute.save()
+        if outcome == 'lost' and dispute.payment_id and not dispute.is_partial:
+            apply_payment_status([dispute.payment_id], 'refunded')
+    return dispute
+
+
+def store_evidence(dispute, upload, user=None):
+    """Write an uploaded file to evidence storage and record its key"""
+    name = f'disputes/{dispute.id}/{uuid.uuid4().hex}-{get_valid_filename(upload.name)}'
+    key = get_evidence_storage().save(name, upload)
+    return DisputeEvidence.objects.create(
+        dispute=dispute,
+        file_name=upload.name[:255],
+        storage_key=key,
+        content_type=getattr(upload, 'content_type', '') or '',
+        size=upload.size,
+        uploaded_by=user,
+    )
@@ -0,0 +1,129 @@
+"""
+Exchange rates for multi-currency reporting.
+
+FxRate holds one rate per currency and day, in units of REPORTING_CURRENCY.
+A day without its own rate (weekends, holidays) uses the latest earlier one.
+
+Reports convert inside their aggregate: converted() multiplies an amount
+column by the rate of the row's (currency, day), looked up on the
+(currency, day) unique index, so a multi-currency rollup stays one query.
+Rows without a rate convert to NULL and drop out of the sum; reports list
+their currencies (see unrated()) so a partial total is never taken as whole.
+Python callers use fx_rate(), which answers from a per-process copy of the
+table that is reloaded when load_rates bumps the version key in the cache
+(once its transaction commits).
+"""
+
+import bisect
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value, When
+
+from .models import FxRate
+
+VERSION_KEY = 'payments:fx:version'
+RATE_FIELD = DecimalField(max_digits=18, decimal_places=8)
+
+
+class FxError(Exception):
+    pass
+
+
+def reporting_currency():
+    return getattr(settings, 'REPORTING_CURRENCY', 'USD')
+
+
+def rate_expression(currency='currency', day='day'):
+    """Rate of the row's currency on the row's day (or the latest day before it); NULL if none is loaded"""
+    latest = FxRate.objects.filter(
+        currency=OuterRef(currency), day__lte=OuterRef(day)
+    ).order_by('-day').values('rate')[:1]
+    return Case(
+        When(**{currency: reporting_currency()}, then=Value(Decimal(1), output_field=RATE_FIELD)),
+        default=Subquery(latest, output_field=RATE_FIELD),
+        output_field=RATE_FIELD,
+    )
+
+
+def converted(amount, currency='currency', day='day'):
+    """An amount column converted to the reporting currency, for use inside Sum() and friends"""
+    return ExpressionWrapper(
+        F(amount) * rate_expression(currency, day), output_field=DecimalField(max_digits=20, decimal_places=2)
+    )
+
+
+def unrated(queryset, currency='currency', day='day'):
+    """Rows of queryset with no rate for their (currency, day); converted() leaves them out of sums"""
+    return queryset.annotate(fx_rate=rate_expression(currency, day)).filter(fx_rate__isnull=True)
+
+
+class RateTable:
+    def __init__(self, version, rates):
+        self.version = version
+        # {currency: ([days ascending], [rates])}
+        self.rates = rates
+
+    @classmethod
+    def load(cls, version=None):
+        rates = {}
+        for currency, day, rate in FxRate.objects.order_by('currency', 'day').values_list('currency', 'day', 'rate'):
+            days, values = rates.setdefault(currency, ([], []))
+            days.append(day)
+            values.append(rate)
+        return cls(version, rates)
+
+    def rate(self, currency, day):
+        if currency == reporting_currency():
+            return Decimal(1)
+        days, values = self.rates.get(currency, ((), ()))
+        index = bisect.bisect_right(days, day)
+        if not index:
+            raise FxError(f"No {currency} rate on or before {day}")
+        return values[index - 1]
+
+
+_table = None
+
+
+def get_rate_table():
+    """The process-wide rate table, reloaded when rates have been loaded since"""
+    global _table
+    version = cache.get_or_set(VERSION_KEY, 1, timeout=None)
+    if _table is None or _table.version != version:
+        _table = RateTable.load(version)
+    return _table
+
+
+def fx_rate(currency, day):
+    return get_rate_table().rate(currency, day)
+
+
+def convert(amount, currency, day):
+    """An amount in the reporting currency, rounded to cents"""
+    return (Decimal(amount) * fx_rate(currency, day)).quantize(Decimal('0.01'))
+
+
+def invalidate_rates():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # No version stored yet, so no process has loaded the table
+        pass
+
+
+def load_rates(rows, source=''):
+    """Upsert (day, currency, rate) rows; returns the number stored"""
+    rates = [
+        FxRate(currency=currency.strip().upper(), day=day, rate=Decimal(rate), source=source)
+        for day, currency, rate in rows
+    ]
+    FxRate.objects.bulk_create(
+        rates, batch_size=1000, update_conflicts=True,
+        unique_fields=['currency', 'day'], update_fields=['rate', 'source'],
+    )
+    # Bumped once committed, or another process could reload the old rows under the new version
+    transaction.on_commit(invalidate_rates)
+    return len(rates)
@@ -0,0 +1,350 @@
+"""
+Payment gateway clients.
+
+Each gateway is reached through a PaymentGateway chosen from the
+PAYMENT_GATEWAYS setting (dotted paths), falling back to
+PAYMENT_DEFAULT_GATEWAY. HTTPGateway talks JSON over an httpx.AsyncClient
+whose keep-alive pool lives as long as the process: clients are opened once
+on a background event loop and synchronous views submit calls to it with
+run_gateway_call. Every gateway has its own timeouts and a circuit breaker
+that fails calls fast while the gateway keeps erroring.
+
+StubGateway runs the same client against an in-process stub, and
+StubGatewayServer serves the stub over local HTTP, so checkout latency and
+throughput can be measured without network access (see the
+benchmark_gateway command).
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Gateway charge statuses mapped to PaymentTransaction statuses
+CHARGE_STATUSES = {
+    'succeeded': 'completed', 'completed': 'completed', 'captured': 'completed',
+    'pending': 'pending', 'processing': 'pending',
+    'failed': 'failed', 'declined': 'failed',
+}
+
+
+@dataclass(frozen=True)
+class ChargeResult:
+    transaction_id: str
+    status: str
+    message: str = ''
+
+
+class GatewayError(Exception):
+    pass
+
+
+class GatewayUnavailable(GatewayError):
+    """The circuit is open; the call was not attempted"""
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_timeout seconds, then lets one trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class PaymentGateway:
+    """Base class for gateway integrations; subclasses implement _charge()"""
+    # Seconds to wait for a connection and for the whole request
+    connect_timeout = 2.0
+    timeout = 10.0
+    # Keep-alive pool size
+    max_connections = 20
+    # Circuit breaker settings
+    failure_threshold = 5
+    reset_timeout = 30.0
+
+    def __init__(self, name, **options):
+        self.name = name
+        for option, value in options.items():
+            setattr(self, option, value)
+        self.breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def _charge(self, amount, currency, reference, details, idempotency_key):
+        raise NotImplementedError
+
+    async def charge(self, amount, currency, reference, details=None, idempotency_key=None):
+        """
+        Charge amount for an order reference; declines are results, outages
+        raise GatewayError. Retrying with the same idempotency_key returns the
+        original charge instead of charging again.
+        """
+        if not self.breaker.allow():
+            raise GatewayUnavailable(f"{self.name} is unavailable, retry later")
+        succeeded = False
+        try:
+            result = await self._charge(amount, currency, reference, details or {}, idempotency_key)
+            succeeded = True
+        finally:
+            # Any error, not only GatewayError, has to end a half-open trial
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        return result
+
+
+class HTTPGateway(PaymentGateway):
+    """
+    Generic JSON charge API: POST {"amount", "currency", "reference"} to
+    <endpoint>/charges with an Idempotency-Key header and read {"id",
+    "status", "message"} back. 402 and other 4xx answers are declines;
+    timeouts, transport errors, 5xx answers and malformed bodies count
+    against the circuit breaker.
+    """
+    endpoint = None
+    api_key = None
+    transport = None
+
+    async def open(self):
+        if not self.endpoint:
+            raise GatewayError(f"No endpoint configured for {self.name}")
+        headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else {}
+        self.client = httpx.AsyncClient(
+            base_url=self.endpoint,
+            headers=headers,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            transport=self.transport,
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def _charge(self, amount, currency, reference, details, idempotency_key):
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else {}
+        try:
+            response = await self.client.post(
+                '/charges',
+                json={'amount': str(amount), 'currency': currency, 'reference': reference, 'details': details},
+                headers=headers,
+            )
+        except httpx.HTTPError as exc:
+            raise GatewayError(f"{self.name} charge request failed: {exc!r}") from exc
+        if response.status_code >= 500:
+            raise GatewayError(f"{self.name} answered {response.status_code}")
+        try:
+            body = response.json()
+        except ValueError as exc:
+            raise GatewayError(f"{self.name} sent an invalid response") from exc
+        if not isinstance(body, dict):
+            raise GatewayError(f"{self.name} sent an invalid response")
+        if response.status_code >= 400:
+            # Declines without a charge id still need a unique transaction id
+            transaction_id = str(body.get('id') or f'declined_{uuid.uuid4().hex}')
+            return ChargeResult(transaction_id, 'failed', str(body.get('message', 'Declined')))
+        if not body.get('id'):
+            raise GatewayError(f"{self.name} sent a charge without an id")
+        return ChargeResult(
+            str(body['id']), CHARGE_STATUSES.get(body.get('status'), 'pending'), str(body.get('message', ''))
+        )
+
+
+class StubProcessor:
+    """
+    Stand-in gateway logic shared by StubGateway and StubGatewayServer.
+    Amounts ending in .02 are declined, like a test card, and a repeated
+    idempotency key gets the first answer again.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.charges = 0
+        self.answers = {}
+        self._lock = threading.Lock()
+
+    def charge(self, payload, idempotency_key=None):
+        """(status code, body) for a charge request payload"""
+        with self._lock:
+            if idempotency_key in self.answers:
+                return self.answers[idempotency_key]
+            self.charges += 1
+        try:
+            amount = Decimal(payload['amount'])
+        except (KeyError, ArithmeticError, TypeError):
+            return 400, {'message': 'Invalid amount'}
+        transaction_id = f"stub_{uuid.uuid4().hex}"
+        if amount % 1 == Decimal('0.02'):
+            answer = 402, {'id': transaction_id, 'status': 'declined', 'message': 'Card declined'}
+        else:
+            answer = 200, {'id': transaction_id, 'status': 'succeeded'}
+        if idempotency_key:
+            with self._lock:
+                answer = self.answers.setdefault(idempotency_key, answer)
+        return answer
+
+
+class StubGateway(HTTPGateway):
+    """HTTPGateway answered in-process by a StubProcessor, without sockets"""
+    endpoint = 'http://stub-gateway'
+    latency = 0.0
+
+    async def open(self):
+        processor = StubProcessor()
+
+        async def handle(request):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            status_code, body = processor.charge(
+                json.loads(request.content), request.headers.get('Idempotency-Key')
+            )
+            return httpx.Response(status_code, json=body)
+
+        self.transport = httpx.MockTransport(handle)
+        await super().open()
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    """Local HTTP server speaking the HTTPGateway protocol; start() serves it from a thread"""
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0):
+        self.processor = StubProcessor(latency)
+        super().__init__(address, StubGatewayHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.server.processor.latency:
+            time.sleep(self.server.processor.latency)
+        status_code, body = self.server.processor.charge(payload, self.headers.get('Idempotency-Key'))
+        content = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_loop = None
+_loop_lock = threading.Lock()
+_gateways = {}
+
+
+def _event_loop():
+    """The process-wide loop gateway clients live on, started on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='payment-gateways', daemon=True).start()
+        return _loop
+
+
+def run_gateway_call(coroutine):
+    """Run a gateway coroutine on the shared loop from synchronous code"""
+    return asyncio.run_coroutine_threadsafe(coroutine, _event_loop()).result()
+
+
+def load_gateway(name):
+    """Instantiate the configured gateway for a gateway code, unopened"""
+    configured = getattr(settings, 'PAYMENT_GATEWAYS', {}).get(name.lower())
+    if configured is None:
+        default = getattr(settings, 'PAYMENT_DEFAULT_GATEWAY', None)
+        if default is None:
+            raise GatewayError(f"Payment gateway {name} is not configured")
+        configured = {'GATEWAY': default}
+    elif isinstance(configured, str):
+        configured = {'GATEWAY': configured}
+    return import_string(configured['GATEWAY'])(name.lower(), **configured.get('OPTIONS', {}))
+
+
+def get_gateway(name):
+    """The process-wide, opened gateway for a gateway code"""
+    name = name.lower()
+    with _loop_lock:
+        gateway = _gateways.get(name)
+    if gateway is None:
+        opened = load_gateway(name)
+        run_gateway_call(opened.open())
+        with _loop_lock:
+            gateway = _gateways.setdefault(name, opened)
+        if gateway is not opened:
+            # Another thread opened the gateway first
+            run_gateway_call(opened.close())
+    return gateway
+
+
+def charge(gateway_name, amount, currency, reference, details=None, idempotency_key=None):
+    """Charge through the named gateway from synchronous code"""
+    gateway = get_gateway(gateway_name)
+    return run_gateway_call(gateway.charge(amount, currency, reference, details, idempotency_key))
@@ -0,0 +1,185 @@
+"""
+Double-entry payment ledger.
+
+Money movements are journal entries whose postings (positive debits,
+negative credits) sum to zero per entry. Entries are collected by a
+LedgerWriter and written per flush in one transaction: the touched accounts
+are locked in id order, entries and postings go in as multi-row INSERTs and
+the account balances are updated in one statement. Each posting stores the
+running balance of its account, so the balance at any moment is the last
+posting before it, one seek on (account, posted_at, id).
+
+Payment status changes are posted from the same places that keep the
+revenue rollups current (see payments.rollups): captures debit the gateway's
+cash account and credit sales, refunds move the amount back out of cash
+through the refunds account, and moves back (a captured payment that fails
+or returns to pending, a refund that is undone) are posted as reversals.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import JournalEntry, LedgerAccount, Posting
+
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 5000
+
+
+class LedgerError(Exception):
+    pass
+
+
+def cash_account(gateway, currency):
+    return (f'cash:{gateway.lower()}:{currency}', f'Cash held at {gateway}', 'asset', currency)
+
+
+def sales_account(currency):
+    return (f'revenue:sales:{currency}', 'Sales revenue', 'revenue', currency)
+
+
+def refunds_account(currency):
+    return (f'expense:refunds:{currency}', 'Refunds and chargebacks', 'expense', currency)
+
+
+class LedgerWriter:
+    """
+    Collects journal entries and writes them in batches; use as a context
+    manager to flush the remainder on exit. Accounts are given as
+    (code, name, account_type, currency) and created on first use.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.pending = []
+        self.account_ids = {}
+        self.posted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, entry_type, lines, payment_id=None, reference='', memo=''):
+        """Queue an entry; lines are (account, amount) pairs with debits positive"""
+        totals = {}
+        for (_, _, _, currency), amount in lines:
+            totals[currency] = totals.get(currency, 0) + Decimal(amount)
+        if any(totals.values()):
+            raise LedgerError(f"Unbalanced {entry_type} entry {reference}: {totals}")
+        self.pending.append((entry_type, lines, payment_id, reference, memo))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def _resolve_accounts(self, accounts):
+        missing = {account for account in accounts if account[0] not in self.account_ids}
+        if not missing:
+            return
+        LedgerAccount.objects.bulk_create([
+            LedgerAccount(code=code, name=name, account_type=account_type, currency=currency)
+            for code, name, account_type, currency in missing
+        ], ignore_conflicts=True)
+        self.account_ids.update(
+            LedgerAccount.objects.filter(code__in=[account[0] for account in missing]).values_list('code', 'id')
+        )
+
+    def flush(self):
+        if not self.pending:
+            return 0
+        pending, self.pending = self.pending, []
+        self._resolve_accounts({account for entry in pending for account, _ in entry[1]})
+        account_ids = sorted({self.account_ids[account[0]] for entry in pending for account, _ in entry[1]})
+
+        with transaction.atomic():
+            # Locking in id order keeps concurrent writers from deadlocking
+            accounts = {
+                account.id: account
+                for account in LedgerAccount.objects.select_for_update().filter(id__in=account_ids).order_by('id')
+            }
+            posted_at = timezone.now()
+            entries = JournalEntry.objects.bulk_create([
+                JournalEntry(
+                    entry_type=entry_type, payment_id=payment_id, reference=reference, memo=memo, posted_at=posted_at
+                )
+                for entry_type, _, payment_id, reference, memo in pending
+            ])
+            postings = []
+            for entry, (_, lines, _, _, _) in zip(entries, pending):
+                for (code, _, _, _), amount in lines:
+                    account = accounts[self.account_ids[code]]
+                    account.balance += Decimal(amount)
+                    postings.append(Posting(
+                        entry=entry, account=account, amount=amount, balance=account.balance, posted_at=posted_at
+                    ))
+            Posting.objects.bulk_create(postings, batch_size=self.batch_size)
+            LedgerAccount.objects.bulk_update(accounts.values(), ['balance'], batch_size=self.batch_size)
+        self.posted += len(entries)
+        return len(entries)
+
+
+def status_entries(gateway, currency, amount, old_status, new_status):
+    """
+    Journal entries (entry_type, lines) implied by a payment status change.
+    A completed payment holds a capture and a refunded one a capture and a
+    refund; moving between statuses posts what the new status holds that the
+    old one did not, and reverses what it no longer holds, refund first.
+    """
+    cash, sales, refunds = cash_account(gateway, currency), sales_account(currency), refunds_account(currency)
+    was_captured = old_status in ('completed', 'refunded')
+    is_captured = new_status in ('completed', 'refunded')
+    entries = []
+    if old_status == 'refunded' and new_status != 'refunded':
+        entries.append(('reversal', [(cash, amount), (refunds, -amount)]))
+    if is_captured and not was_captured:
+        entries.append(('capture', [(cash, amount), (sales, -amount)]))
+    elif was_captured and not is_captured:
+        entries.append(('reversal', [(sales, amount), (cash, -amount)]))
+    if new_status == 'refunded' and old_status != 'refunded':
+        entries.append(('refund', [(refunds, amount), (cash, -amount)]))
+    return entries
+
+
+def post_status_change(payments, payment_status, writer=None):
+    """Post entries for moving a payment queryset to payment_status; call before the UPDATE"""
+    rows = payments.exclude(status=payment_status).values_list(
+        'id', 'gateway', 'currency', 'amount', 'status', 'transaction_id'
+    ).order_by('id')
+    last_id = 0
+    with (writer or LedgerWriter()) as ledger:
+        # Keyset chunks rather than a cursor, since the writer flushes between them
+        while chunk := list(rows.filter(id__gt=last_id)[:READ_CHUNK_SIZE]):
+            for payment_id, gateway, currency, amount, old_status, transaction_id in chunk:
+                for entry_type, lines in status_entries(gateway, currency, amount, old_status, payment_status):
+                    ledger.add(entry_type, lines, payment_id=payment_id, reference=transaction_id)
+            last_id = chunk[-1][0]
+
+
+def post_payment(payment, old_status=None):
+    """Post entries for a single payment that was created (old_status None) or changed status"""
+    with LedgerWriter() as ledger:
+        for entry_type, lines in status_entries(
+            payment.gateway, payment.currency, payment.amount, old_status, payment.status
+        ):
+            ledger.add(entry_type, lines, payment_id=payment.id, reference=payment.transaction_id)
+
+
+def balance_at(account, moment):
+    """Balance of an account at a moment: its last posting's running balance"""
+    balance = Posting.objects.filter(account=account, posted_at__lte=moment).order_by(
+        '-posted_at', '-id'
+    ).values_list('balance', flat=True).first()
+    return balance if balance is not None else Decimal('0.00')
+
+
+def accounts_with_balance_at(moment, accounts=None):
+    """Accounts annotated with balance_at, one index seek per account in a single query"""
+    accounts = LedgerAccount.objects.all() if accounts is None else accounts
+    return accounts.annotate(balance_at=Subquery(
+        Posting.objects.filter(account=OuterRef('pk'), posted_at__lte=moment).order_by(
+            '-posted_at', '-id'
+        ).values('balance')[:1]
+    ))
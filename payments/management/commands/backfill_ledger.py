@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from payments.ledger import LedgerWriter, status_entries
+from payments.models import PaymentTransaction
+
+CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Post ledger entries for completed and refunded payments that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Entries written per transaction')
+
+    def handle(self, *args, **options):
+        payments = PaymentTransaction.objects.filter(
+            status__in=['completed', 'refunded'], journal_entries__isnull=True
+        ).values_list('id', 'gateway', 'currency', 'amount', 'status', 'transaction_id').order_by('id')
+
+        last_id = 0
+        with LedgerWriter(batch_size=options['batch_size']) as ledger:
+            while chunk := list(payments.filter(id__gt=last_id)[:CHUNK_SIZE]):
+                for payment_id, gateway, currency, amount, payment_status, transaction_id in chunk:
+                    for entry_type, lines in status_entries(gateway, currency, amount, None, payment_status):
+                        ledger.add(entry_type, lines, payment_id=payment_id, reference=transaction_id)
+                last_id = chunk[-1][0]
+        self.stdout.write(self.style.SUCCESS(f"Posted {ledger.posted} journal entries"))
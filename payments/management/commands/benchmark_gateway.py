@@ -0,0 +1,81 @@
+import asyncio
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.gateways import GatewayError, HTTPGateway, StubGatewayServer
+
+
+class Command(BaseCommand):
+    help = 'Measure charge latency and throughput of a gateway client, by default against a local stub gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Number of charges to send')
+        parser.add_argument('--concurrency', type=int, default=50, help='Charges in flight at once')
+        parser.add_argument(
+            '--endpoint',
+            help='Gateway endpoint to charge (default: start a local stub gateway server)'
+        )
+        parser.add_argument(
+            '--stub-latency', type=float, default=0.02,
+            help='Seconds the local stub gateway takes per charge'
+        )
+        parser.add_argument('--max-connections', type=int, default=HTTPGateway.max_connections)
+        parser.add_argument('--timeout', type=float, default=HTTPGateway.timeout)
+
+    def handle(self, *args, **options):
+        server = None
+        endpoint = options['endpoint']
+        if endpoint is None:
+            server = StubGatewayServer(latency=options['stub_latency']).start()
+            endpoint = server.url
+        gateway = HTTPGateway(
+            'benchmark', endpoint=endpoint, max_connections=options['max_connections'], timeout=options['timeout']
+        )
+        try:
+            latencies, failures, elapsed = asyncio.run(
+                self.run(gateway, options['requests'], options['concurrency'])
+            )
+        except GatewayError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if server is not None:
+                server.stop()
+
+        if latencies:
+            latencies.sort()
+            self.stdout.write(
+                f"p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, "
+                f"max {latencies[-1] * 1000:.1f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(latencies)} charges in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s), "
+            f"{failures} errors, circuit {gateway.breaker.state}"
+        ))
+
+    async def run(self, gateway, requests, concurrency):
+        await gateway.open()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        failures = 0
+
+        async def one(number):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await gateway.charge(Decimal('10.00'), 'USD', f'BENCH-{number}')
+                except GatewayError:
+                    failures += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(one(number) for number in range(requests)))
+        finally:
+            await gateway.close()
+        return latencies, failures, time.perf_counter() - started
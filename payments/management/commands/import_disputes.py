@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.disputes import DisputeError, import_dispute_report
+
+
+class Command(BaseCommand):
+    help = 'Import a gateway dispute report CSV and link the disputes to their payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dispute report CSV file')
+        parser.add_argument('--gateway', required=True, help='Gateway the report comes from')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as stream:
+                counts = import_dispute_report(stream, options['gateway'])
+        except DisputeError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {counts['imported_count']} disputes from {counts['line_count']} lines: "
+            f"{counts['invalid_count']} invalid, {counts['unmatched_count']} unmatched, "
+            f"{counts['refunded_count']} payments refunded"
+        ))
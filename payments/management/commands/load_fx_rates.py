@@ -0,0 +1,46 @@
+import csv
+import io
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from payments.fx import load_rates
+
+
+class Command(BaseCommand):
+    help = 'Load daily exchange rates from a CSV file or feed URL with date,currency,rate columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='CSV file path or http(s) URL')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if source.startswith(('http://', 'https://')):
+            try:
+                response = requests.get(source, timeout=30)
+                response.raise_for_status()
+            except requests.RequestException as exc:
+                raise CommandError(f"Could not fetch {source}: {exc}")
+            rows = self.parse(io.StringIO(response.text))
+        else:
+            with open(source, newline='') as handle:
+                rows = self.parse(handle)
+
+        with transaction.atomic():
+            count = load_rates(rows, source=source[:100])
+        self.stdout.write(self.style.SUCCESS(f"Loaded {count} exchange rates"))
+
+    def parse(self, handle):
+        rows = []
+        try:
+            for row in csv.DictReader(handle):
+                rate = Decimal(row['rate'].strip())
+                if not rate.is_finite() or rate <= 0:
+                    raise ValueError(f"invalid rate {row['rate']!r}")
+                rows.append((date.fromisoformat(row['date'].strip()), row['currency'], rate))
+        except (KeyError, ValueError, AttributeError, InvalidOperation) as exc:
+            raise CommandError(f"Invalid rate file: {exc!r}")
+        return rows
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from payments.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily revenue rollups from payment transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD, default: the first payment)')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD, default: today and later)')
+
+    def handle(self, *args, **options):
+        days = {}
+        for option in ('start', 'end'):
+            value = options[option]
+            days[option] = parse_date(value) if value else None
+            if value and days[option] is None:
+                raise CommandError(f"Invalid {option} date: {value}")
+
+        count = rebuild_rollups(days['start'], days['end'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} revenue rollups"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.settlement import process_settlement_file
+
+
+class Command(BaseCommand):
+    help = 'Load a gateway settlement CSV and reconcile it against payment transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Settlement CSV file')
+        parser.add_argument('--gateway', required=True, help='Gateway the settlement file comes from')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as stream:
+            settlement = process_settlement_file(stream, options['gateway'], options['path'])
+
+        if settlement.status == 'failed':
+            raise CommandError(settlement.error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {settlement.line_count} lines: {settlement.matched_count} matched, "
+            f"{settlement.updated_count} status updates, {settlement.mismatch_count} mismatches"
+        ))
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymenttransaction',
+            name='transaction_id',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='SettlementFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gateway', models.CharField(max_length=50)),
+                ('name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='processing', max_length=20)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('matched_count', models.PositiveIntegerField(default=0)),
+                ('updated_count', models.PositiveIntegerField(default=0)),
+                ('mismatch_count', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SettlementLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_number', models.PositiveIntegerField()),
+                ('transaction_id', models.CharField(max_length=100)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('currency', models.CharField(blank=True, max_length=3)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('result', models.CharField(choices=[('pending', 'Pending'), ('matched', 'Matched'), ('status_updated', 'Status updated'), ('missing', 'Missing transaction'), ('amount_mismatch', 'Amount mismatch'), ('currency_mismatch', 'Currency mismatch'), ('invalid', 'Invalid line')], default='pending', max_length=20)),
+                ('payment', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='payments.paymenttransaction')),
+                ('settlement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='payments.settlementfile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['settlement', 'result'], name='settlement_line_result_idx'), models.Index(fields=['settlement', 'transaction_id'], name='settlement_line_txn_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:30
+
+from django.db import migrations, models, transaction
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+# A duplicate row may carry a later gateway update than the oldest one
+STATUS_RANK = {'pending': 0, 'failed': 1, 'completed': 2, 'refunded': 3}
+CONSTRAINT = models.UniqueConstraint(fields=['gateway', 'transaction_id'], name='payment_gateway_txn_unique')
+
+
+def dedupe_transactions(apps, schema_editor):
+    """
+    Resolve duplicate (gateway, transaction_id) pairs, BATCH_SIZE groups per
+    transaction. The oldest row of a group is kept and takes the most advanced
+    status of its copies for the same order, which are then deleted; copies
+    attached to other orders are kept for review with their id appended to the
+    transaction id.
+    """
+    PaymentTransaction = apps.get_model('payments', 'PaymentTransaction')
+    groups = list(
+        PaymentTransaction.objects.values_list('gateway', 'transaction_id').annotate(n=Count('id')).filter(
+            n__gt=1
+        ).values_list('gateway', 'transaction_id').order_by()
+    )
+    for start in range(0, len(groups), BATCH_SIZE):
+        batch = set(groups[start:start + BATCH_SIZE])
+        with transaction.atomic(using=schema_editor.connection.alias):
+            rows = PaymentTransaction.objects.filter(
+                transaction_id__in={transaction_id for _, transaction_id in batch}
+            ).order_by('id')
+            kept = {}
+            delete_ids = []
+            renamed = []
+            for payment in rows:
+                key = (payment.gateway, payment.transaction_id)
+                if key not in batch:
+                    continue
+                if key not in kept:
+                    kept[key] = payment
+                elif payment.order_id == kept[key].order_id:
+                    if STATUS_RANK.get(payment.status, 0) > STATUS_RANK.get(kept[key].status, 0):
+                        kept[key].status = payment.status
+                    delete_ids.append(payment.id)
+                else:
+                    payment.transaction_id = f"{payment.transaction_id}-dup-{payment.id}"[:100]
+                    renamed.append(payment)
+            PaymentTransaction.objects.bulk_update(kept.values(), ['status'])
+            PaymentTransaction.objects.filter(id__in=delete_ids).delete()
+            PaymentTransaction.objects.bulk_update(renamed, ['transaction_id'])
+
+
+def _is_partitioned(schema_editor, model):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    from orders.partitioning import is_partitioned
+    return is_partitioned(model._meta.db_table)
+
+
+class AddUniqueConstraintOrIndex(migrations.AddConstraint):
+    """
+    PostgreSQL cannot enforce uniqueness across partitions without the
+    partition key, so a partitioned table (see orders.partitioning) gets a
+    plain composite index for lookups and a trigger-maintained guard table
+    whose own unique constraint rejects duplicates, as convert_table does.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if _is_partitioned(schema_editor, model):
+            from orders.partitioning import add_unique_guard
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS payment_gateway_txn_idx '
+                'ON payments_paymenttransaction (gateway, transaction_id)'
+            )
+            add_unique_guard(model._meta.db_table, self.constraint.name, self.constraint.fields)
+        else:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if _is_partitioned(schema_editor, model):
+            from orders.partitioning import drop_unique_guard
+            drop_unique_guard(model._meta.db_table, self.constraint.name)
+            schema_editor.execute('DROP INDEX IF EXISTS payment_gateway_txn_idx')
+        else:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # Duplicates are resolved in separately committed batches
+    atomic = False
+
+    dependencies = [
+        ('payments', '0002_settlement_files'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_transactions, migrations.RunPython.noop),
+        AddUniqueConstraintOrIndex(model_name='paymenttransaction', constraint=CONSTRAINT),
+    ]
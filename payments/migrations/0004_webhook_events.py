@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_unique_gateway_transaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gateway', models.CharField(max_length=50)),
+                ('event_id', models.CharField(max_length=255)),
+                ('event_type', models.CharField(blank=True, max_length=100)),
+                ('transaction_id', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('payload', models.JSONField()),
+                ('result', models.CharField(choices=[('pending', 'Pending'), ('applied', 'Applied'), ('unchanged', 'Unchanged'), ('missing', 'Missing transaction'), ('ignored', 'Ignored')], default='pending', max_length=20)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('result', 'pending')), fields=['id'], name='webhook_event_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('gateway', 'event_id'), name='webhook_event_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_webhook_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('gateway', models.CharField(max_length=50)),
+                ('currency', models.CharField(max_length=3)),
+                ('completed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['day', 'gateway', 'currency'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'gateway', 'currency'), name='revenue_rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('day', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+                ('source', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'ordering': ['currency', '-day'],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'day'), name='fx_rate_currency_day_unique')],
+            },
+        ),
+    ]
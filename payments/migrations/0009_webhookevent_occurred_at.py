@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-19 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_disputes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookevent',
+            name='occurred_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
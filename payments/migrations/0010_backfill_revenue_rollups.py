@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-19 10:24
+
+from django.db import migrations
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up the payments recorded before rollups were maintained"""
+    from payments.rollups import rebuild_rollups
+    rebuild_rollups(
+        payment_model=apps.get_model('payments', 'PaymentTransaction'),
+        rollup_model=apps.get_model('payments', 'RevenueRollup'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_webhookevent_occurred_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -5,7 +5,7 @@ class PaymentTransaction(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
     gateway = models.CharField(max_length=50)
-    transaction_id = models.CharField(max_length=100)
+    transaction_id = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=20, choices=[
         ('pending', 'Pending'),
         ('completed', 'Completed'),
@@ -19,3 +19,282 @@ class PaymentTransaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['gateway', 'transaction_id'], name='payment_gateway_txn_unique'),
+        ]
+
+
+class SettlementFile(models.Model):
+    """A gateway settlement file reconciled against our transactions (see payments.settlement)"""
+    gateway = models.CharField(max_length=50)
+    name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, default='processing', choices=[
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed')
+    ])
+    line_count = models.PositiveIntegerField(default=0)
+    matched_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    mismatch_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    uploaded_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Settlement {self.name} ({self.gateway})"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class SettlementLine(models.Model):
+    """Staging row for one settlement file line; result is filled in by the reconciliation join"""
+    RESULT_CHOICES = [
+        ('pending', 'Pending'),
+        ('matched', 'Matched'),
+        ('status_updated', 'Status updated'),
+        ('missing', 'Missing transaction'),
+        ('amount_mismatch', 'Amount mismatch'),
+        ('currency_mismatch', 'Currency mismatch'),
+        ('invalid', 'Invalid line'),
+    ]
+    settlement = models.ForeignKey(SettlementFile, on_delete=models.CASCADE, related_name='lines')
+    line_number = models.PositiveIntegerField()
+    transaction_id = models.CharField(max_length=100)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    currency = models.CharField(max_length=3, blank=True)
+    status = models.CharField(max_length=20, blank=True)
+    # No database constraint: the transactions table may be partitioned (see orders.partitioning)
+    payment = models.ForeignKey(PaymentTransaction, on_delete=models.SET_NULL, null=True, db_constraint=False)
+    result = models.CharField(max_length=20, choices=RESULT_CHOICES, default='pending')
+
+    def __str__(self):
+        return f"{self.settlement_id}:{self.line_number} {self.transaction_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['settlement', 'result'], name='settlement_line_result_idx'),
+            models.Index(fields=['settlement', 'transaction_id'], name='settlement_line_txn_idx'),
+        ]
+
+
+class WebhookEvent(models.Model):
+    """Raw gateway webhook event, deduplicated on the gateway's event id (see payments.webhooks)"""
+    RESULT_CHOICES = [
+        ('pending', 'Pending'),
+        ('applied', 'Applied'),
+        ('unchanged', 'Unchanged'),
+        ('missing', 'Missing transaction'),
+        ('ignored', 'Ignored'),
+    ]
+    gateway = models.CharField(max_length=50)
+    event_id = models.CharField(max_length=255)
+    event_type = models.CharField(max_length=100, blank=True)
+    transaction_id = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, blank=True)
+    # When the gateway created the event; deliveries can arrive out of order
+    occurred_at = models.DateTimeField(null=True, blank=True)
+    payload = models.JSONField()
+    result = models.CharField(max_length=20, choices=RESULT_CHOICES, default='pending')
+    # Events for payments not recorded yet are retried with a growing delay
+    attempts = models.PositiveIntegerField(default=0)
+    retry_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.gateway} event {self.event_id} - {self.result}"
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['gateway', 'event_id'], name='webhook_event_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['id'], name='webhook_event_pending_idx', condition=models.Q(result='pending')),
+        ]
+
+
+class RevenueRollup(models.Model):
+    """Daily payment totals per gateway and currency, kept current by payments.rollups"""
+    day = models.DateField()
+    gateway = models.CharField(max_length=50)
+    currency = models.CharField(max_length=3)
+    completed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_count = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.day} {self.gateway} {self.currency}: {self.completed_amount}"
+
+    class Meta:
+        ordering = ['day', 'gateway', 'currency']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'gateway', 'currency'], name='revenue_rollup_unique'),
+        ]
+
+
+class LedgerAccount(models.Model):
+    """Double-entry ledger account; balance is debits minus credits (see payments.ledger)"""
+    ACCOUNT_TYPES = [
+        ('asset', 'Asset'),
+        ('liability', 'Liability'),
+        ('equity', 'Equity'),
+        ('revenue', 'Revenue'),
+        ('expense', 'Expense'),
+    ]
+    code = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=200)
+    account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPES)
+    currency = models.CharField(max_length=3)
+    balance = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.code} ({self.currency})"
+
+    class Meta:
+        ordering = ['code']
+
+
+class JournalEntry(models.Model):
+    ENTRY_TYPES = [
+        ('capture', 'Capture'),
+        ('refund', 'Refund'),
+        ('reversal', 'Reversal'),
+        ('commission', 'Commission'),
+        ('adjustment', 'Adjustment'),
+    ]
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    # No database constraint: the transactions table may be partitioned (see orders.partitioning)
+    payment = models.ForeignKey(
+        PaymentTransaction, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False,
+        related_name='journal_entries'
+    )
+    reference = models.CharField(max_length=100, blank=True)
+    memo = models.CharField(max_length=255, blank=True)
+    posted_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.entry_type} {self.reference or self.id} at {self.posted_at}"
+
+    class Meta:
+        ordering = ['-posted_at', '-id']
+        indexes = [
+            models.Index(fields=['posted_at'], name='journal_entry_posted_idx'),
+            models.Index(fields=['reference'], name='journal_entry_reference_idx'),
+        ]
+
+
+class Posting(models.Model):
+    """One side of a journal entry; amount is positive for debits, and balance is the account's running balance"""
+    entry = models.ForeignKey(JournalEntry, on_delete=models.CASCADE, related_name='postings')
+    # Covered by posting_account_balance_idx
+    account = models.ForeignKey(LedgerAccount, on_delete=models.PROTECT, related_name='postings', db_index=False)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    balance = models.DecimalField(max_digits=16, decimal_places=2)
+    posted_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.account_id} {self.amount:+} -> {self.balance}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'posted_at', 'id'], name='posting_account_balance_idx'),
+        ]
+
+
+class FxRate(models.Model):
+    """Daily exchange rate: units of the reporting currency per unit of currency (see payments.fx)"""
+    currency = models.CharField(max_length=3)
+    day = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    source = models.CharField(max_length=100, blank=True)
+
+    def __str__(self):
+        return f"{self.currency} {self.day}: {self.rate}"
+
+    class Meta:
+        ordering = ['currency', '-day']
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'day'], name='fx_rate_currency_day_unique'),
+        ]
+
+
+class Dispute(models.Model):
+    """Gateway dispute or chargeback of a payment, imported from dispute reports (see payments.disputes)"""
+    OPEN_STATUSES = ['open', 'investigating']
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('investigating', 'Investigating'),
+        ('resolved', 'Resolved'),
+        ('closed', 'Closed'),
+    ]
+    OUTCOME_CHOICES = [
+        ('won', 'Won'),
+        ('lost', 'Lost'),
+        ('accepted', 'Accepted'),
+    ]
+    gateway = models.CharField(max_length=50)
+    dispute_id = models.CharField(max_length=100)
+    transaction_id = models.CharField(max_length=100)
+    # No database constraint: the transactions table may be partitioned (see orders.partitioning)
+    payment = models.ForeignKey(
+        PaymentTransaction, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False,
+        related_name='disputes'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default='USD')
+    reason = models.CharField(max_length=100, blank=True)
+    description = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, blank=True)
+    evidence_due_by = models.DateTimeField(null=True, blank=True)
+    resolution = models.TextField(blank=True)
+    resolved_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.gateway} dispute {self.dispute_id} - {self.status}"
+
+    @property
+    def is_partial(self):
+        """The dispute is for less than its payment, so losing it is not a full refund"""
+        return self.payment is not None and self.amount < self.payment.amount
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['gateway', 'dispute_id'], name='dispute_gateway_unique'),
+        ]
+        indexes = [
+            # Deadline queues only ever look at open disputes, so closed ones stay out of the index
+            models.Index(
+                fields=['evidence_due_by'], name='dispute_evidence_due_idx',
+                condition=models.Q(status__in=['open', 'investigating'])
+            ),
+            models.Index(fields=['gateway', 'updated_at'], name='dispute_gateway_updated_idx'),
+        ]
+
+
+class DisputeEvidence(models.Model):
+    """An evidence file of a dispute; the file lives in evidence storage under storage_key"""
+    dispute = models.ForeignKey(Dispute, on_delete=models.CASCADE, related_name='evidence')
+    file_name = models.CharField(max_length=255)
+    storage_key = models.CharField(max_length=500)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    uploaded_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True)
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.dispute_id}: {self.file_name}"
+
+    class Meta:
+        ordering = ['uploaded_at', 'id']
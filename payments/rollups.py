@@ -0,0 +1,115 @@
+"""
+Daily revenue rollups.
+
+RevenueRollup holds, per (day, gateway, currency), the amount and number of
+payments that are currently completed and currently refunded, bucketed by the
+day the payment was created, so reports read a few small rows instead of
+aggregating PaymentTransaction. Every status change adds its delta to the
+rollups: bulk changes (settlements, webhooks) are aggregated per bucket in SQL
+right before the UPDATE that makes them, single payments are recorded by the
+views. rebuild_rollups recomputes a date range from the payments themselves,
+for backfills and to repair drift (e.g. after payments were deleted).
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import PaymentTransaction, RevenueRollup
+
+# Payment statuses that are rolled up, with their amount and count fields
+ROLLUP_FIELDS = {
+    'completed': ('completed_amount', 'completed_count'),
+    'refunded': ('refunded_amount', 'refunded_count'),
+}
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _add(deltas, key, payment_status, amount, count, sign):
+    if payment_status not in ROLLUP_FIELDS:
+        return
+    amount_field, count_field = ROLLUP_FIELDS[payment_status]
+    bucket = deltas.setdefault(key, {})
+    bucket[amount_field] = bucket.get(amount_field, 0) + sign * amount
+    bucket[count_field] = bucket.get(count_field, 0) + sign * count
+
+
+def _bucket_rows(payments):
+    """(day, gateway, currency, status) totals of a payment queryset, grouped in SQL"""
+    return payments.annotate(day=TruncDate('created_at')).values(
+        'day', 'gateway', 'currency', 'status'
+    ).annotate(amount=Sum('amount'), count=Count('id')).order_by()
+
+
+def apply_deltas(deltas):
+    """Add {(day, gateway, currency): {field: delta}} to the rollups, creating missing rows"""
+    for (day, gateway, currency), changes in deltas.items():
+        changes = {field: delta for field, delta in changes.items() if delta}
+        if not changes:
+            continue
+        rollup = RevenueRollup.objects.filter(day=day, gateway=gateway, currency=currency)
+        increments = {field: F(field) + delta for field, delta in changes.items()}
+        if rollup.update(updated_at=timezone.now(), **increments):
+            continue
+        try:
+            with transaction.atomic():
+                RevenueRollup.objects.create(day=day, gateway=gateway, currency=currency, **changes)
+        except IntegrityError:
+            # Created concurrently
+            rollup.update(updated_at=timezone.now(), **increments)
+
+
+def record_status_change(payments, payment_status):
+    """Roll up moving a payment queryset to payment_status; call before the UPDATE"""
+    deltas = {}
+    for row in _bucket_rows(payments.exclude(status=payment_status)):
+        key = (row['day'], row['gateway'], row['currency'])
+        _add(deltas, key, row['status'], row['amount'], row['count'], -1)
+        _add(deltas, key, payment_status, row['amount'], row['count'], 1)
+    apply_deltas(deltas)
+
+
+def record_payment(payment, old_status=None):
+    """Roll up a single payment that was created (old_status None) or changed status"""
+    if payment.status == old_status:
+        return
+    deltas = {}
+    key = (timezone.localtime(payment.created_at).date(), payment.gateway, payment.currency)
+    _add(deltas, key, old_status, payment.amount, 1, -1)
+    _add(deltas, key, payment.status, payment.amount, 1, 1)
+    apply_deltas(deltas)
+
+
+def rebuild_rollups(start=None, end=None, payment_model=PaymentTransaction, rollup_model=RevenueRollup):
+    """
+    Recompute the rollups of days start..end (inclusive, open-ended if None);
+    returns the row count. Migrations pass their historical models.
+    """
+    payments = payment_model.objects.filter(status__in=ROLLUP_FIELDS)
+    rollups = rollup_model.objects.all()
+    if start:
+        payments = payments.filter(created_at__gte=_start_of_day(start))
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        payments = payments.filter(created_at__lt=_start_of_day(end + timedelta(days=1)))
+        rollups = rollups.filter(day__lte=end)
+
+    buckets = {}
+    for row in _bucket_rows(payments):
+        key = (row['day'], row['gateway'], row['currency'])
+        if key not in buckets:
+            buckets[key] = rollup_model(day=row['day'], gateway=row['gateway'], currency=row['currency'])
+        amount_field, count_field = ROLLUP_FIELDS[row['status']]
+        setattr(buckets[key], amount_field, row['amount'])
+        setattr(buckets[key], count_field, row['count'])
+
+    with transaction.atomic():
+        rollups.delete()
+        rollup_model.objects.bulk_create(buckets.values(), batch_size=1000)
+    return len(buckets)
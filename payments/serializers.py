@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import PaymentTransaction
+from django.urls import reverse
+from .models import Dispute, DisputeEvidence, LedgerAccount, PaymentTransaction, Posting, SettlementFile, SettlementLine
 
 class PaymentTransactionSerializer(serializers.ModelSerializer):
     order_number = serializers.CharField(source='order.order_number', read_only=True)
@@ -32,10 +33,102 @@ class PaymentProcessSerializer(serializers.Serializer):
 
 class PaymentReconciliationSerializer(serializers.Serializer):
     transaction_id = serializers.CharField()
+    gateway = serializers.CharField(max_length=50, required=False)
     status = serializers.ChoiceField(choices=[
         ('pending', 'Pending'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
         ('refunded', 'Refunded')
     ])
-    gateway_response = serializers.DictField(required=False)
\ No newline at end of file
+    gateway_response = serializers.DictField(required=False)
+
+class PaymentLookupSerializer(serializers.Serializer):
+    transaction_ids = serializers.ListField(
+        child=serializers.CharField(max_length=100), allow_empty=False, max_length=1000
+    )
+    gateway = serializers.CharField(max_length=50, required=False)
+
+class SettlementFileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SettlementFile
+        fields = [
+            'id', 'gateway', 'name', 'status', 'line_count', 'matched_count', 'updated_count',
+            'mismatch_count', 'error', 'created_at', 'processed_at'
+        ]
+        read_only_fields = fields
+
+class SettlementUploadSerializer(serializers.Serializer):
+    gateway = serializers.CharField(max_length=50)
+    file = serializers.FileField()
+
+class SettlementMismatchSerializer(serializers.ModelSerializer):
+    payment_amount = serializers.DecimalField(
+        source='payment.amount', max_digits=10, decimal_places=2, read_only=True, default=None
+    )
+    payment_currency = serializers.CharField(source='payment.currency', read_only=True, default=None)
+
+    class Meta:
+        model = SettlementLine
+        fields = [
+            'line_number', 'transaction_id', 'amount', 'currency', 'status', 'result',
+            'payment', 'payment_amount', 'payment_currency'
+        ]
+
+class LedgerAccountSerializer(serializers.ModelSerializer):
+    balance_at = serializers.DecimalField(max_digits=16, decimal_places=2, read_only=True, default=None)
+
+    class Meta:
+        model = LedgerAccount
+        fields = ['id', 'code', 'name', 'account_type', 'currency', 'balance', 'balance_at']
+
+class PostingSerializer(serializers.ModelSerializer):
+    entry_type = serializers.CharField(source='entry.entry_type', read_only=True)
+    reference = serializers.CharField(source='entry.reference', read_only=True)
+    payment = serializers.IntegerField(source='entry.payment_id', read_only=True)
+
+    class Meta:
+        model = Posting
+        fields = ['id', 'entry', 'entry_type', 'reference', 'payment', 'amount', 'balance', 'posted_at']
+
+class DisputeEvidenceSerializer(serializers.ModelSerializer):
+    file_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DisputeEvidence
+        fields = ['id', 'dispute', 'file_name', 'file_url', 'content_type', 'size', 'uploaded_by', 'uploaded_at']
+        read_only_fields = fields
+
+    def get_file_url(self, obj):
+        url = reverse('dispute-evidence-download', args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class DisputeSerializer(serializers.ModelSerializer):
+    payment_transaction = serializers.IntegerField(source='payment_id', read_only=True)
+    order = serializers.IntegerField(source='payment.order_id', read_only=True, default=None)
+    partial_chargeback = serializers.BooleanField(source='is_partial', read_only=True)
+    evidence = DisputeEvidenceSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Dispute
+        fields = [
+            'id', 'gateway', 'dispute_id', 'transaction_id', 'payment_transaction', 'order', 'amount', 'currency',
+            'partial_chargeback', 'reason', 'description', 'status', 'outcome', 'evidence_due_by', 'resolution', 'resolved_by',
+            'resolved_at', 'evidence', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'gateway', 'dispute_id', 'transaction_id', 'amount', 'currency', 'reason', 'outcome',
+            'resolution', 'resolved_by', 'resolved_at', 'created_at', 'updated_at'
+        ]
+
+    def validate_status(self, value):
+        if value not in Dispute.OPEN_STATUSES:
+            raise serializers.ValidationError('Use the resolve endpoint to close a dispute')
+        # Its outcome may already have refunded the payment
+        if self.instance is not None and self.instance.status not in Dispute.OPEN_STATUSES:
+            raise serializers.ValidationError('A closed dispute cannot be reopened')
+        return value
+
+class DisputeResolveSerializer(serializers.Serializer):
+    outcome = serializers.ChoiceField(choices=Dispute.OUTCOME_CHOICES, required=False, allow_blank=True, default='')
+    resolution = serializers.CharField(required=False, allow_blank=True, default='')
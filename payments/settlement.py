@@ -0,0 +1,290 @@
+"""
+Gateway settlement file reconciliation.
+
+A settlement CSV is streamed line by line into the SettlementLine staging
+table: with COPY on PostgreSQL, in batched INSERTs elsewhere. It is then
+reconciled with set-based statements only:
+
+1. one UPDATE joins every staged line to its PaymentTransaction through the
+   transaction_id index,
+2. a few UPDATEs classify lines as missing, amount or currency mismatches
+   or plain matches,
+3. the lines of each payment that report another status are folded, in
+   status order, through STATUS_TRANSITIONS into one target status, so a
+   capture and its refund in one file end refunded and no line moves a
+   payment backwards, and
+4. one UPDATE per target status moves the payments, and one per status moves
+   their orders where that is still a forward move.
+
+Lines that are not matched or applied form the mismatch report.
+"""
+
+import csv
+import io
+import itertools
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import PaymentTransaction, SettlementFile, SettlementLine
+from .ledger import post_status_change
+from .rollups import record_status_change
+
+# Accepted header names for each staging column
+HEADER_ALIASES = {
+    'transaction_id': ('transaction_id', 'txn_id', 'transaction', 'reference', 'id'),
+    'amount': ('amount', 'gross', 'gross_amount', 'settled_amount'),
+    'currency': ('currency', 'currency_code'),
+    'status': ('status', 'state', 'type'),
+}
+# Gateway status vocabulary mapped to PaymentTransaction statuses
+STATUS_ALIASES = {
+    'completed': 'completed', 'settled': 'completed', 'success': 'completed', 'paid': 'completed',
+    'captured': 'completed', 'failed': 'failed', 'declined': 'failed', 'refunded': 'refunded',
+    'refund': 'refunded', 'chargeback': 'refunded', 'pending': 'pending',
+}
+# Order status implied by each payment status change, and the order statuses it may replace
+ORDER_STATUS_FOR_PAYMENT = {
+    'completed': ('confirmed', ['pending']),
+    'failed': ('cancelled', ['pending', 'confirmed']),
+    'refunded': ('refunded', None),
+}
+# Statuses a gateway report (settlement line or webhook) may move a payment to
+# from each status. A captured payment only moves on to refunded, and a refund
+# is final.
+STATUS_TRANSITIONS = {
+    'pending': {'completed', 'failed', 'refunded'},
+    'failed': {'completed'},
+    'completed': {'refunded'},
+    'refunded': set(),
+}
+# Order in which one file's statuses for a payment are applied
+STATUS_RANK = {'pending': 0, 'failed': 1, 'completed': 2, 'refunded': 3}
+MISMATCH_RESULTS = ['missing', 'amount_mismatch', 'currency_mismatch', 'invalid']
+# Amounts must fit DecimalField(max_digits=10, decimal_places=2)
+MAX_AMOUNT = Decimal('1e8')
+COPY_CHUNK_SIZE = 50000
+INSERT_CHUNK_SIZE = 5000
+UPDATE_CHUNK_SIZE = 5000
+
+
+class SettlementError(Exception):
+    pass
+
+
+def _column_map(header, aliases, required, error):
+    normalized = {
+        name.strip().lower().replace(' ', '_').replace('-', '_'): index for index, name in enumerate(header)
+    }
+    columns = {}
+    for column, names in aliases.items():
+        for alias in names:
+            if alias in normalized:
+                columns[column] = normalized[alias]
+                break
+    missing = set(required) - set(columns)
+    if missing:
+        raise error(f"File is missing columns: {', '.join(sorted(missing))}")
+    return columns
+
+
+def _csv_rows(reader, error):
+    line_number = 1
+    try:
+        for line_number, row in enumerate(reader, start=2):
+            if row:
+                yield line_number, row
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise error(f"Unreadable file after line {line_number}; expected UTF-8 CSV ({exc})")
+
+
+def read_csv(stream, aliases, required, error=SettlementError):
+    """Column indexes and a lazy (line_number, row) iterator of a binary CSV stream with aliased headers"""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    try:
+        columns = _column_map(next(reader), aliases, required, error)
+    except StopIteration:
+        raise error('File is empty')
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise error(f"Unreadable file; expected UTF-8 CSV ({exc})")
+    return columns, _csv_rows(reader, error)
+
+
+def parse_amount(value):
+    """A money amount rounded to cents; InvalidOperation unless finite and within MAX_AMOUNT"""
+    amount = Decimal(value.strip()).quantize(Decimal('0.01'))
+    if not amount.is_finite() or abs(amount) >= MAX_AMOUNT:
+        raise InvalidOperation(value)
+    return amount
+
+
+def iter_settlement_rows(stream):
+    """Yield (line_number, transaction_id, amount, currency, status, result) from a binary CSV stream"""
+    columns, rows = read_csv(stream, HEADER_ALIASES, ('transaction_id', 'amount', 'status'))
+
+    txn_col, amount_col, status_col = columns['transaction_id'], columns['amount'], columns['status']
+    currency_col = columns.get('currency')
+    for line_number, row in rows:
+        try:
+            transaction_id = row[txn_col].strip()
+            amount = parse_amount(row[amount_col])
+            status = STATUS_ALIASES.get(row[status_col].strip().lower())
+            currency = row[currency_col].strip().upper()[:3] if currency_col is not None else ''
+        except (IndexError, InvalidOperation):
+            yield line_number, (row[txn_col] if len(row) > txn_col else '')[:100], None, '', '', 'invalid'
+            continue
+        result = 'pending' if transaction_id and status else 'invalid'
+        yield line_number, transaction_id[:100], amount, currency, status or '', result
+
+
+STAGING_COLUMNS = 'settlement_id, line_number, transaction_id, amount, currency, status, result'
+
+
+def _copy_lines(settlement, rows):
+    """Load rows with COPY ... FROM STDIN in chunks; PostgreSQL only"""
+    sql = f'COPY {SettlementLine._meta.db_table} ({STAGING_COLUMNS}) FROM STDIN WITH (FORMAT csv)'
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    with connection.cursor() as cursor:
+        for row in rows:
+            writer.writerow((settlement.id,) + row)
+            count += 1
+            if count % COPY_CHUNK_SIZE == 0:
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+    return count
+
+
+def _insert_lines(settlement, rows):
+    """Load rows with batched executemany INSERTs; skips model instantiation"""
+    sql = f'INSERT INTO {SettlementLine._meta.db_table} ({STAGING_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    count = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = [(settlement.id,) + row for row in itertools.islice(rows, INSERT_CHUNK_SIZE)]
+            if not batch:
+                return count
+            cursor.executemany(sql, batch)
+            count += len(batch)
+
+
+def load_settlement_lines(settlement, stream):
+    """Stream a settlement CSV into the staging table; returns the number of lines"""
+    rows = iter_settlement_rows(stream)
+    if connection.vendor == 'postgresql':
+        return _copy_lines(settlement, rows)
+    return _insert_lines(settlement, rows)
+
+
+def apply_payment_status(payment_ids, payment_status):
+    """Move payments (ids or an id subquery) and their orders to a new status in two UPDATEs; keeps rollups and ledger current"""
+    if payment_status in ORDER_STATUS_FOR_PAYMENT:
+        from orders.cache import invalidate_order_histories
+        from orders.models import Order
+        order_status, from_statuses = ORDER_STATUS_FOR_PAYMENT[payment_status]
+        orders = Order.objects.filter(
+            id__in=PaymentTransaction.objects.filter(id__in=payment_ids).values('order_id')
+        )
+        if from_statuses:
+            orders = orders.filter(status__in=from_statuses)
+        invalidate_order_histories(orders)
+        orders.update(status=order_status, updated_at=timezone.now())
+    payments = PaymentTransaction.objects.filter(id__in=payment_ids)
+    record_status_change(payments, payment_status)
+    post_status_change(payments, payment_status)
+    return payments.update(status=payment_status)
+
+
+def can_transition(current, status):
+    return status in STATUS_TRANSITIONS.get(current, ())
+
+
+def _fold_lines(changes):
+    """
+    Target status per payment and the ids of the lines that moved it, from
+    (line_id, payment_id, line status, payment status) rows
+    """
+    per_payment = {}
+    for line_id, payment_id, status, payment_status in changes:
+        _, statuses = per_payment.setdefault(payment_id, (payment_status, []))
+        statuses.append((STATUS_RANK.get(status, 0), line_id, status))
+    targets, applied = {}, []
+    for payment_id, (current, lines) in per_payment.items():
+        target = current
+        for _, line_id, status in sorted(lines):
+            if status != target and can_transition(target, status):
+                target = status
+                applied.append(line_id)
+        if target != current:
+            targets[payment_id] = target
+    return targets, applied
+
+
+def reconcile_settlement(settlement):
+    """Match staged lines against payments and apply status changes in bulk"""
+    lines = SettlementLine.objects.filter(settlement=settlement)
+    pending = lines.filter(result='pending')
+
+    pending.update(payment_id=Subquery(
+        PaymentTransaction.objects.filter(
+            gateway=settlement.gateway, transaction_id=OuterRef('transaction_id')
+        ).values('id')[:1]
+    ))
+    pending.filter(payment__isnull=True).update(result='missing')
+    pending.exclude(amount=F('payment__amount')).update(result='amount_mismatch')
+    pending.exclude(currency='').exclude(currency=F('payment__currency')).update(result='currency_mismatch')
+    changes = pending.exclude(status=F('payment__status')).values_list(
+        'id', 'payment_id', 'status', 'payment__status'
+    )
+    targets, applied = _fold_lines(changes.iterator(chunk_size=UPDATE_CHUNK_SIZE))
+    for start in range(0, len(applied), UPDATE_CHUNK_SIZE):
+        lines.filter(id__in=applied[start:start + UPDATE_CHUNK_SIZE]).update(result='status_updated')
+    pending.update(result='matched')
+
+    moves = {}
+    for payment_id, payment_status in targets.items():
+        moves.setdefault(payment_status, []).append(payment_id)
+    for payment_status, payment_ids in moves.items():
+        for start in range(0, len(payment_ids), UPDATE_CHUNK_SIZE):
+            apply_payment_status(payment_ids[start:start + UPDATE_CHUNK_SIZE], payment_status)
+
+    counts = dict(lines.values('result').annotate(n=Count('id')).values_list('result', 'n'))
+    settlement.line_count = sum(counts.values())
+    settlement.matched_count = counts.get('matched', 0) + counts.get('status_updated', 0)
+    settlement.updated_count = counts.get('status_updated', 0)
+    settlement.mismatch_count = sum(counts.get(result, 0) for result in MISMATCH_RESULTS)
+    settlement.status = 'completed'
+    settlement.processed_at = timezone.now()
+    settlement.save()
+    return settlement
+
+
+def process_settlement_file(stream, gateway, name, user=None):
+    """Load and reconcile a settlement file in one transaction"""
+    settlement = SettlementFile.objects.create(gateway=gateway, name=name, uploaded_by=user)
+    try:
+        with transaction.atomic():
+            load_settlement_lines(settlement, stream)
+            reconcile_settlement(settlement)
+    except (SettlementError, DatabaseError) as exc:
+        _mark_failed(settlement, exc)
+    except Exception as exc:
+        # Never leave the file 'processing'
+        _mark_failed(settlement, exc)
+        raise
+    return settlement
+
+
+def _mark_failed(settlement, exc):
+    settlement.status = 'failed'
+    settlement.error = str(exc) or exc.__class__.__name__
+    settlement.processed_at = timezone.now()
+    settlement.save()
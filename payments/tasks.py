@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .webhooks import process_webhook_events
+
+
+@shared_task
+def process_webhook_inbox():
+    """Apply pending gateway webhook events in batches"""
+    return process_webhook_events()
@@ -1,3 +1,597 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import importlib
+import json
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import httpx
+
+from django.apps import apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from orders.models import Order
+from payments.gateways import CircuitBreaker, GatewayError, GatewayUnavailable, HTTPGateway, run_gateway_call
+from payments.models import Dispute, FxRate, JournalEntry, LedgerAccount, PaymentTransaction, Posting, RevenueRollup, SettlementFile, WebhookEvent
+from payments.fx import FxError, fx_rate, load_rates
+from payments.ledger import LedgerError, LedgerWriter, balance_at, sales_account
+from payments.rollups import rebuild_rollups
+from payments.webhooks import process_webhook_events
+from users.models import User
+
+class PaymentTestMixin:
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', user_type='admin'
+        )
+        self.client.force_authenticate(self.admin)
+
+    def create_payment(self, transaction_id, amount='10.00', payment_status='pending', gateway='stripe'):
+        order = Order.objects.create(
+            customer=self.admin, status='pending', total_amount=amount,
+            shipping_address='A', billing_address='B', payment_method='card',
+            shipping_method='standard'
+        )
+        return PaymentTransaction.objects.create(
+            order=order, amount=amount, currency='USD', gateway=gateway,
+            transaction_id=transaction_id, status=payment_status
+        )
+
+class SettlementReconciliationTest(PaymentTestMixin, APITestCase):
+    def test_settlement_file_is_reconciled_in_bulk(self):
+        settled = self.create_payment('txn_1')
+        refunded = self.create_payment('txn_2', payment_status='completed')
+        self.create_payment('txn_3', amount='5.00')
+        matched = self.create_payment('txn_4', payment_status='completed')
+        self.create_payment('txn_5', gateway='paypal')
+
+        csv_file = SimpleUploadedFile('settlement.csv', (
+            'Transaction ID,Gross,Currency,State\n'
+            'txn_1,10.00,USD,settled\n'
+            'txn_2,10.00,usd,chargeback\n'
+            'txn_3,4.99,USD,settled\n'
+            'txn_4,10,USD,completed\n'
+            'txn_5,10.00,USD,settled\n'
+            'txn_6,not-a-number,USD,settled\n'
+        ).encode())
+        response = self.client.post(
+            reverse('settlement-upload'), {'gateway': 'stripe', 'file': csv_file}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(
+            (response.data['line_count'], response.data['matched_count'],
+             response.data['updated_count'], response.data['mismatch_count']),
+            (6, 3, 2, 3)
+        )
+
+        settled.refresh_from_db()
+        refunded.refresh_from_db()
+        self.assertEqual((settled.status, settled.order.status), ('completed', 'confirmed'))
+        self.assertEqual((refunded.status, refunded.order.status), ('refunded', 'refunded'))
+        self.assertEqual(Order.objects.get(id=matched.order_id).status, 'pending')
+
+        report = self.client.get(reverse('settlement-mismatches', args=[response.data['id']]))
+        self.assertEqual(
+            [(line['transaction_id'], line['result']) for line in report.data['results']],
+            [('txn_3', 'amount_mismatch'), ('txn_5', 'missing'), ('txn_6', 'invalid')]
+        )
+
+    def test_lines_of_one_payment_are_applied_forward_only(self):
+        captured_and_refunded = self.create_payment('txn_1')
+        refunded = self.create_payment('txn_2', payment_status='refunded')
+        csv_file = SimpleUploadedFile('settlement.csv', (
+            'id,amount,status\n'
+            'txn_1,10.00,refund\n'
+            'txn_1,10.00,settled\n'
+            'txn_2,10.00,settled\n'
+        ).encode())
+        response = self.client.post(
+            reverse('settlement-upload'), {'gateway': 'stripe', 'file': csv_file}, format='multipart'
+        )
+        self.assertEqual((response.data['updated_count'], response.data['mismatch_count']), (2, 0))
+
+        captured_and_refunded.refresh_from_db()
+        refunded.refresh_from_db()
+        self.assertEqual((captured_and_refunded.status, captured_and_refunded.order.status), ('refunded', 'refunded'))
+        self.assertEqual(refunded.status, 'refunded')
+        refunded.order.refresh_from_db()
+        self.assertEqual(refunded.order.status, 'pending')
+        balances = dict(LedgerAccount.objects.values_list('code', 'balance'))
+        self.assertEqual((balances['expense:refunds:USD'], balances['revenue:sales:USD']), (10, -10))
+        self.assertEqual(RevenueRollup.objects.values_list('completed_amount', 'refunded_amount').get(), (0, 10))
+
+    def test_file_without_required_columns_fails(self):
+        csv_file = SimpleUploadedFile('settlement.csv', b'id,amount\ntxn_1,10.00\n')
+        response = self.client.post(
+            reverse('settlement-upload'), {'gateway': 'stripe', 'file': csv_file}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', SettlementFile.objects.get().error)
+
+    def test_undecodable_file_fails_and_oversized_amounts_are_invalid(self):
+        csv_file = SimpleUploadedFile('settlement.csv', b'id,amount,status\ntxn_\xff\xfe,10.00,settled\n')
+        response = self.client.post(
+            reverse('settlement-upload'), {'gateway': 'stripe', 'file': csv_file}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(SettlementFile.objects.get().status, 'failed')
+        self.assertIn('UTF-8', SettlementFile.objects.get().error)
+
+        self.create_payment('txn_1')
+        csv_file = SimpleUploadedFile('settlement.csv', (
+            'id,amount,status\n'
+            'txn_1,10.00,settled\n'
+            'txn_2,123456789.00,settled\n'
+            'txn_3,NaN,settled\n'
+        ).encode())
+        response = self.client.post(
+            reverse('settlement-upload'), {'gateway': 'stripe', 'file': csv_file}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        report = self.client.get(reverse('settlement-mismatches', args=[response.data['id']]))
+        self.assertEqual(
+            [(line['transaction_id'], line['result']) for line in report.data['results']],
+            [('txn_2', 'invalid'), ('txn_3', 'invalid')]
+        )
+
+class PaymentLookupTest(PaymentTestMixin, APITestCase):
+    def test_lookup_resolves_ids_in_one_query(self):
+        for i in range(5):
+            self.create_payment(f'txn_{i}')
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('payment-lookup'), {
+                'transaction_ids': ['txn_0', 'txn_3', 'txn_9'],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(p['transaction_id'] for p in response.data['results']), ['txn_0', 'txn_3'])
+        self.assertEqual(response.data['missing'], ['txn_9'])
+
+        response = self.client.post(reverse('payment-lookup'), {
+            'transaction_ids': [f'txn_{i}' for i in range(1001)],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_gateway_transaction_ids_are_unique(self):
+        from django.db import IntegrityError, transaction
+        self.create_payment('txn_1')
+        self.create_payment('txn_1', gateway='paypal')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_payment('txn_1')
+
+@override_settings(PAYMENT_WEBHOOK_SECRETS={'stripe': 'whsec_test', 'paypal': 'paypal_test'})
+class WebhookIngestionTest(PaymentTestMixin, APITestCase):
+    def post_stripe(self, event, secret='whsec_test'):
+        body = json.dumps(event).encode()
+        timestamp = str(int(time.time()))
+        signature = hmac.new(secret.encode(), timestamp.encode() + b'.' + body, hashlib.sha256).hexdigest()
+        self.client.force_authenticate(None)
+        return self.client.post(
+            reverse('payment-webhook', args=['stripe']), body, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={signature}'
+        )
+
+    def test_events_are_deduplicated_and_applied_in_batches(self):
+        refunded = self.create_payment('pi_1', payment_status='completed')
+        completed = self.create_payment('pi_2')
+        event = {'id': 'evt_1', 'type': 'charge.refunded',
+                 'data': {'object': {'object': 'charge', 'id': 'ch_1', 'payment_intent': 'pi_1'}}}
+        for _ in range(3):
+            self.assertEqual(self.post_stripe(event).status_code, status.HTTP_200_OK)
+        self.post_stripe({'id': 'evt_2', 'type': 'payment_intent.succeeded', 'data': {'object': {'id': 'pi_2'}}})
+        self.post_stripe({'id': 'evt_3', 'type': 'payment_intent.succeeded', 'data': {'object': {'id': 'pi_9'}}})
+        self.post_stripe({'id': 'evt_4', 'type': 'customer.created', 'data': {'object': {'id': 'cus_1'}}})
+        self.assertEqual(WebhookEvent.objects.count(), 4)
+
+        body = json.dumps({'id': 'evt_5', 'transaction_id': 'pi_2', 'status': 'failed'}).encode()
+        response = self.client.post(
+            reverse('payment-webhook', args=['paypal']), body, content_type='application/json',
+            HTTP_X_WEBHOOK_SIGNATURE='sha256=' + hmac.new(b'wrong', body, hashlib.sha256).hexdigest()
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post_stripe(event, secret='whsec_other').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(process_webhook_events(batch_size=2),
+                         {'applied': 2, 'unchanged': 0, 'missing': 0, 'ignored': 1, 'deferred': 1})
+        refunded.refresh_from_db()
+        completed.refresh_from_db()
+        self.assertEqual(refunded.status, 'refunded')
+        self.assertEqual(refunded.order.status, 'refunded')
+        self.assertEqual(completed.status, 'completed')
+        completed.order.refresh_from_db()
+        self.assertEqual(completed.order.status, 'confirmed')
+
+        # The event for pi_9 arrived before its payment was recorded, and is retried once it is due
+        self.assertEqual(list(WebhookEvent.objects.filter(result='pending').values_list('event_id', 'attempts')),
+                         [('evt_3', 1)])
+        self.assertEqual(process_webhook_events(), {})
+        late = self.create_payment('pi_9')
+        WebhookEvent.objects.filter(event_id='evt_3').update(retry_at=timezone.now())
+        self.assertEqual(process_webhook_events()['applied'], 1)
+        late.refresh_from_db()
+        self.assertEqual(late.status, 'completed')
+
+        # Unknown transactions are given up on once the retry window has passed
+        self.post_stripe({'id': 'evt_6', 'type': 'payment_intent.succeeded', 'data': {'object': {'id': 'pi_8'}}})
+        WebhookEvent.objects.filter(event_id='evt_6').update(received_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(process_webhook_events()['missing'], 1)
+        self.assertFalse(WebhookEvent.objects.filter(result='pending').exists())
+
+    def test_late_events_never_move_a_payment_backwards(self):
+        captured = self.create_payment('pi_1', payment_status='completed')
+        self.post_stripe({'id': 'evt_1', 'type': 'payment_intent.payment_failed', 'created': 1700000000,
+                          'data': {'object': {'id': 'pi_1'}}})
+        self.assertEqual(process_webhook_events(), {'applied': 0, 'unchanged': 1, 'missing': 0, 'ignored': 0, 'deferred': 0})
+        captured.refresh_from_db()
+        self.assertEqual(captured.status, 'completed')
+        self.assertNotEqual(captured.order.status, 'cancelled')
+
+        # The refund is delivered before the success it follows
+        refunded = self.create_payment('pi_2')
+        self.post_stripe({'id': 'evt_2', 'type': 'charge.refunded', 'created': 1700000200,
+                          'data': {'object': {'object': 'charge', 'id': 'ch_2', 'payment_intent': 'pi_2'}}})
+        self.post_stripe({'id': 'evt_3', 'type': 'payment_intent.succeeded', 'created': 1700000100,
+                          'data': {'object': {'id': 'pi_2'}}})
+        # A success delivered after the refund of a captured payment
+        self.post_stripe({'id': 'evt_4', 'type': 'charge.refunded', 'created': 1700000300,
+                          'data': {'object': {'object': 'charge', 'id': 'ch_1', 'payment_intent': 'pi_1'}}})
+        self.post_stripe({'id': 'evt_5', 'type': 'payment_intent.succeeded', 'created': 1700000300,
+                          'data': {'object': {'id': 'pi_1'}}})
+        self.assertEqual(process_webhook_events(), {'applied': 3, 'unchanged': 1, 'missing': 0, 'ignored': 0, 'deferred': 0})
+        refunded.refresh_from_db()
+        captured.refresh_from_db()
+        self.assertEqual((refunded.status, refunded.order.status), ('refunded', 'refunded'))
+        self.assertEqual((captured.status, captured.order.status), ('refunded', 'refunded'))
+
+class GatewayClientTest(PaymentTestMixin, APITestCase):
+    def create_order(self):
+        return Order.objects.create(
+            customer=self.admin, status='pending', total_amount='10.00',
+            shipping_address='A', billing_address='B', payment_method='card',
+            shipping_method='standard'
+        )
+
+    def test_payment_is_charged_through_the_gateway(self):
+        order = self.create_order()
+        response = self.client.post(reverse('payment-process'), {
+            'order_id': order.id, 'amount': '10.00', 'currency': 'USD', 'gateway': 'stripe'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['transaction_id'].startswith('stub_'))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'confirmed')
+
+        declined = self.create_order()
+        response = self.client.post(reverse('payment-process'), {
+            'order_id': declined.id, 'amount': '10.02', 'currency': 'USD', 'gateway': 'stripe'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_402_PAYMENT_REQUIRED)
+        self.assertEqual(response.data['status'], 'failed')
+        declined.refresh_from_db()
+        self.assertEqual(declined.status, 'pending')
+
+    def test_retried_charge_is_recorded_once(self):
+        order = self.create_order()
+        payload = {'order_id': order.id, 'amount': '10.00', 'currency': 'USD', 'gateway': 'stripe'}
+        first = self.client.post(reverse('payment-process'), payload, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.client.post(reverse('payment-process'), payload, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual((first.status_code, retry.status_code), (status.HTTP_201_CREATED, status.HTTP_200_OK))
+        self.assertEqual(first.data['transaction_id'], retry.data['transaction_id'])
+        self.assertEqual(PaymentTransaction.objects.filter(order=order).count(), 1)
+
+    def test_malformed_answers_fail_and_declines_get_unique_ids(self):
+        answers = [httpx.Response(402, json={'message': 'Declined'}), httpx.Response(402, json={})]
+
+        def handle(request):
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        gateway = HTTPGateway(
+            'flaky', endpoint='http://flaky', transport=httpx.MockTransport(handle),
+            failure_threshold=1, reset_timeout=0
+        )
+        run_gateway_call(gateway.open())
+        declines = [run_gateway_call(gateway.charge('10.00', 'USD', 'ORD-1', idempotency_key=key)) for key in 'ab']
+        self.assertEqual([result.status for result in declines], ['failed', 'failed'])
+        self.assertNotEqual(declines[0].transaction_id, declines[1].transaction_id)
+
+        answers.extend([httpx.Response(200, json={'status': 'succeeded'}), httpx.Response(200, json=['ch_1']),
+                        RuntimeError('bug')])
+        for error in (GatewayError, GatewayError, RuntimeError):
+            with self.assertRaises(error):
+                run_gateway_call(gateway.charge('10.00', 'USD', 'ORD-1'))
+            # Every failure ends the half-open trial, so the next call is let through
+            self.assertFalse(gateway.breaker.trial_running)
+        run_gateway_call(gateway.close())
+
+    def test_circuit_opens_after_repeated_failures(self):
+        calls = []
+
+        def handle(request):
+            calls.append(request)
+            return httpx.Response(503, json={})
+
+        gateway = HTTPGateway(
+            'flaky', endpoint='http://flaky', transport=httpx.MockTransport(handle), failure_threshold=2
+        )
+        run_gateway_call(gateway.open())
+        for _ in range(2):
+            with self.assertRaises(GatewayError):
+                run_gateway_call(gateway.charge('10.00', 'USD', 'ORD-1'))
+        with self.assertRaises(GatewayUnavailable):
+            run_gateway_call(gateway.charge('10.00', 'USD', 'ORD-1'))
+        self.assertEqual(len(calls), 2)
+        run_gateway_call(gateway.close())
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+class RevenueRollupTest(PaymentTestMixin, APITestCase):
+    def rollup_totals(self):
+        return list(RevenueRollup.objects.values_list(
+            'gateway', 'completed_amount', 'completed_count', 'refunded_amount', 'refunded_count'
+        ).order_by('gateway'))
+
+    def test_rollups_follow_status_changes(self):
+        order = Order.objects.create(
+            customer=self.admin, status='pending', total_amount='25.00',
+            shipping_address='A', billing_address='B', payment_method='card',
+            shipping_method='standard'
+        )
+        self.client.post(reverse('payment-process'), {
+            'order_id': order.id, 'amount': '25.00', 'currency': 'USD', 'gateway': 'stripe'
+        }, format='json')
+        self.create_payment('txn_1')
+        self.create_payment('txn_2', amount='5.00', gateway='paypal')
+        self.assertEqual(self.rollup_totals(), [('stripe', 25, 1, 0, 0)])
+
+        self.client.post(reverse('payment-reconcile'), {
+            'transaction_id': 'txn_1', 'status': 'completed'
+        }, format='json')
+        csv_file = SimpleUploadedFile('settlement.csv', b'id,amount,status\ntxn_2,5.00,settled\n')
+        self.client.post(reverse('settlement-upload'), {'gateway': 'paypal', 'file': csv_file})
+        self.client.post(reverse('payment-reconcile'), {
+            'transaction_id': 'txn_1', 'status': 'refunded'
+        }, format='json')
+        expected = [('paypal', 5, 1, 0, 0), ('stripe', 25, 1, 10, 1)]
+        self.assertEqual(self.rollup_totals(), expected)
+
+        RevenueRollup.objects.update(completed_amount=0)
+        self.assertEqual(rebuild_rollups(), 2)
+        self.assertEqual(self.rollup_totals(), expected)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('sales-reports'), {'period': 'gateway'})
+        self.assertEqual([(row['gateway'], row['total_sales'], row['order_count']) for row in response.data],
+                         [('stripe', 25, 1), ('paypal', 5, 1)])
+
+    def test_existing_payments_are_backfilled(self):
+        migration = importlib.import_module('payments.migrations.0010_backfill_revenue_rollups')
+        self.create_payment('txn_1', payment_status='completed')
+        self.create_payment('txn_2', payment_status='refunded', gateway='paypal')
+        self.create_payment('txn_3')
+        RevenueRollup.objects.all().delete()
+
+        migration.backfill_rollups(apps, None)
+        self.assertEqual(self.rollup_totals(), [('paypal', 0, 0, 10, 1), ('stripe', 10, 1, 0, 0)])
+
+class LedgerTest(PaymentTestMixin, APITestCase):
+    def balances(self):
+        return dict(LedgerAccount.objects.values_list('code', 'balance'))
+
+    def test_payment_status_changes_are_posted(self):
+        self.create_payment('txn_1')
+        self.create_payment('txn_2', gateway='paypal')
+        self.client.post(reverse('payment-reconcile'), {'transaction_id': 'txn_1', 'status': 'completed'}, format='json')
+        before_refund = timezone.now()
+        csv_file = SimpleUploadedFile('settlement.csv', b'id,amount,status\ntxn_2,10.00,chargeback\n')
+        self.client.post(reverse('settlement-upload'), {'gateway': 'paypal', 'file': csv_file})
+
+        self.assertEqual(self.balances(), {
+            'cash:stripe:USD': 10, 'cash:paypal:USD': 0, 'revenue:sales:USD': -20, 'expense:refunds:USD': 10,
+        })
+        self.assertEqual(sorted(JournalEntry.objects.values_list('entry_type', flat=True)),
+                         ['capture', 'capture', 'refund'])
+        sales = LedgerAccount.objects.get(code='revenue:sales:USD')
+        self.assertEqual(balance_at(sales, before_refund), -10)
+
+        response = self.client.get(reverse('ledger-account-list'), {'at': before_refund.isoformat()})
+        self.assertEqual(
+            {account['code']: account['balance_at'] for account in response.data['results']}['expense:refunds:USD'],
+            None
+        )
+        response = self.client.get(reverse('ledger-posting-list', args=[sales.id]))
+        self.assertEqual([posting['balance'] for posting in response.data['results']], ['-20.00', '-10.00'])
+
+    def test_reverse_transitions_keep_ledger_and_rollups_in_step(self):
+        self.create_payment('txn_1')
+        codes = ('cash:stripe:USD', 'revenue:sales:USD', 'expense:refunds:USD')
+        expected = {
+            'completed': (10, -10, 0), 'refunded': (0, -10, 10), 'pending': (0, 0, 0), 'failed': (0, 0, 0),
+        }
+        for new_status in ['completed', 'refunded', 'completed', 'pending', 'refunded', 'failed', 'refunded']:
+            self.client.post(
+                reverse('payment-reconcile'), {'transaction_id': 'txn_1', 'status': new_status}, format='json'
+            )
+            balances = self.balances()
+            self.assertEqual(tuple(balances.get(code, 0) for code in codes), expected[new_status], new_status)
+            rollup = RevenueRollup.objects.get()
+            self.assertEqual((rollup.completed_amount, rollup.refunded_amount),
+                             ({'completed': 10}.get(new_status, 0), {'refunded': 10}.get(new_status, 0)))
+
+    def test_writer_batches_balanced_entries(self):
+        cash = ('cash:test:USD', 'Cash', 'asset', 'USD')
+        with self.assertRaises(LedgerError):
+            LedgerWriter().add('adjustment', [(cash, 5), (sales_account('USD'), -4)])
+
+        with LedgerWriter(batch_size=50) as ledger:
+            for _ in range(120):
+                ledger.add('adjustment', [(cash, 1), (sales_account('USD'), -1)])
+        self.assertEqual(ledger.posted, 120)
+        self.assertEqual(Posting.objects.count(), 240)
+        self.assertEqual(self.balances(), {'cash:test:USD': 120, 'revenue:sales:USD': -120})
+
+class FxReportingTest(PaymentTestMixin, APITestCase):
+    def test_reports_convert_in_the_aggregate(self):
+        today = timezone.localdate()
+        load_rates([(today - timedelta(days=3), 'eur', '1.10'), (today - timedelta(days=1), 'EUR', '1.20')])
+        self.create_payment('txn_1', amount='10.00', payment_status='completed')
+        eur = self.create_payment('txn_2', amount='100.00', payment_status='completed')
+        eur.currency = 'EUR'
+        eur.save()
+        self.create_payment('txn_3', amount='7.00', payment_status='completed', gateway='paypal')
+        PaymentTransaction.objects.filter(transaction_id='txn_3').update(currency='GBP')
+        rebuild_rollups()
+
+        self.assertEqual(fx_rate('EUR', today - timedelta(days=2)), Decimal('1.10'))
+        self.assertEqual(fx_rate('EUR', today), Decimal('1.20'))
+        with self.assertRaises(FxError):
+            fx_rate('GBP', today)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('sales-reports'), {'period': 'gateway'})
+        # GBP has no rate loaded, so it drops out of the converted total and is flagged
+        self.assertEqual(
+            [(row['gateway'], row['total_sales'], row['unconverted_currencies']) for row in response.data],
+            [('stripe', Decimal('130.00'), []), ('paypal', None, ['GBP'])]
+        )
+        response = self.client.get(reverse('sales-reports'), {'period': 'monthly'})
+        self.assertEqual(response.data[0]['unconverted_currencies'], ['GBP'])
+        revenue = self.client.get(reverse('dashboard-summary')).data['revenue']
+        self.assertEqual((revenue['total'], revenue['unconverted_currencies']), (Decimal('130.00'), ['GBP']))
+        with self.captureOnCommitCallbacks() as callbacks:
+            load_rates([(date(2000, 1, 1), 'GBP', '1.25')])
+        # Processes keep their table until the rates are committed
+        with self.assertRaises(FxError):
+            fx_rate('GBP', today)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(fx_rate('GBP', today), Decimal('1.25'))
+        response = self.client.get(reverse('sales-reports'), {'period': 'daily'})
+        self.assertEqual(response.data[0]['total_sales'], Decimal('138.75'))
+        self.assertEqual(response.data[0]['unconverted_currencies'], [])
+
+    def test_rate_files_with_invalid_rates_are_rejected(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as handle:
+            handle.write('date,currency,rate\n2026-10-01,EUR,1.10\n2026-10-02,EUR,n/a\n')
+            handle.flush()
+            with self.assertRaises(CommandError):
+                call_command('load_fx_rates', handle.name)
+        self.assertFalse(FxRate.objects.exists())
+
+class DisputeTest(PaymentTestMixin, APITestCase):
+    def import_report(self, body):
+        report = SimpleUploadedFile('disputes.csv', body.encode())
+        return self.client.post(reverse('dispute-import'), {'gateway': 'stripe', 'file': report}, format='multipart')
+
+    def test_report_import_links_and_updates_disputes(self):
+        open_payment = self.create_payment('ch_1', payment_status='completed')
+        lost_payment = self.create_payment('ch_2', payment_status='completed')
+        soon = (timezone.now() + timedelta(hours=20)).isoformat()
+        later = (timezone.now() + timedelta(days=5)).isoformat()
+
+        response = self.import_report(
+            'Dispute ID,Charge,Amount,Currency,Status,Reason,Evidence Due By\n'
+            f'dp_1,ch_1,10.00,usd,needs_response,fraudulent,{soon}\n'
+            f'dp_2,ch_2,10.00,usd,under_review,product_not_received,{later}\n'
+            f'dp_3,ch_9,5.00,usd,needs_response,duplicate,{soon}\n'
+            'dp_4,ch_1,oops,usd,needs_response,duplicate,\n'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(
+            (response.data['line_count'], response.data['imported_count'],
+             response.data['invalid_count'], response.data['unmatched_count']),
+            (4, 3, 1, 1)
+        )
+        self.assertEqual(Dispute.objects.get(dispute_id='dp_1').payment_id, open_payment.id)
+
+        due = self.client.get(reverse('dispute-list'), {'due_within': 48})
+        self.assertEqual([d['dispute_id'] for d in due.data['results']], ['dp_1', 'dp_3'])
+
+        response = self.import_report('id,charge,amount,status\ndp_2,ch_2,10.00,lost\n')
+        self.assertEqual(response.data['refunded_count'], 1)
+        lost = Dispute.objects.get(dispute_id='dp_2')
+        self.assertEqual((lost.status, lost.outcome, lost.reason), ('resolved', 'lost', 'product_not_received'))
+        self.assertIsNotNone(lost.resolved_at)
+        lost_payment.refresh_from_db()
+        self.assertEqual(lost_payment.status, 'refunded')
+        self.assertEqual(Dispute.objects.count(), 3)
+
+        # Losing a partial chargeback does not refund the whole payment
+        partial_payment = self.create_payment('ch_3', amount='50.00', payment_status='completed')
+        response = self.import_report('id,charge,amount,status\ndp_5,ch_3,20.00,lost\n')
+        self.assertEqual((response.data['refunded_count'], response.data['partial_count']), (0, 1))
+        partial_payment.refresh_from_db()
+        self.assertEqual(partial_payment.status, 'completed')
+        response = self.client.get(reverse('dispute-detail', args=[Dispute.objects.get(dispute_id='dp_5').id]))
+        self.assertTrue(response.data['partial_chargeback'])
+
+    def test_report_without_required_columns_fails(self):
+        response = self.import_report('id,amount\ndp_1,10.00\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data['error'])
+
+    def test_evidence_is_stored_by_reference_and_dispute_resolved(self):
+        payment = self.create_payment('ch_1', payment_status='completed')
+        dispute = Dispute.objects.create(
+            gateway='stripe', dispute_id='dp_1', transaction_id='ch_1', payment=payment, amount='10.00'
+        )
+        with self.settings(DISPUTE_EVIDENCE_STORAGE={
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': tempfile.mkdtemp()},
+        }):
+            response = self.client.post(reverse('dispute-evidence', args=[dispute.id]), {
+                'evidence[0]': SimpleUploadedFile('receipt.pdf', b'%PDF-1.4', content_type='application/pdf'),
+            }, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            evidence = response.data['evidence'][0]
+            self.assertEqual((evidence['file_name'], evidence['size']), ('receipt.pdf', 8))
+            self.assertTrue(dispute.evidence.get().storage_key.startswith(f'disputes/{dispute.id}/'))
+
+            download = self.client.get(evidence['file_url'])
+            self.assertEqual(b''.join(download.streaming_content), b'%PDF-1.4')
+
+        response = self.client.patch(reverse('dispute-detail', args=[dispute.id]), {'status': 'resolved'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('dispute-resolve', args=[dispute.id]), {'outcome': 'won', 'resolution': 'Proof of delivery'}
+        )
+        self.assertEqual((response.data['status'], response.data['outcome']), ('resolved', 'won'))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+        response = self.client.patch(reverse('dispute-detail', args=[dispute.id]), {'status': 'open'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # A resolved dispute cannot be resolved again with another outcome
+        response = self.client.post(reverse('dispute-resolve', args=[dispute.id]), {'outcome': 'lost'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        dispute.refresh_from_db()
+        self.assertEqual((dispute.status, dispute.outcome), ('resolved', 'won'))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+        partial = Dispute.objects.create(
+            gateway='stripe', dispute_id='dp_2', transaction_id='ch_1', payment=payment, amount='4.00'
+        )
+        response = self.client.post(reverse('dispute-resolve', args=[partial.id]), {'outcome': 'lost'})
+        self.assertEqual((response.data['outcome'], response.data['partial_chargeback']), ('lost', True))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+        response = self.client.get(reverse('dispute-list'), {'min_amount': '5', 'max_amount': '10.00'})
+        self.assertEqual([row['id'] for row in response.data['results']], [dispute.id])
+        for params in ({'min_amount': 'ten'}, {'max_amount': 'NaN'}):
+            self.assertEqual(self.client.get(reverse('dispute-list'), params).status_code,
+                             status.HTTP_400_BAD_REQUEST)
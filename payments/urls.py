@@ -6,4 +6,17 @@ urlpatterns = [
     path('<int:pk>/', views.PaymentTransactionDetailView.as_view(), name='payment-detail'),
     path('process/', views.process_payment, name='payment-process'),
     path('reconcile/', views.reconcile_payment, name='payment-reconcile'),
+    path('lookup/', views.lookup_payments, name='payment-lookup'),
+    path('webhooks/<str:gateway>/', views.gateway_webhook, name='payment-webhook'),
+    path('settlements/', views.SettlementFileListView.as_view(), name='settlement-list'),
+    path('settlements/upload/', views.upload_settlement, name='settlement-upload'),
+    path('settlements/<int:pk>/mismatches/', views.SettlementMismatchListView.as_view(), name='settlement-mismatches'),
+    path('disputes/', views.DisputeListView.as_view(), name='dispute-list'),
+    path('disputes/import/', views.upload_dispute_report, name='dispute-import'),
+    path('disputes/<int:pk>/', views.DisputeDetailView.as_view(), name='dispute-detail'),
+    path('disputes/<int:pk>/resolve/', views.resolve_payment_dispute, name='dispute-resolve'),
+    path('disputes/<int:pk>/evidence/', views.upload_dispute_evidence, name='dispute-evidence'),
+    path('disputes/evidence/<int:pk>/', views.download_dispute_evidence, name='dispute-evidence-download'),
+    path('ledger/accounts/', views.LedgerAccountListView.as_view(), name='ledger-account-list'),
+    path('ledger/accounts/<int:pk>/postings/', views.LedgerPostingListView.as_view(), name='ledger-posting-list'),
 ]
\ No newline at end of file
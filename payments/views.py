@@ -1,11 +1,31 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import transaction
-from .models import PaymentTransaction
-from .serializers import PaymentTransactionSerializer, PaymentProcessSerializer, PaymentReconciliationSerializer
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+import uuid
+from .models import Dispute, DisputeEvidence, LedgerAccount, PaymentTransaction, Posting, SettlementFile, SettlementLine
+from .serializers import (
+    PaymentTransactionSerializer, PaymentProcessSerializer, PaymentReconciliationSerializer, PaymentLookupSerializer,
+    SettlementFileSerializer, SettlementUploadSerializer, SettlementMismatchSerializer,
+    LedgerAccountSerializer, PostingSerializer, DisputeSerializer, DisputeResolveSerializer
+)
+from .disputes import (
+    DisputeError, due_within, get_evidence_storage, import_dispute_report, resolve_dispute, store_evidence
+)
+from .gateways import GatewayError, charge
+from .ledger import accounts_with_balance_at, post_payment
+from .rollups import record_payment
+from .settlement import MISMATCH_RESULTS, process_settlement_file
+from .webhooks import WebhookError, receive_webhook
 
 class PaymentTransactionListView(generics.ListAPIView):
     queryset = PaymentTransaction.objects.select_related('order__customer')
@@ -40,23 +60,46 @@ def process_payment(request):
     except Order.DoesNotExist:
         return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Simulate payment processing (in real implementation, integrate with actual payment gateway)
-    transaction_id = f"txn_{order_id}_{gateway.lower()}_{order.created_at.timestamp()}"
-
-    with transaction.atomic():
-        payment = PaymentTransaction.objects.create(
-            order=order,
-            amount=amount,
-            currency=currency,
-            gateway=gateway,
-            transaction_id=transaction_id,
-            status='completed'  # Simulate successful payment
+    # A client retrying with the same Idempotency-Key gets the original charge back
+    idempotency_key = request.headers.get('Idempotency-Key') or uuid.uuid4().hex
+    try:
+        result = charge(
+            gateway, amount, currency, order.order_number, serializer.validated_data.get('payment_method_details'),
+            idempotency_key=idempotency_key[:255],
         )
+    except GatewayError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    try:
+        with transaction.atomic():
+            payment = PaymentTransaction.objects.create(
+                order=order,
+                amount=amount,
+                currency=currency,
+                gateway=gateway,
+                transaction_id=result.transaction_id,
+                status=result.status
+            )
+            record_payment(payment)
+            post_payment(payment)
 
-        # Update order status
-        order.status = 'confirmed'
-        order.save()
+            if result.status == 'completed':
+                order.status = 'confirmed'
+                order.save()
+    except IntegrityError:
+        recorded = PaymentTransaction.objects.filter(
+            gateway=gateway, transaction_id=result.transaction_id, order=order
+        ).first()
+        if recorded is None:
+            return Response({'error': 'Payment transaction already recorded'}, status=status.HTTP_400_BAD_REQUEST)
+        # A retried request whose charge is already recorded
+        return Response(PaymentTransactionSerializer(recorded).data, status=status.HTTP_200_OK)
 
+    if result.status == 'failed':
+        return Response(
+            dict(PaymentTransactionSerializer(payment).data, error=result.message or 'Payment declined'),
+            status=status.HTTP_402_PAYMENT_REQUIRED
+        )
     return Response(PaymentTransactionSerializer(payment).data, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
@@ -69,15 +112,23 @@ def reconcile_payment(request):
     transaction_id = serializer.validated_data['transaction_id']
     new_status = serializer.validated_data['status']
 
+    payments = PaymentTransaction.objects.select_related('order').filter(transaction_id=transaction_id)
+    if 'gateway' in serializer.validated_data:
+        payments = payments.filter(gateway=serializer.validated_data['gateway'])
     try:
-        payment = PaymentTransaction.objects.get(transaction_id=transaction_id)
+        payment = payments.get()
     except PaymentTransaction.DoesNotExist:
         return Response({'error': 'Payment transaction not found'}, status=status.HTTP_404_NOT_FOUND)
+    except PaymentTransaction.MultipleObjectsReturned:
+        return Response({'error': 'Transaction ID exists for several gateways; pass gateway'},
+                        status=status.HTTP_400_BAD_REQUEST)
 
     with transaction.atomic():
         old_status = payment.status
         payment.status = new_status
         payment.save()
+        record_payment(payment, old_status)
+        post_payment(payment, old_status)
 
         # Handle order status based on payment status
         if new_status == 'completed' and old_status != 'completed':
@@ -91,3 +142,192 @@ def reconcile_payment(request):
             payment.order.save()
 
     return Response(PaymentTransactionSerializer(payment).data)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def lookup_payments(request):
+    serializer = PaymentLookupSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    transaction_ids = set(serializer.validated_data['transaction_ids'])
+    payments = PaymentTransaction.objects.select_related('order__customer').filter(transaction_id__in=transaction_ids)
+    if 'gateway' in serializer.validated_data:
+        payments = payments.filter(gateway=serializer.validated_data['gateway'])
+    payments = list(payments)
+
+    found = {payment.transaction_id for payment in payments}
+    return Response({
+        'results': PaymentTransactionSerializer(payments, many=True).data,
+        'missing': sorted(transaction_ids - found),
+    })
+
+class SettlementFileListView(generics.ListAPIView):
+    queryset = SettlementFile.objects.all()
+    serializer_class = SettlementFileSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['gateway', 'status']
+
+class SettlementMismatchListView(generics.ListAPIView):
+    """Mismatch report of a reconciled settlement file"""
+    serializer_class = SettlementMismatchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['result']
+    ordering = ['line_number']
+
+    def get_queryset(self):
+        return SettlementLine.objects.filter(
+            settlement_id=self.kwargs['pk'], result__in=MISMATCH_RESULTS
+        ).select_related('payment')
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def upload_settlement(request):
+    serializer = SettlementUploadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    upload = serializer.validated_data['file']
+    settlement = process_settlement_file(
+        upload, serializer.validated_data['gateway'], upload.name, user=request.user
+    )
+    response_status = status.HTTP_400_BAD_REQUEST if settlement.status == 'failed' else status.HTTP_201_CREATED
+    return Response(SettlementFileSerializer(settlement).data, status=response_status)
+
+def _parse_moment(value):
+    """A datetime, or a date meaning the end of that day"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({'at': 'Expected a date or datetime'})
+        moment = datetime.combine(day + timedelta(days=1), time.min) - timedelta(microseconds=1)
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+class LedgerAccountListView(generics.ListAPIView):
+    """Ledger accounts with current balances; ?at=<date or datetime> adds each balance at that moment"""
+    serializer_class = LedgerAccountSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['account_type', 'currency']
+    ordering = ['code']
+
+    def get_queryset(self):
+        accounts = LedgerAccount.objects.all()
+        at = self.request.query_params.get('at')
+        if at:
+            accounts = accounts_with_balance_at(_parse_moment(at), accounts)
+        return accounts
+
+class LedgerPostingListView(generics.ListAPIView):
+    """Postings of one ledger account, newest first"""
+    serializer_class = PostingSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Posting.objects.filter(account_id=self.kwargs['pk']).select_related('entry').order_by('-posted_at', '-id')
+
+class DisputeListView(generics.ListAPIView):
+    """Disputes; ?due_within=<hours> lists open disputes whose evidence is due by then, soonest first"""
+    serializer_class = DisputeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['status', 'outcome', 'gateway', 'reason']
+    search_fields = ['dispute_id', 'transaction_id']
+    ordering_fields = ['created_at', 'amount', 'evidence_due_by']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        disputes = Dispute.objects.select_related('payment').prefetch_related('evidence')
+        params = self.request.query_params
+        if params.get('due_within'):
+            try:
+                hours = int(params['due_within'])
+            except ValueError:
+                raise ValidationError({'due_within': 'Expected a number of hours'})
+            disputes = due_within(hours, disputes)
+            # Soonest deadline first unless ?ordering= asks otherwise
+            self.ordering = ['evidence_due_by']
+        for param, lookup in (('date_from', 'created_at__date__gte'), ('date_to', 'created_at__date__lte')):
+            if params.get(param):
+                day = parse_date(params[param])
+                if day is None:
+                    raise ValidationError({param: 'Expected a date'})
+                disputes = disputes.filter(**{lookup: day})
+        for param, lookup in (('min_amount', 'amount__gte'), ('max_amount', 'amount__lte')):
+            if params.get(param):
+                try:
+                    amount = Decimal(params[param])
+                except InvalidOperation:
+                    amount = None
+                if amount is None or not amount.is_finite():
+                    raise ValidationError({param: 'Expected an amount'})
+                disputes = disputes.filter(**{lookup: amount})
+        return disputes
+
+class DisputeDetailView(generics.RetrieveUpdateAPIView):
+    queryset = Dispute.objects.select_related('payment').prefetch_related('evidence')
+    serializer_class = DisputeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def resolve_payment_dispute(request, pk):
+    """Close an open dispute; an outcome of 'lost' refunds its payment unless the chargeback is partial"""
+    dispute = get_object_or_404(Dispute.objects.select_related('payment'), pk=pk)
+    serializer = DisputeResolveSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        resolve_dispute(dispute, user=request.user, **serializer.validated_data)
+    except DisputeError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(DisputeSerializer(dispute, context={'request': request}).data)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def upload_dispute_evidence(request, pk):
+    """Store every uploaded file as evidence of the dispute"""
+    dispute = get_object_or_404(Dispute, pk=pk)
+    uploads = [upload for key in request.FILES for upload in request.FILES.getlist(key)]
+    if not uploads:
+        return Response({'error': 'No files uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+    for upload in uploads:
+        store_evidence(dispute, upload, user=request.user)
+    dispute = Dispute.objects.select_related('payment').prefetch_related('evidence').get(pk=pk)
+    return Response(DisputeSerializer(dispute, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def download_dispute_evidence(request, pk):
+    evidence = get_object_or_404(DisputeEvidence, pk=pk)
+    storage = get_evidence_storage()
+    if not storage.exists(evidence.storage_key):
+        raise Http404('Evidence file is missing from storage')
+    return FileResponse(
+        storage.open(evidence.storage_key), content_type=evidence.content_type or None, filename=evidence.file_name
+    )
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def upload_dispute_report(request):
+    """Import a gateway dispute report CSV (see payments.disputes)"""
+    serializer = SettlementUploadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        counts = import_dispute_report(serializer.validated_data['file'], serializer.validated_data['gateway'])
+    except DisputeError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(counts, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def gateway_webhook(request, gateway):
+    """Signed gateway callback; the event is queued and applied by payments.tasks.process_webhook_inbox"""
+    try:
+        receive_webhook(gateway, request.body, request.headers)
+    except WebhookError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'received': True})
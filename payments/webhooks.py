@@ -0,0 +1,256 @@
+"""
+Gateway webhook ingestion.
+
+A webhook request is verified against the gateway's signing secret and its
+event is appended to the WebhookEvent inbox with a single
+INSERT ... ON CONFLICT DO NOTHING on (gateway, event_id), so a retried
+delivery costs one insert and nothing else. The request is answered right
+away; process_webhook_events, run by Celery, drains the inbox in batches:
+
+1. one query loads the payments of the whole batch,
+2. each payment's events are replayed in the order the gateway created them,
+   through payments.settlement.STATUS_TRANSITIONS, so a late or out-of-order delivery cannot move
+   a payment backwards, and
+3. payments and their orders are moved with one UPDATE per target status
+   (see payments.settlement.apply_payment_status).
+
+Gateways often deliver an event before the checkout that created the payment
+has committed it, so events for unknown transactions stay pending and are
+retried with a doubling delay (PAYMENT_WEBHOOK_RETRY_DELAY seconds at first).
+They are marked missing only once PAYMENT_WEBHOOK_MISSING_AFTER seconds have
+passed since they were received.
+"""
+
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import PaymentTransaction, WebhookEvent
+from .settlement import STATUS_ALIASES, apply_payment_status, can_transition
+
+DEFAULT_SIGNATURE_TOLERANCE = 300
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_RETRY_DELAY = 30
+DEFAULT_MISSING_AFTER = 3600
+# Stripe event types and the payment status they imply
+STRIPE_EVENT_STATUSES = {
+    'payment_intent.succeeded': 'completed',
+    'charge.succeeded': 'completed',
+    'payment_intent.payment_failed': 'failed',
+    'charge.failed': 'failed',
+    'charge.refunded': 'refunded',
+    'charge.dispute.funds_withdrawn': 'refunded',
+}
+
+
+class WebhookError(Exception):
+    pass
+
+
+def get_webhook_secret(gateway):
+    return getattr(settings, 'PAYMENT_WEBHOOK_SECRETS', {}).get(gateway.lower())
+
+
+def _sign(secret, message):
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_stripe_signature(secret, body, headers):
+    """Stripe-Signature: t=<timestamp>,v1=<hmac of "<timestamp>.<body>">[,v1=...]"""
+    parts = [item.split('=', 1) for item in headers.get('Stripe-Signature', '').split(',') if '=' in item]
+    timestamp = next((value for key, value in parts if key == 't'), '')
+    signatures = [value for key, value in parts if key == 'v1']
+    if not timestamp.isdigit() or not signatures:
+        raise WebhookError('Missing signature')
+    tolerance = getattr(settings, 'PAYMENT_WEBHOOK_TOLERANCE', DEFAULT_SIGNATURE_TOLERANCE)
+    if abs(time.time() - int(timestamp)) > tolerance:
+        raise WebhookError('Signature timestamp outside tolerance')
+    expected = _sign(secret, timestamp.encode() + b'.' + body)
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise WebhookError('Invalid signature')
+
+
+def verify_hmac_signature(secret, body, headers):
+    """X-Webhook-Signature: [sha256=]<hex hmac of the body>"""
+    signature = headers.get('X-Webhook-Signature', '').removeprefix('sha256=')
+    if not signature:
+        raise WebhookError('Missing signature')
+    if not hmac.compare_digest(_sign(secret, body), signature):
+        raise WebhookError('Invalid signature')
+
+
+def _event_time(value):
+    """A Unix timestamp or ISO 8601 string as an aware datetime, else None"""
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        moment = parse_datetime(value) if isinstance(value, str) else None
+    except (ValueError, OverflowError, OSError):
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+def parse_stripe_event(payload):
+    obj = payload.get('data', {}).get('object', {})
+    transaction_id = obj.get('id', '')
+    if obj.get('object') == 'charge' and obj.get('payment_intent'):
+        # Charges are recorded under their payment intent
+        transaction_id = obj['payment_intent']
+    event_type = payload.get('type', '')
+    status = STRIPE_EVENT_STATUSES.get(event_type, '')
+    return payload.get('id', ''), event_type, transaction_id, status, _event_time(payload.get('created'))
+
+
+def parse_generic_event(payload):
+    event_type = payload.get('type') or payload.get('event_type', '')
+    status = STATUS_ALIASES.get(str(payload.get('status', '')).lower(), '')
+    occurred_at = _event_time(payload.get('created') or payload.get('created_at'))
+    return (
+        payload.get('id') or payload.get('event_id', ''), event_type, payload.get('transaction_id', ''), status,
+        occurred_at,
+    )
+
+
+SIGNATURE_VERIFIERS = {'stripe': verify_stripe_signature}
+EVENT_PARSERS = {'stripe': parse_stripe_event}
+
+
+def receive_webhook(gateway, body, headers):
+    """Verify a webhook request and append its event to the inbox"""
+    gateway = gateway.lower()
+    secret = get_webhook_secret(gateway)
+    if not secret:
+        raise WebhookError(f"No webhook secret configured for {gateway}")
+    SIGNATURE_VERIFIERS.get(gateway, verify_hmac_signature)(secret, body, headers)
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise WebhookError('Invalid JSON payload')
+    if not isinstance(payload, dict):
+        raise WebhookError('Invalid JSON payload')
+    event_id, event_type, transaction_id, status, occurred_at = EVENT_PARSERS.get(gateway, parse_generic_event)(payload)
+    if not event_id:
+        raise WebhookError('Event has no id')
+
+    WebhookEvent.objects.bulk_create([WebhookEvent(
+        gateway=gateway,
+        event_id=str(event_id)[:255],
+        event_type=str(event_type)[:100],
+        transaction_id=str(transaction_id)[:100],
+        status=status,
+        occurred_at=occurred_at,
+        payload=payload,
+    )], ignore_conflicts=True)
+
+
+def _mark(event_ids, result, now):
+    if event_ids:
+        WebhookEvent.objects.filter(id__in=event_ids).update(result=result, processed_at=now)
+
+
+def _defer(events, now):
+    """Retry (event id, attempts) events later, each attempt waiting twice as long as the last"""
+    delay = getattr(settings, 'PAYMENT_WEBHOOK_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+    by_attempts = {}
+    for event_id, attempts in events:
+        by_attempts.setdefault(attempts, []).append(event_id)
+    for attempts, event_ids in by_attempts.items():
+        WebhookEvent.objects.filter(id__in=event_ids).update(
+            attempts=attempts + 1, retry_at=now + timedelta(seconds=delay * 2 ** min(attempts, 10))
+        )
+
+
+def process_webhook_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """Apply one batch of due pending events; returns result counts"""
+    with transaction.atomic():
+        now = timezone.now()
+        events = WebhookEvent.objects.filter(result='pending').filter(
+            Q(retry_at__isnull=True) | Q(retry_at__lte=now)
+        ).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Concurrent workers take disjoint batches
+            events = events.select_for_update(skip_locked=True)
+        events = list(events.values_list(
+            'id', 'gateway', 'transaction_id', 'status', 'occurred_at', 'received_at', 'attempts'
+        )[:batch_size])
+        if not events:
+            return {}
+
+        missing_after = now - timedelta(
+            seconds=getattr(settings, 'PAYMENT_WEBHOOK_MISSING_AFTER', DEFAULT_MISSING_AFTER)
+        )
+        results = {'applied': [], 'unchanged': [], 'missing': [], 'ignored': []}
+        deferred = []
+        # Events per payment in the order the gateway created them
+        pending = {}
+        for event_id, gateway, transaction_id, status, occurred_at, received_at, attempts in sorted(
+            events, key=lambda event: (event[4] or event[5], event[0])
+        ):
+            if not transaction_id or not status:
+                results['ignored'].append(event_id)
+                continue
+            pending.setdefault((gateway, transaction_id), []).append((event_id, status, received_at, attempts))
+
+        lookup = Q()
+        for gateway in {gateway for gateway, _ in pending}:
+            lookup |= Q(gateway=gateway, transaction_id__in=[txn for gw, txn in pending if gw == gateway])
+        payments = {}
+        if pending:
+            payments = {
+                (gateway, transaction_id): (payment_id, payment_status)
+                for payment_id, gateway, transaction_id, payment_status in PaymentTransaction.objects.filter(
+                    lookup
+                ).values_list('id', 'gateway', 'transaction_id', 'status')
+            }
+
+        moves = {}
+        for key, payment_events in pending.items():
+            if key not in payments:
+                for event_id, _, received_at, attempts in payment_events:
+                    if received_at < missing_after:
+                        results['missing'].append(event_id)
+                    else:
+                        deferred.append((event_id, attempts))
+                continue
+            payment_id, current = payments[key]
+            target = current
+            for event_id, status, _, _ in payment_events:
+                if can_transition(target, status):
+                    target = status
+                    results['applied'].append(event_id)
+                else:
+                    results['unchanged'].append(event_id)
+            if target != current:
+                moves.setdefault(target, []).append(payment_id)
+
+        for payment_status, payment_ids in moves.items():
+            apply_payment_status(payment_ids, payment_status)
+        for result, event_ids in results.items():
+            _mark(event_ids, result, now)
+        _defer(deferred, now)
+    return dict({result: len(event_ids) for result, event_ids in results.items()}, deferred=len(deferred))
+
+
+def process_webhook_events(batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Drain the inbox batch by batch, each in its own transaction"""
+    totals = {}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        counts = process_webhook_batch(batch_size)
+        if not counts:
+            break
+        batches += 1
+        for result, count in counts.items():
+            totals[result] = totals.get(result, 0) + count
+    return totals
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0009_orderitem_product_snapshot'),
+        ('shipping', '0001_initial'),
+        ('warehouse', '0002_pick_waves'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReturnAuthorization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rma_number', models.CharField(blank=True, max_length=50, unique=True)),
+                ('status', models.CharField(choices=[('authorized', 'Authorized'), ('received', 'Received'), ('processed', 'Processed'), ('rejected', 'Rejected')], default='authorized', max_length=20)),
+                ('reason', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='returns', to='orders.order')),
+                ('shipment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shipping.shipment')),
+                ('warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='warehouse.warehouse')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReturnItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('inspection_result', models.CharField(choices=[('pending', 'Pending'), ('restock', 'Restock'), ('damaged', 'Damaged'), ('missing', 'Missing')], default='pending', max_length=20)),
+                ('restocked_quantity', models.PositiveIntegerField(default=0)),
+                ('notes', models.TextField(blank=True)),
+                ('inspected_at', models.DateTimeField(blank=True, null=True)),
+                ('order_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='return_items', to='orders.orderitem')),
+                ('rma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='returns.returnauthorization')),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import models
+
+class ReturnAuthorization(models.Model):
+    rma_number = models.CharField(max_length=50, unique=True, blank=True)
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='returns')
+    shipment = models.ForeignKey('shipping.Shipment', on_delete=models.SET_NULL, null=True, blank=True)
+    # Warehouse that receives the returned goods and is restocked on inspection
+    warehouse = models.ForeignKey('warehouse.Warehouse', on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, default='authorized', choices=[
+        ('authorized', 'Authorized'),
+        ('received', 'Received'),
+        ('processed', 'Processed'),
+        ('rejected', 'Rejected')
+    ])
+    reason = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"RMA {self.rma_number}"
+
+    def save(self, *args, **kwargs):
+        if not self.rma_number:
+            from orders.numbering import format_order_number, rma_allocator
+            self.rma_number = format_order_number(rma_allocator.next_value(), prefix='RMA')
+        super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ['-created_at']
+
+class ReturnItem(models.Model):
+    rma = models.ForeignKey(ReturnAuthorization, on_delete=models.CASCADE, related_name='items')
+    order_item = models.ForeignKey('orders.OrderItem', on_delete=models.CASCADE, related_name='return_items')
+    quantity = models.PositiveIntegerField()
+    inspection_result = models.CharField(max_length=20, default='pending', choices=[
+        ('pending', 'Pending'),
+        ('restock', 'Restock'),
+        ('damaged', 'Damaged'),
+        ('missing', 'Missing')
+    ])
+    restocked_quantity = models.PositiveIntegerField(default=0)
+    notes = models.TextField(blank=True)
+    inspected_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.rma.rma_number}: {self.order_item.product_sku} x {self.quantity}"
@@ -0,0 +1,141 @@
+"""
+Batched return inspection and restocking.
+
+A whole returns pallet is processed in one transaction: the inspected
+ReturnItem rows are loaded in one query, restocked quantities are summed per
+(warehouse, product), and each warehouse's Inventory rows are incremented with
+a single UPDATE ... CASE statement (missing rows are bulk inserted).
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from inventory.models import Inventory
+from .models import ReturnAuthorization, ReturnItem
+
+
+class ReturnProcessingError(Exception):
+    pass
+
+
+def create_rma_for_shipment(shipment, reason='Returned to sender'):
+    """
+    Authorize a return of everything packed in the shipment, one RMA per order
+
+    A consolidated shipment carries lines of several orders; each order gets
+    its own RMA (restocked into that order's warehouse). Orders that already
+    have an RMA for the shipment are left alone.
+    """
+    from orders.models import Order
+    from shipping.views import shipment_order_ids
+
+    existing = {rma.order_id: rma for rma in ReturnAuthorization.objects.filter(shipment=shipment)}
+    lines_by_order = defaultdict(list)
+    for line in shipment.lines.select_related('order_item'):
+        lines_by_order[line.order_item.order_id].append((line.order_item, line.quantity))
+
+    rmas = []
+    orders = Order.objects.filter(id__in=shipment_order_ids(shipment)).order_by('id')
+    for order in orders:
+        if order.id in existing:
+            rmas.append(existing[order.id])
+            continue
+        lines = lines_by_order.get(order.id)
+        if not lines:
+            if lines_by_order:
+                # Nothing of this order was packed in the shipment
+                continue
+            lines = [(item, item.quantity) for item in order.items.all()]
+        rma = ReturnAuthorization.objects.create(
+            order=order,
+            shipment=shipment,
+            warehouse_id=order.warehouse_id,
+            reason=reason
+        )
+        ReturnItem.objects.bulk_create([
+            ReturnItem(rma=rma, order_item=item, quantity=quantity) for item, quantity in lines
+        ])
+        rmas.append(rma)
+    return rmas
+
+
+def increment_inventory(warehouse_id, quantities):
+    """Add quantities ({product_id: units}) to one warehouse's stock in one UPDATE"""
+    existing = set(Inventory.objects.filter(
+        warehouse_id=warehouse_id,
+        product_id__in=quantities
+    ).values_list('product_id', flat=True))
+
+    if existing:
+        Inventory.objects.filter(warehouse_id=warehouse_id, product_id__in=existing).update(
+            quantity=F('quantity') + Case(
+                *[When(product_id=product_id, then=Value(quantities[product_id])) for product_id in existing],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        )
+    Inventory.objects.bulk_create([
+        Inventory(warehouse_id=warehouse_id, product_id=product_id, quantity=units)
+        for product_id, units in quantities.items()
+        if product_id not in existing
+    ])
+
+
+def process_inspections(results, warehouse_id=None):
+    """
+    Apply inspection results and restock inventory in a single transaction.
+
+    results is a list of dicts with return_item (id), result (restock, damaged
+    or missing) and an optional quantity to restock (defaults to the returned
+    quantity). Returns a summary of restocked units per warehouse.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        items = ReturnItem.objects.select_for_update().select_related('rma', 'order_item').in_bulk(
+            [result['return_item'] for result in results]
+        )
+
+        restock = defaultdict(Counter)
+        for result in results:
+            item = items.get(result['return_item'])
+            if item is None:
+                raise ReturnProcessingError(f"Return item {result['return_item']} does not exist")
+            if item.inspection_result != 'pending':
+                raise ReturnProcessingError(f"Return item {item.id} has already been inspected")
+
+            item.inspection_result = result['result']
+            item.inspected_at = now
+            item.notes = result.get('notes', '')
+            item.restocked_quantity = 0
+            if result['result'] == 'restock':
+                quantity = result.get('quantity') or item.quantity
+                if quantity > item.quantity:
+                    raise ReturnProcessingError(f"Return item {item.id} only has {item.quantity} units")
+                target = warehouse_id or item.rma.warehouse_id
+                if target is None:
+                    raise ReturnProcessingError(f"No restock warehouse for return item {item.id}")
+                item.restocked_quantity = quantity
+                restock[target][item.order_item.product_id] += quantity
+
+        ReturnItem.objects.bulk_update(
+            items.values(), ['inspection_result', 'restocked_quantity', 'notes', 'inspected_at'], batch_size=500
+        )
+        for target, quantities in restock.items():
+            increment_inventory(target, quantities)
+
+        rma_ids = {item.rma_id for item in items.values()}
+        ReturnAuthorization.objects.filter(id__in=rma_ids).exclude(
+            items__inspection_result='pending'
+        ).update(status='processed', processed_at=now)
+
+    return {
+        'processed_items': len(items),
+        'restocked': [
+            {'warehouse': target, 'product': product_id, 'quantity': units}
+            for target, quantities in restock.items()
+            for product_id, units in quantities.items()
+        ],
+    }
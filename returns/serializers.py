@@ -0,0 +1,56 @@
+from rest_framework import serializers
+from .models import ReturnAuthorization, ReturnItem
+
+class ReturnItemSerializer(serializers.ModelSerializer):
+    product_sku = serializers.CharField(source='order_item.product_sku', read_only=True)
+    product_name = serializers.CharField(source='order_item.product_name', read_only=True)
+
+    class Meta:
+        model = ReturnItem
+        fields = [
+            'id', 'order_item', 'product_sku', 'product_name', 'quantity',
+            'inspection_result', 'restocked_quantity', 'notes', 'inspected_at'
+        ]
+        read_only_fields = ['id', 'inspection_result', 'restocked_quantity', 'notes', 'inspected_at']
+
+class ReturnAuthorizationSerializer(serializers.ModelSerializer):
+    items = ReturnItemSerializer(many=True)
+    order_number = serializers.CharField(source='order.order_number', read_only=True)
+
+    class Meta:
+        model = ReturnAuthorization
+        fields = [
+            'id', 'rma_number', 'order', 'order_number', 'shipment', 'warehouse',
+            'status', 'reason', 'items', 'created_at', 'processed_at'
+        ]
+        read_only_fields = ['id', 'rma_number', 'status', 'created_at', 'processed_at']
+
+    def validate(self, attrs):
+        order = attrs['order']
+        for item in attrs['items']:
+            if item['order_item'].order_id != order.id:
+                raise serializers.ValidationError("Returned items must belong to the order")
+            if item['quantity'] > item['order_item'].quantity:
+                raise serializers.ValidationError("Cannot return more units than were ordered")
+        return attrs
+
+    def create(self, validated_data):
+        items_data = validated_data.pop('items')
+        validated_data.setdefault('warehouse', validated_data['order'].warehouse)
+        rma = ReturnAuthorization.objects.create(**validated_data)
+        ReturnItem.objects.bulk_create([ReturnItem(rma=rma, **item) for item in items_data])
+        return rma
+
+class InspectionResultSerializer(serializers.Serializer):
+    return_item = serializers.IntegerField()
+    result = serializers.ChoiceField(choices=[
+        ('restock', 'Restock'),
+        ('damaged', 'Damaged'),
+        ('missing', 'Missing')
+    ])
+    quantity = serializers.IntegerField(min_value=1, required=False)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+class ReturnProcessSerializer(serializers.Serializer):
+    warehouse_id = serializers.IntegerField(required=False)
+    items = InspectionResultSerializer(many=True, allow_empty=False, max_length=5000)
@@ -0,0 +1,98 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from inventory.models import Inventory
+from marketplace.models import Product, Category
+from orders.models import Order, OrderItem
+from returns.models import ReturnAuthorization
+from returns.restock import create_rma_for_shipment
+from shipping.models import Shipment, ShipmentLine
+from users.models import User
+from warehouse.models import Warehouse
+
+class ReturnProcessingTest(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', user_type='warehouse_staff'
+        )
+        self.warehouse = Warehouse.objects.create(name='Main', address='Address', capacity=1000)
+        category = Category.objects.create(name='Test Category')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', sku=f'SKU{i}', description='', price=5.00,
+                category=category, brand='Brand', images=[], attributes={}
+            )
+            for i in range(2)
+        ]
+        Inventory.objects.create(product=self.products[0], warehouse=self.warehouse, quantity=10)
+        self.order = Order.objects.create(
+            customer=self.staff, status='delivered', total_amount=25.00,
+            shipping_address='A', billing_address='B', payment_method='card',
+            shipping_method='standard', warehouse=self.warehouse
+        )
+        for product, quantity in zip(self.products, [3, 2]):
+            OrderItem.objects.create(
+                order=self.order, product=product, quantity=quantity, unit_price=5.00, total_price=5.00 * quantity
+            )
+        self.shipment = Shipment.objects.create(
+            order=self.order, tracking_number='TRK1', carrier='ups', status='delivered'
+        )
+        self.client.force_authenticate(self.staff)
+
+    def test_returned_shipment_opens_rma(self):
+        url = reverse('shipment-track', args=[self.shipment.pk])
+        response = self.client.put(url, {'status': 'returned'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rma = ReturnAuthorization.objects.get(shipment=self.shipment)
+        self.assertEqual(rma.items.count(), 2)
+        self.assertTrue(rma.rma_number.startswith('RMA-'))
+
+    def test_consolidated_shipment_opens_one_rma_per_order(self):
+        other = Order.objects.create(
+            customer=self.staff, status='delivered', total_amount=5.00,
+            shipping_address='A', billing_address='B', payment_method='card',
+            shipping_method='standard', warehouse=self.warehouse
+        )
+        other_item = OrderItem.objects.create(
+            order=other, product=self.products[1], quantity=1, unit_price=5.00, total_price=5.00
+        )
+        ShipmentLine.objects.bulk_create(
+            [ShipmentLine(shipment=self.shipment, order_item=item, quantity=item.quantity)
+             for item in self.order.items.all()]
+            + [ShipmentLine(shipment=self.shipment, order_item=other_item, quantity=1)]
+        )
+        response = self.client.put(
+            reverse('shipment-track', args=[self.shipment.pk]), {'status': 'returned'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Authorizing the same shipment again reuses the existing RMAs
+        self.assertEqual(len(create_rma_for_shipment(self.shipment)), 2)
+
+        rmas = ReturnAuthorization.objects.filter(shipment=self.shipment)
+        self.assertEqual(sorted(rmas.values_list('order_id', flat=True)), [self.order.id, other.id])
+        self.assertEqual(rmas.get(order=self.order).items.count(), 2)
+        self.assertEqual(list(rmas.get(order=other).items.values_list('order_item_id', 'quantity')),
+                         [(other_item.id, 1)])
+
+    def test_bulk_restock(self):
+        self.client.put(reverse('shipment-track', args=[self.shipment.pk]), {'status': 'returned'}, format='json')
+        rma = ReturnAuthorization.objects.get(shipment=self.shipment)
+        first, second = rma.items.order_by('order_item__product_id')
+
+        response = self.client.post(reverse('return-process'), {'items': [
+            {'return_item': first.id, 'result': 'restock', 'quantity': 2},
+            {'return_item': second.id, 'result': 'restock'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['processed_items'], 2)
+
+        self.assertEqual(Inventory.objects.get(product=self.products[0]).quantity, 12)
+        self.assertEqual(Inventory.objects.get(product=self.products[1]).quantity, 2)
+        rma.refresh_from_db()
+        self.assertEqual(rma.status, 'processed')
+
+        # Items cannot be restocked twice
+        response = self.client.post(reverse('return-process'), {'items': [
+            {'return_item': first.id, 'result': 'damaged'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.ReturnAuthorizationListCreateView.as_view(), name='return-list'),
+    path('<int:pk>/', views.ReturnAuthorizationDetailView.as_view(), name='return-detail'),
+    path('process/', views.process_returns, name='return-process'),
+]
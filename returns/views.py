@@ -0,0 +1,43 @@
+from rest_framework import generics, status, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework.filters import SearchFilter, OrderingFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from .models import ReturnAuthorization
+from .restock import process_inspections, ReturnProcessingError
+from .serializers import ReturnAuthorizationSerializer, ReturnProcessSerializer
+from users.permissions import IsWarehouseStaffOrAdmin
+
+class ReturnAuthorizationListCreateView(generics.ListCreateAPIView):
+    serializer_class = ReturnAuthorizationSerializer
+    permission_classes = [permissions.IsAuthenticated, IsWarehouseStaffOrAdmin]
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['status', 'warehouse', 'order']
+    search_fields = ['rma_number']
+    ordering_fields = ['created_at', 'processed_at']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        return ReturnAuthorization.objects.select_related('order').prefetch_related('items__order_item')
+
+class ReturnAuthorizationDetailView(generics.RetrieveAPIView):
+    queryset = ReturnAuthorization.objects.select_related('order').prefetch_related('items__order_item')
+    serializer_class = ReturnAuthorizationSerializer
+    permission_classes = [permissions.IsAuthenticated, IsWarehouseStaffOrAdmin]
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsWarehouseStaffOrAdmin])
+def process_returns(request):
+    serializer = ReturnProcessSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        summary = process_inspections(
+            serializer.validated_data['items'],
+            warehouse_id=serializer.validated_data.get('warehouse_id')
+        )
+    except ReturnProcessingError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(summary)
@@ -0,0 +1,58 @@
+"""
+Cached public tracking lookups.
+
+The minimal tracking payload and its ETag are cached per tracking number and
+dropped whenever the shipment's status or scan history changes, so clients
+and the nginx cache in front of the API can revalidate with If-None-Match
+against a cheap cache hit.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Shipment, TrackingEvent
+
+DEFAULT_TRACKING_CACHE_TIMEOUT = 3600
+DEFAULT_TRACKING_MAX_AGE = 60
+
+
+def tracking_cache_key(tracking_number):
+    return f"shipping:track:{hashlib.md5(tracking_number.encode()).hexdigest()}"
+
+
+def tracking_max_age():
+    return getattr(settings, 'SHIPPING_TRACKING_MAX_AGE', DEFAULT_TRACKING_MAX_AGE)
+
+
+def build_tracking_payload(tracking_number):
+    shipment = Shipment.objects.filter(tracking_number=tracking_number).values(
+        'id', 'tracking_number', 'carrier', 'status', 'shipped_at', 'delivered_at'
+    ).first()
+    if shipment is None:
+        return None
+    shipment['last_event'] = TrackingEvent.objects.filter(shipment_id=shipment.pop('id')).order_by(
+        '-occurred_at'
+    ).values('occurred_at', 'description', 'location').first()
+    return json.loads(json.dumps(shipment, cls=DjangoJSONEncoder))
+
+
+def get_tracking(tracking_number):
+    """(payload, etag) for a tracking number, or None when it is unknown"""
+    key = tracking_cache_key(tracking_number)
+    cached = cache.get(key)
+    if cached is None:
+        payload = build_tracking_payload(tracking_number)
+        if payload is None:
+            return None
+        etag = '"%s"' % hashlib.md5(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        cached = (payload, etag)
+        cache.set(key, cached, getattr(settings, 'SHIPPING_TRACKING_CACHE_TIMEOUT', DEFAULT_TRACKING_CACHE_TIMEOUT))
+    return cached
+
+
+def invalidate_tracking(tracking_numbers):
+    cache.delete_many([tracking_cache_key(number) for number in tracking_numbers])
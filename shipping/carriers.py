@@ -0,0 +1,197 @@
+"""
+Carrier tracking adapters.
+
+Each carrier is reached through a CarrierAdapter that looks up tracking
+numbers in batches. Adapters are chosen per carrier code from the
+SHIPPING_CARRIER_ADAPTERS setting (dotted paths), falling back to
+SHIPPING_DEFAULT_CARRIER_ADAPTER. FakeCarrierAdapter answers from an
+in-process FakeCarrierServer so the poller can be exercised against any number
+of shipments without network access.
+"""
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+
+import httpx
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SHIPMENT_STATUSES = ('pending', 'in_transit', 'delivered', 'returned')
+
+
+@dataclass(frozen=True)
+class TrackingUpdate:
+    tracking_number: str
+    status: str
+    occurred_at: datetime
+    event_code: str = ''
+    description: str = ''
+    location: str = ''
+
+
+class CarrierError(Exception):
+    pass
+
+
+class CarrierAdapter:
+    """Base class for carrier integrations; subclasses implement fetch()"""
+    # Concurrent requests allowed against the carrier
+    max_connections = 10
+    # Requests per second allowed by the carrier
+    rate_limit = 20
+    # Tracking numbers looked up per request
+    batch_size = 50
+
+    def __init__(self, carrier, **options):
+        self.carrier = carrier
+        for name, value in options.items():
+            setattr(self, name, value)
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch(self, tracking_numbers):
+        """Return TrackingUpdates for the tracking numbers the carrier knows about"""
+        raise NotImplementedError
+
+
+class HTTPCarrierAdapter(CarrierAdapter):
+    """
+    Generic JSON tracking API: POST {"tracking_numbers": [...]} to endpoint and
+    read {"results": [{"tracking_number", "status", "occurred_at"}]} back.
+
+    Requests share one httpx.AsyncClient whose keep-alive pool is sized to
+    max_connections, as payments.gateways.HTTPGateway does.
+    """
+    endpoint = None
+    api_key = None
+    # Seconds to wait for a connection and for the whole request
+    connect_timeout = 2.0
+    timeout = 10.0
+    transport = None
+
+    async def open(self):
+        if not self.endpoint:
+            raise CarrierError(f"No tracking endpoint configured for {self.carrier}")
+        headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else {}
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            transport=self.transport,
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+    def parse_result(self, result):
+        """
+        TrackingUpdate for one result record, or None if the record is unusable.
+        Timestamps without an offset are taken as UTC.
+        """
+        try:
+            tracking_number = result['tracking_number']
+            status = result['status']
+            occurred_at = datetime.fromisoformat(result['occurred_at'])
+        except (TypeError, KeyError, ValueError) as exc:
+            logger.warning('Skipping malformed %s tracking record %r: %s', self.carrier, result, exc)
+            return None
+        if not isinstance(tracking_number, str) or not tracking_number or status not in SHIPMENT_STATUSES:
+            return None
+        if timezone.is_naive(occurred_at):
+            occurred_at = timezone.make_aware(occurred_at, dt_timezone.utc)
+        return TrackingUpdate(
+            tracking_number=tracking_number,
+            status=status,
+            occurred_at=occurred_at,
+            event_code=str(result.get('event_code') or ''),
+            description=str(result.get('description') or ''),
+            location=str(result.get('location') or '')
+        )
+
+    async def fetch(self, tracking_numbers):
+        try:
+            response = await self.client.post(self.endpoint, json={'tracking_numbers': tracking_numbers})
+            response.raise_for_status()
+            body = response.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            raise CarrierError(f"{self.carrier} tracking request failed: {exc!r}") from exc
+        results = body.get('results', []) if isinstance(body, dict) else None
+        if not isinstance(results, list):
+            raise CarrierError(f"{self.carrier} sent an invalid tracking response")
+        # One bad record must not cost the rest of the batch
+        updates = [self.parse_result(result) for result in results]
+        return [update for update in updates if update is not None]
+
+
+class FakeCarrierServer:
+    """
+    In-process stand-in for a carrier tracking API.
+
+    Every lookup advances a parcel through pending -> in_transit -> delivered,
+    with a small, deterministic share of parcels being returned instead. The
+    server records how many requests it served and the peak number served at
+    once so tests and load runs can check pool limits.
+    """
+
+    def __init__(self, latency=0.0, polls_to_deliver=2, return_rate=0.01):
+        self.latency = latency
+        self.polls_to_deliver = polls_to_deliver
+        self.return_rate = return_rate
+        self.polls = {}
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+
+    def _status(self, tracking_number):
+        polls = self.polls[tracking_number] = self.polls.get(tracking_number, 0) + 1
+        if polls < self.polls_to_deliver:
+            return 'in_transit'
+        digest = int(hashlib.md5(tracking_number.encode()).hexdigest()[:8], 16)
+        return 'returned' if digest % 10000 < self.return_rate * 10000 else 'delivered'
+
+    async def track(self, tracking_numbers):
+        self.requests += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            now = timezone.now()
+            return [TrackingUpdate(number, self._status(number), now) for number in tracking_numbers]
+        finally:
+            self.active -= 1
+
+
+fake_carrier_server = FakeCarrierServer()
+
+
+class FakeCarrierAdapter(CarrierAdapter):
+    """Adapter backed by the in-process FakeCarrierServer"""
+    server = None
+
+    async def fetch(self, tracking_numbers):
+        return await (self.server or fake_carrier_server).track(tracking_numbers)
+
+
+def get_carrier_adapter(carrier):
+    """Instantiate the configured adapter for a carrier code"""
+    configured = getattr(settings, 'SHIPPING_CARRIER_ADAPTERS', {}).get(carrier.lower())
+    if configured is None:
+        default = getattr(settings, 'SHIPPING_DEFAULT_CARRIER_ADAPTER', None)
+        if default is None:
+            return None
+        configured = {'ADAPTER': default}
+    elif isinstance(configured, str):
+        configured = {'ADAPTER': configured}
+    adapter_class = import_string(configured['ADAPTER'])
+    return adapter_class(carrier, **configured.get('OPTIONS', {}))
@@ -0,0 +1,82 @@
+"""
+Bulk ingest of carrier tracking events.
+
+Events arrive from carrier webhooks and from the tracking poller, often
+repeated. They are resolved to shipments with one query per chunk and inserted
+with bulk_create(ignore_conflicts=True) (INSERT ... ON CONFLICT DO NOTHING on
+PostgreSQL) against the (shipment, event_code, occurred_at) unique constraint,
+so replays and overlapping polls never create duplicate scans.
+"""
+
+from .cache import invalidate_tracking
+from .models import Shipment, TrackingEvent
+
+INGEST_CHUNK_SIZE = 2000
+
+
+def _resolve_shipments(keys):
+    """Map (carrier, tracking_number) keys to shipment ids; carrier may be None"""
+    numbers = {tracking_number for _, tracking_number in keys}
+    resolved = {}
+    for shipment_id, carrier, tracking_number in Shipment.objects.filter(
+        tracking_number__in=numbers
+    ).values_list('id', 'carrier', 'tracking_number'):
+        resolved[(carrier, tracking_number)] = shipment_id
+        resolved.setdefault((None, tracking_number), shipment_id)
+    return resolved
+
+
+def ingest_tracking_events(events):
+    """
+    Store events given as dicts with tracking_number, event_code and
+    occurred_at, plus optional carrier, status, description and location.
+
+    Returns (accepted, unknown): events written or already present, and
+    events whose shipment could not be found.
+    """
+    accepted = unknown = 0
+    for start in range(0, len(events), INGEST_CHUNK_SIZE):
+        chunk = events[start:start + INGEST_CHUNK_SIZE]
+        shipments = _resolve_shipments({(event.get('carrier'), event['tracking_number']) for event in chunk})
+        rows = []
+        numbers = set()
+        for event in chunk:
+            shipment_id = shipments.get((event.get('carrier'), event['tracking_number']))
+            if shipment_id is None:
+                unknown += 1
+                continue
+            numbers.add(event['tracking_number'])
+            rows.append(TrackingEvent(
+                shipment_id=shipment_id,
+                event_code=event['event_code'],
+                status=event.get('status', ''),
+                description=event.get('description', ''),
+                location=event.get('location', ''),
+                occurred_at=event['occurred_at'],
+            ))
+        TrackingEvent.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        invalidate_tracking(numbers)
+        accepted += len(rows)
+    return accepted, unknown
+
+
+def record_status_events(changes):
+    """Store the scans behind poller status changes ({shipment_id: TrackingUpdate})"""
+    TrackingEvent.objects.bulk_create([
+        TrackingEvent(
+            shipment_id=shipment_id,
+            event_code=update.event_code or update.status.upper(),
+            status=update.status,
+            description=update.description,
+            location=update.location,
+            occurred_at=update.occurred_at,
+        )
+        for shipment_id, update in changes.items()
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+def shipment_timeline(shipment_id):
+    """Events of one shipment, oldest first, read straight from the timeline index"""
+    return list(TrackingEvent.objects.filter(shipment_id=shipment_id).order_by('occurred_at').values_list(
+        'occurred_at', 'event_code', 'status', 'location', 'description'
+    ))
@@ -0,0 +1,142 @@
+"""
+Order fulfillment state derived from shipment lines.
+
+An order is 'delivered' once every ordered unit sits in a delivered shipment,
+'shipped' once every unit has left the warehouse, and 'processing' while only
+part of it has shipped. The state of any number of orders is computed with one
+aggregate query and written back with one UPDATE. Orders only ever move
+forward: a shipment returned after delivery does not take its order back to
+'shipped'.
+"""
+
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from orders.cache import invalidate_order_histories
+from orders.models import Order, OrderItem
+from .models import Shipment, ShipmentLine
+
+# Orders in these states are never moved by shipment changes
+FINAL_ORDER_STATUSES = ['cancelled', 'refunded']
+# Fulfillment progress; shipment changes only move an order to a later state
+ORDER_STATUS_RANK = {'pending': 0, 'confirmed': 1, 'processing': 2, 'shipped': 3, 'delivered': 4}
+
+
+def unshipped_lines(order):
+    """Return (order_item, quantity) pairs for units of order not yet in any shipment"""
+    shipped = {
+        row['order_item_id']: row['total']
+        for row in ShipmentLine.objects.filter(order_item__order=order).values('order_item_id').annotate(
+            total=Sum('quantity')
+        )
+    }
+    return [
+        (item, item.quantity - shipped.get(item.id, 0))
+        for item in order.items.all()
+        if item.quantity > shipped.get(item.id, 0)
+    ]
+
+
+def _line_total(condition):
+    lines = ShipmentLine.objects.filter(condition, order_item__order_id=OuterRef('pk')).values(
+        'order_item__order_id'
+    ).annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(lines, output_field=IntegerField()), Value(0))
+
+
+def derive_order_status(ordered, shipped, delivered):
+    if ordered and delivered >= ordered:
+        return 'delivered'
+    if ordered and shipped >= ordered:
+        return 'shipped'
+    if shipped:
+        return 'processing'
+    return None
+
+
+def sync_order_statuses(order_ids):
+    """Recompute and store the status of the given orders from their shipment lines"""
+    ordered = OrderItem.objects.filter(order_id=OuterRef('pk')).values('order_id').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    rows = Order.objects.filter(id__in=order_ids).exclude(status__in=FINAL_ORDER_STATUSES).annotate(
+        ordered=Coalesce(Subquery(ordered, output_field=IntegerField()), Value(0)),
+        shipped=_line_total(Q(shipment__shipped_at__isnull=False)),
+        delivered=_line_total(Q(shipment__status='delivered')),
+    ).values_list('id', 'status', 'ordered', 'shipped', 'delivered')
+
+    changes = {}
+    for order_id, current, ordered_units, shipped_units, delivered_units in rows:
+        new_status = derive_order_status(ordered_units, shipped_units, delivered_units)
+        if new_status and ORDER_STATUS_RANK[new_status] > ORDER_STATUS_RANK.get(current, -1):
+            changes[order_id] = new_status
+
+    if changes:
+        by_status = {}
+        for order_id, new_status in changes.items():
+            by_status.setdefault(new_status, []).append(order_id)
+        invalidate_order_histories(Order.objects.filter(id__in=changes))
+        Order.objects.filter(id__in=changes).update(
+            status=Case(*[When(id__in=ids, then=Value(new_status)) for new_status, ids in by_status.items()]),
+            updated_at=timezone.now()
+        )
+    return changes
+
+
+def next_tracking_number(carrier):
+    """Internal tracking number for shipments created without a carrier-issued one"""
+    from orders.numbering import tracking_allocator
+    prefix = ''.join(ch for ch in carrier.upper() if ch.isalnum())[:3] or 'TRK'
+    return f"{prefix}{tracking_allocator.next_value():012d}"
+
+
+def create_shipments_bulk(entries):
+    """
+    Create one shipment per entry ({order, carrier, tracking_number?}) in bulk.
+
+    Every shipment carries all still-unshipped units of its order. Shipments
+    (with shipped_at already set) and their lines are inserted with two
+    bulk_create calls and the orders move forward through
+    sync_order_statuses. Returns (created shipments, ids of orders skipped
+    because they are cancelled or refunded or nothing was left to ship).
+    """
+    order_ids = [entry['order'] for entry in entries]
+    shipped = dict(
+        ShipmentLine.objects.filter(order_item__order_id__in=order_ids).values('order_item_id').annotate(
+            total=Sum('quantity')
+        ).values_list('order_item_id', 'total')
+    )
+    pending = {}
+    for item_id, order_id, quantity in OrderItem.objects.filter(order_id__in=order_ids).exclude(
+        order__status__in=FINAL_ORDER_STATUSES
+    ).values_list(
+        'id', 'order_id', 'quantity'
+    ):
+        remaining = quantity - shipped.get(item_id, 0)
+        if remaining > 0:
+            pending.setdefault(order_id, []).append((item_id, remaining))
+
+    now = timezone.now()
+    to_create = [entry for entry in entries if entry['order'] in pending]
+    skipped = [entry['order'] for entry in entries if entry['order'] not in pending]
+
+    shipments = Shipment.objects.bulk_create([
+        Shipment(
+            order_id=entry['order'],
+            carrier=entry['carrier'],
+            tracking_number=entry.get('tracking_number') or next_tracking_number(entry['carrier']),
+            status='pending',
+            weight=entry.get('weight'),
+            postal_code=entry.get('postal_code', ''),
+            shipped_at=now,
+        )
+        for entry in to_create
+    ], batch_size=500)
+    ShipmentLine.objects.bulk_create([
+        ShipmentLine(shipment=shipment, order_item_id=item_id, quantity=quantity)
+        for shipment in shipments
+        for item_id, quantity in pending[shipment.order_id]
+    ], batch_size=1000)
+    sync_order_statuses([shipment.order_id for shipment in shipments])
+    return shipments, skipped
@@ -0,0 +1,132 @@
+"""
+4x6 shipping label templates.
+
+Pure Python, with no Django imports, so label rendering can run in worker
+processes. Templates are compiled on first use, or by compile_templates() in a
+pool initializer: field placeholders are split out once and each element
+becomes a list of literal and field parts that only needs joining per label.
+A rendered PDF label is the page content stream (see shipping.labels for the
+document around it); a ZPL label is a complete ^XA ... ^XZ block.
+"""
+
+from string import Formatter
+
+# 4x6 inches in PDF points and in 8 dot/mm (203 dpi) printer dots
+PDF_PAGE_SIZE = (288, 432)
+ZPL_PRINT_WIDTH = 812
+
+PDF_TEMPLATE = [
+    ('text', 'F2', 9, 14, 410, 'FROM'),
+    ('text', 'F1', 9, 14, 398, '{sender_name}'),
+    ('block', 'F1', 9, 14, 387, 11, '{sender_address}', 3),
+    ('rule', 14, 350, 274, 350),
+    ('text', 'F2', 11, 14, 330, 'SHIP TO'),
+    ('block', 'F1', 12, 14, 312, 15, '{recipient_address}', 5),
+    ('text', 'F2', 14, 14, 230, '{postal_code}'),
+    ('rule', 14, 215, 274, 215),
+    ('text', 'F2', 26, 14, 180, '{carrier}'),
+    ('text', 'F1', 10, 14, 160, 'Weight: {weight} kg'),
+    ('rule', 14, 145, 274, 145),
+    ('text', 'F1', 10, 14, 125, 'TRACKING #'),
+    ('text', 'F2', 18, 14, 100, '{tracking_number}'),
+    ('text', 'F1', 9, 14, 30, 'Order {order_number}'),
+]
+
+ZPL_TEMPLATE = (
+    '^XA^CI28^PW{print_width}\n'
+    '^FO30,30^A0N,24,24^FDFROM^FS\n'
+    '^FO30,60^A0N,24,24^FD{sender_name}^FS\n'
+    '^FO30,90^A0N,22,22^FB750,3,0,L^FD{sender_address}^FS\n'
+    '^FO30,180^GB750,3,3^FS\n'
+    '^FO30,200^A0N,30,30^FDSHIP TO^FS\n'
+    '^FO30,240^A0N,36,36^FB750,5,0,L^FD{recipient_address}^FS\n'
+    '^FO30,440^A0N,44,44^FD{postal_code}^FS\n'
+    '^FO30,500^GB750,3,3^FS\n'
+    '^FO30,530^A0N,70,70^FD{carrier}^FS\n'
+    '^FO500,550^A0N,28,28^FD{weight} kg^FS\n'
+    '^FO30,620^GB750,3,3^FS\n'
+    '^FO60,660^BY3^BCN,200,Y,N,N^FD{tracking_number}^FS\n'
+    '^FO30,1130^A0N,24,24^FDOrder {order_number}^FS\n'
+    '^XZ\n'
+)
+
+_compiled = {}
+
+
+def _split(template):
+    """Split a format string into literal and field-name parts once"""
+    parts = []
+    for literal, field, _, _ in Formatter().parse(template):
+        if literal:
+            parts.append((False, literal))
+        if field is not None:
+            parts.append((True, field))
+    return parts
+
+
+def _fill(parts, label, escape):
+    return ''.join(escape(str(label.get(value, ''))) if is_field else value for is_field, value in parts)
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _zpl_escape(text):
+    # ^ and ~ start ZPL commands; field blocks break lines on \&
+    return text.replace('^', ' ').replace('~', ' ').replace('\r', '').replace('\n', '\\&')
+
+
+def _compile_pdf(template):
+    elements = []
+    for element in template:
+        kind = element[0]
+        if kind == 'text':
+            _, font, size, x, y, text = element
+            elements.append((kind, f'BT /{font} {size} Tf {x} {y} Td (', _split(text)))
+        elif kind == 'block':
+            _, font, size, x, y, leading, text, max_lines = element
+            elements.append((kind, f'BT /{font} {size} Tf {leading} TL {x} {y} Td', _split(text), max_lines))
+        else:
+            _, x1, y1, x2, y2 = element
+            elements.append((kind, f'0.8 w {x1} {y1} m {x2} {y2} l S\n'))
+    return elements
+
+
+def compile_templates():
+    """Compile every template; used as the label worker pool initializer"""
+    _compiled['pdf'] = _compile_pdf(PDF_TEMPLATE)
+    _compiled['zpl'] = _split(ZPL_TEMPLATE)
+
+
+def render_pdf_page(label):
+    if 'pdf' not in _compiled:
+        compile_templates()
+    ops = []
+    for element in _compiled['pdf']:
+        kind = element[0]
+        if kind == 'text':
+            ops.append(f'{element[1]}{_fill(element[2], label, _pdf_escape)}) Tj ET\n')
+        elif kind == 'block':
+            lines = [line.strip() for line in _fill(element[2], label, str).splitlines() if line.strip()]
+            shown = ''.join(f' ({_pdf_escape(line)}) Tj T*' for line in lines[:element[3]])
+            ops.append(f'{element[1]}{shown} ET\n')
+        else:
+            ops.append(element[1])
+    return ''.join(ops).encode('latin-1', 'replace')
+
+
+def render_zpl_label(label):
+    if 'zpl' not in _compiled:
+        compile_templates()
+    label = dict(label, print_width=ZPL_PRINT_WIDTH)
+    return _fill(_compiled['zpl'], label, _zpl_escape).encode('utf-8')
+
+
+RENDERERS = {'pdf': render_pdf_page, 'zpl': render_zpl_label}
+
+
+def render_batch(label_format, labels):
+    """Render a chunk of labels (dicts) in one worker call"""
+    render = RENDERERS[label_format]
+    return [render(label) for label in labels]
@@ -0,0 +1,122 @@
+"""
+Batch shipping label rendering.
+
+Label data for a batch is read in one query in the calling process. Rendering
+runs in a process pool of SHIPPING_LABEL_WORKERS processes, each with its
+templates compiled once (see shipping.label_templates), in chunks of
+LABEL_CHUNK_SIZE labels. The rendered labels are merged into one document:
+a multi-page PDF, or a ZPL stream with one ^XA...^XZ block per label.
+Documents are either streamed back as they are assembled or written to the
+label storage. Small batches and daemonic processes render in-process
+instead. Celery's prefork children are daemonic, so the render task is routed
+to the 'labels' queue, whose worker runs with --pool=solo and can start the
+pool (see CELERY_TASK_ROUTES and docker-compose.yml).
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils.module_loading import import_string
+
+from . import label_templates
+from .models import Shipment
+
+LABEL_FORMATS = ('pdf', 'zpl')
+CONTENT_TYPES = {'pdf': 'application/pdf', 'zpl': 'application/zpl'}
+LABEL_CHUNK_SIZE = 100
+# Below this many labels the pool start-up costs more than it saves
+POOL_THRESHOLD = 1000
+
+DEFAULT_LABEL_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': settings.BASE_DIR / 'labels'},
+}
+
+
+def get_label_storage():
+    config = getattr(settings, 'SHIPPING_LABEL_STORAGE', DEFAULT_LABEL_STORAGE)
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def label_data(shipments):
+    """Plain dicts with everything a label prints, in shipment order"""
+    labels = []
+    for row in shipments.order_by('id').values(
+        'tracking_number', 'carrier', 'weight', 'postal_code', 'order__order_number',
+        'order__shipping_address', 'order__warehouse__name', 'order__warehouse__address'
+    ):
+        labels.append({
+            'tracking_number': row['tracking_number'],
+            'carrier': row['carrier'].upper(),
+            'weight': row['weight'] if row['weight'] is not None else '',
+            'postal_code': row['postal_code'],
+            'order_number': row['order__order_number'],
+            'recipient_address': row['order__shipping_address'],
+            'sender_name': row['order__warehouse__name'] or '',
+            'sender_address': row['order__warehouse__address'] or '',
+        })
+    return labels
+
+
+def render_labels(label_format, labels, workers=None):
+    """Rendered labels (bytes) in input order"""
+    chunks = [labels[start:start + LABEL_CHUNK_SIZE] for start in range(0, len(labels), LABEL_CHUNK_SIZE)]
+    workers = workers or getattr(settings, 'SHIPPING_LABEL_WORKERS', None) or multiprocessing.cpu_count()
+    if len(labels) < POOL_THRESHOLD or workers < 2 or multiprocessing.current_process().daemon:
+        return label_templates.render_batch(label_format, labels)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=label_templates.compile_templates) as pool:
+        rendered = pool.map(label_templates.render_batch, [label_format] * len(chunks), chunks)
+        return [label for chunk in rendered for label in chunk]
+
+
+def pdf_document(pages):
+    """Yield a PDF with one 4x6 page per content stream"""
+    width, height = label_templates.PDF_PAGE_SIZE
+    offsets = []
+    position = 0
+
+    def emit(data):
+        nonlocal position
+        position += len(data)
+        return data
+
+    def obj(number, body):
+        offsets.append(position)
+        return emit(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    # Objects: 1 catalog, 2 page tree, 3-4 fonts, then a page and its content per label
+    kids = b' '.join(b'%d 0 R' % (5 + 2 * index) for index in range(len(pages)))
+    yield emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    yield obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield obj(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(pages)))
+    yield obj(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    yield obj(4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+    for index, content in enumerate(pages):
+        page = 5 + 2 * index
+        yield obj(page, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                        b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+                  % (width, height, page + 1))
+        yield obj(page + 1, b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content))
+
+    xref = position
+    yield b'xref\n0 %d\n0000000000 65535 f \n' % (len(offsets) + 1)
+    yield b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    yield b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(offsets) + 1, xref)
+
+
+def label_document(shipments, label_format='pdf', workers=None):
+    """Render the shipments' labels and yield the merged document in chunks"""
+    rendered = render_labels(label_format, label_data(shipments), workers)
+    if label_format == 'pdf':
+        return pdf_document(rendered)
+    return iter(rendered)
+
+
+def save_label_document(shipment_ids, label_format, name, workers=None):
+    """Render a batch and write the merged document to the label storage"""
+    shipments = Shipment.objects.filter(id__in=shipment_ids)
+    document = b''.join(label_document(shipments, label_format, workers))
+    return get_label_storage().save(name, ContentFile(document))
@@ -0,0 +1,65 @@
+import csv
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shipping.models import RateBreak, RateTable, ZoneMapping
+from shipping.rates import invalidate_rate_engine
+
+
+class Command(BaseCommand):
+    help = 'Load carrier rate tables and warehouse zone mappings from CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rates',
+            help='CSV with carrier,service,zone,max_weight,price; replaces the breaks of every listed service'
+        )
+        parser.add_argument('--zones', help='CSV with warehouse,postal_prefix,zone')
+
+    def handle(self, *args, **options):
+        if not options['rates'] and not options['zones']:
+            raise CommandError('Pass --rates and/or --zones')
+
+        with transaction.atomic():
+            if options['rates']:
+                self.import_rates(options['rates'])
+            if options['zones']:
+                self.import_zones(options['zones'])
+        invalidate_rate_engine()
+
+    def import_rates(self, path):
+        with open(path, newline='') as handle:
+            rows = list(csv.DictReader(handle))
+
+        tables = {}
+        for key in {(row['carrier'], row['service']) for row in rows}:
+            tables[key], _ = RateTable.objects.get_or_create(carrier=key[0], service=key[1])
+        RateBreak.objects.filter(rate_table__in=tables.values()).delete()
+        RateBreak.objects.bulk_create([
+            RateBreak(
+                rate_table=tables[(row['carrier'], row['service'])],
+                zone=int(row['zone']),
+                max_weight=Decimal(row['max_weight']),
+                price=Decimal(row['price'])
+            )
+            for row in rows
+        ], batch_size=1000)
+        self.stdout.write(f"Loaded {len(rows)} rate breaks for {len(tables)} services")
+
+    def import_zones(self, path):
+        with open(path, newline='') as handle:
+            mappings = [
+                ZoneMapping(
+                    warehouse_id=int(row['warehouse']),
+                    postal_prefix=row['postal_prefix'].replace(' ', '').upper(),
+                    zone=int(row['zone'])
+                )
+                for row in csv.DictReader(handle)
+            ]
+        ZoneMapping.objects.bulk_create(
+            mappings, batch_size=1000,
+            update_conflicts=True, unique_fields=['warehouse', 'postal_prefix'], update_fields=['zone']
+        )
+        self.stdout.write(f"Loaded {len(mappings)} zone mappings")
@@ -0,0 +1,36 @@
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from shipping.carriers import FakeCarrierAdapter, FakeCarrierServer
+from shipping.tracking import poll_shipments
+
+
+class Command(BaseCommand):
+    help = 'Fetch tracking updates for all active shipments from their carriers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--carrier', action='append',
+            help='Only poll shipments of this carrier (may be repeated)'
+        )
+        parser.add_argument(
+            '--fake', action='store_true',
+            help='Answer every carrier from the in-process fake carrier server (no network access)'
+        )
+        parser.add_argument(
+            '--fake-latency', type=float, default=0.05,
+            help='Seconds the fake carrier server takes per request'
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {}
+        if options['fake']:
+            server = FakeCarrierServer(latency=options['fake_latency'])
+            kwargs['adapter_factory'] = partial(FakeCarrierAdapter, server=server)
+
+        summary = poll_shipments(carriers=options['carrier'], **kwargs)
+        self.stdout.write(self.style.SUCCESS(
+            f"Polled {summary['polled']} shipments, updated {summary['updated']}, "
+            f"{summary['failed_batches']} failed batches"
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_orderitem_product_snapshot'),
+        ('shipping', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('order_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shipment_lines', to='orders.orderitem')),
+                ('shipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='shipping.shipment')),
+            ],
+            options={
+                'unique_together': {('shipment', 'order_item')},
+            },
+        ),
+        migrations.RunSQL(
+            # Existing shipments carried their whole order
+            sql=(
+                "INSERT INTO shipping_shipmentline (shipment_id, order_item_id, quantity) "
+                "SELECT s.id, i.id, i.quantity FROM shipping_shipment s "
+                "JOIN orders_orderitem i ON i.order_id = s.order_id"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
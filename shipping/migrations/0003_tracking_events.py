@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipping', '0002_shipment_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_code', models.CharField(max_length=30)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('location', models.CharField(blank=True, max_length=100)),
+                ('occurred_at', models.DateTimeField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('shipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='shipping.shipment')),
+            ],
+            options={
+                'ordering': ['occurred_at'],
+                'indexes': [models.Index(fields=['shipment', 'occurred_at'], name='tracking_event_timeline_idx')],
+                'constraints': [models.UniqueConstraint(fields=('shipment', 'event_code', 'occurred_at'), name='tracking_event_unique')],
+            },
+        ),
+    ]
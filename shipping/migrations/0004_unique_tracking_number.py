@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:13
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def suffix_duplicate_tracking_numbers(apps, schema_editor):
+    """Keep the oldest shipment's number and suffix the others with their id"""
+    Shipment = apps.get_model('shipping', 'Shipment')
+    duplicated = Shipment.objects.values('tracking_number').annotate(n=Count('id')).filter(n__gt=1)
+    for row in duplicated.iterator():
+        shipments = Shipment.objects.filter(tracking_number=row['tracking_number']).order_by('id')[1:]
+        for shipment in shipments:
+            shipment.tracking_number = f"{shipment.tracking_number}-{shipment.id}"[:100]
+        Shipment.objects.bulk_update(shipments, ['tracking_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipping', '0003_tracking_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(suffix_duplicate_tracking_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='shipment',
+            name='tracking_number',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipping', '0004_unique_tracking_number'),
+        ('warehouse', '0002_pick_waves'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateTable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carrier', models.CharField(max_length=50)),
+                ('service', models.CharField(max_length=50)),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('transit_days', models.PositiveSmallIntegerField(default=5)),
+                ('dim_divisor', models.PositiveIntegerField(default=5000)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'unique_together': {('carrier', 'service')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RateBreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zone', models.PositiveSmallIntegerField()),
+                ('max_weight', models.DecimalField(decimal_places=3, max_digits=8)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('rate_table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='breaks', to='shipping.ratetable')),
+            ],
+            options={
+                'unique_together': {('rate_table', 'zone', 'max_weight')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ZoneMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('postal_prefix', models.CharField(max_length=10)),
+                ('zone', models.PositiveSmallIntegerField()),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shipping_zones', to='warehouse.warehouse')),
+            ],
+            options={
+                'unique_together': {('warehouse', 'postal_prefix')},
+            },
+        ),
+    ]
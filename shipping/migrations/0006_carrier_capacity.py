@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipping', '0005_rate_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarrierCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carrier', models.CharField(max_length=50, unique=True)),
+                ('daily_limit', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='postal_code',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='weight',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=8, null=True),
+        ),
+        migrations.AlterField(
+            model_name='shipment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('in_transit', 'In Transit'), ('delivered', 'Delivered'), ('returned', 'Returned')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_orderitem_product_snapshot'),
+        ('shipping', '0006_carrier_capacity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('status', 'delivered')), fields=['delivered_at'], name='shipment_delivered_idx'),
+        ),
+    ]
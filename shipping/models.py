@@ -2,14 +2,17 @@ from django.db import models
 
 class Shipment(models.Model):
     order = models.ForeignKey('orders.Order', on_delete=models.CASCADE)
-    tracking_number = models.CharField(max_length=100)
+    tracking_number = models.CharField(max_length=100, unique=True)
     carrier = models.CharField(max_length=50)
     status = models.CharField(max_length=20, choices=[
         ('pending', 'Pending'),
         ('in_transit', 'In Transit'),
         ('delivered', 'Delivered'),
         ('returned', 'Returned')
-    ])
+    ], default='pending')
+    # Parcel weight (kg) and destination postal code, used for rating
+    weight = models.DecimalField(max_digits=8, decimal_places=3, null=True, blank=True)
+    postal_code = models.CharField(max_length=20, blank=True)
     shipped_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
 
@@ -18,3 +21,100 @@ class Shipment(models.Model):
 
     class Meta:
         ordering = ['-shipped_at']
+        indexes = [
+            # Delivered-in-period scans of the commission settlement (see marketplace.commissions)
+            models.Index(
+                fields=['delivered_at'], name='shipment_delivered_idx', condition=models.Q(status='delivered')
+            ),
+        ]
+
+
+class ShipmentLine(models.Model):
+    """Quantity of one order line packed in a shipment; allows split and consolidated shipments"""
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='lines')
+    order_item = models.ForeignKey('orders.OrderItem', on_delete=models.CASCADE, related_name='shipment_lines')
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.shipment.tracking_number}: {self.order_item_id} x {self.quantity}"
+
+    class Meta:
+        unique_together = ('shipment', 'order_item')
+
+
+class TrackingEvent(models.Model):
+    """One carrier scan of a shipment; ingested in bulk, duplicates are ignored"""
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='events')
+    event_code = models.CharField(max_length=30)
+    status = models.CharField(max_length=20, blank=True)
+    description = models.CharField(max_length=255, blank=True)
+    location = models.CharField(max_length=100, blank=True)
+    occurred_at = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.shipment_id} {self.event_code} @ {self.occurred_at}"
+
+    class Meta:
+        ordering = ['occurred_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['shipment', 'event_code', 'occurred_at'], name='tracking_event_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['shipment', 'occurred_at'], name='tracking_event_timeline_idx'),
+        ]
+
+
+class ZoneMapping(models.Model):
+    """Shipping zone from a warehouse to a destination postal code prefix"""
+    warehouse = models.ForeignKey('warehouse.Warehouse', on_delete=models.CASCADE, related_name='shipping_zones')
+    postal_prefix = models.CharField(max_length=10)
+    zone = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.warehouse_id} -> {self.postal_prefix}: zone {self.zone}"
+
+    class Meta:
+        unique_together = ('warehouse', 'postal_prefix')
+
+
+class RateTable(models.Model):
+    """A carrier service's price list; prices are weight breaks per zone"""
+    carrier = models.CharField(max_length=50)
+    service = models.CharField(max_length=50)
+    currency = models.CharField(max_length=3, default='USD')
+    transit_days = models.PositiveSmallIntegerField(default=5)
+    # Volumetric divisor (cm^3 per kg) for dimensional weight
+    dim_divisor = models.PositiveIntegerField(default=5000)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.carrier} {self.service}"
+
+    class Meta:
+        unique_together = ('carrier', 'service')
+
+
+class RateBreak(models.Model):
+    """Price of parcels up to max_weight (kg) to one zone"""
+    rate_table = models.ForeignKey(RateTable, on_delete=models.CASCADE, related_name='breaks')
+    zone = models.PositiveSmallIntegerField()
+    max_weight = models.DecimalField(max_digits=8, decimal_places=3)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.rate_table} zone {self.zone} <= {self.max_weight}kg: {self.price}"
+
+    class Meta:
+        unique_together = ('rate_table', 'zone', 'max_weight')
+
+
+class CarrierCapacity(models.Model):
+    """Shipments a carrier accepts per day; carriers without a row are unlimited"""
+    carrier = models.CharField(max_length=50, unique=True)
+    daily_limit = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.carrier}: {self.daily_limit}/day"
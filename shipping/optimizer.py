@@ -0,0 +1,150 @@
+"""
+Carrier selection for batches of pending shipments.
+
+Every shipment is rated against every service in one vectorized rate engine
+call; each carrier is then represented by its best service for the parcel
+(cheapest, or fastest with cost as tie-breaker). Shipments are assigned
+greedily in order of regret, the extra cost of their second-best carrier, so
+the parcels that lose most from a full carrier are placed first while
+capacity remains. Carrier daily capacity comes from CarrierCapacity minus
+what the carrier has already been given today.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, QuerySet
+from django.utils import timezone
+
+from .cache import invalidate_tracking
+from .models import CarrierCapacity, Shipment
+from .rates import get_rate_engine
+
+OBJECTIVES = ('cheapest', 'fastest')
+# Added per transit day when optimizing for speed; larger than any parcel price
+TRANSIT_DAY_WEIGHT = 1e6
+UPDATE_CHUNK_SIZE = 1000
+
+
+def carrier_options(engine, prices, objective='cheapest'):
+    """
+    Collapse a (service x parcel) price matrix to carriers.
+
+    Returns (carriers, scores, costs, services): the carrier codes and
+    (carrier x parcel) arrays of the objective score, price and service index
+    of each carrier's best service.
+    """
+    scores = prices
+    if objective == 'fastest':
+        scores = prices + engine.transit_days[:, None] * TRANSIT_DAY_WEIGHT
+
+    carriers = sorted(set(engine.carriers))
+    parcels = np.arange(prices.shape[1])
+    carrier_scores = np.full((len(carriers), prices.shape[1]), np.inf)
+    carrier_costs = np.full_like(carrier_scores, np.inf)
+    carrier_services = np.zeros(carrier_scores.shape, dtype=np.intp)
+    for row, carrier in enumerate(carriers):
+        service_rows = np.flatnonzero(engine.carriers == carrier)
+        best = np.argmin(scores[service_rows], axis=0)
+        carrier_services[row] = service_rows[best]
+        carrier_scores[row] = scores[carrier_services[row], parcels]
+        carrier_costs[row] = prices[carrier_services[row], parcels]
+    return carriers, carrier_scores, carrier_costs, carrier_services
+
+
+def assign_greedy(scores, capacity):
+    """
+    Assign each parcel (column) to a carrier (row) within capacity.
+
+    Returns an array of carrier rows, -1 for parcels no carrier can take.
+    """
+    carrier_count, parcel_count = scores.shape
+    assignment = np.full(parcel_count, -1, dtype=np.intp)
+    if not carrier_count or not parcel_count:
+        return assignment
+
+    ranked = np.sort(scores, axis=0)
+    second = ranked[1] if carrier_count > 1 else np.full(parcel_count, np.inf)
+    with np.errstate(invalid='ignore'):
+        regret = second - ranked[0]
+    regret[~np.isfinite(ranked[0])] = -1
+
+    remaining = np.asarray(capacity, dtype=float).copy()
+    preferences = np.argsort(scores, axis=0, kind='stable')
+    for parcel in np.argsort(-regret, kind='stable'):
+        for carrier in preferences[:, parcel]:
+            if not np.isfinite(scores[carrier, parcel]):
+                break
+            if remaining[carrier] > 0:
+                remaining[carrier] -= 1
+                assignment[parcel] = carrier
+                break
+    return assignment
+
+
+def remaining_capacity(carriers, exclude_ids):
+    """Shipments each carrier can still take today; inf when unlimited"""
+    limits = dict(CarrierCapacity.objects.filter(carrier__in=carriers).values_list('carrier', 'daily_limit'))
+    start_of_day = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    used = dict(
+        Shipment.objects.filter(carrier__in=limits, shipped_at__gte=start_of_day).exclude(
+            id__in=exclude_ids
+        ).values('carrier').annotate(n=Count('id')).values_list('carrier', 'n')
+    )
+    return np.array([
+        max(limits[carrier] - used.get(carrier, 0), 0) if carrier in limits else np.inf
+        for carrier in carriers
+    ])
+
+
+def optimize_carriers(shipments, objective='cheapest', apply=True):
+    """
+    Choose carriers for pending shipments (a queryset or ids) and write them
+    back with one UPDATE per carrier and chunk.
+    """
+    if not isinstance(shipments, QuerySet):
+        shipments = Shipment.objects.filter(id__in=list(shipments))
+    rows = list(shipments.filter(status='pending').values_list('id', 'order__warehouse_id', 'postal_code', 'weight'))
+    shipment_ids = [row[0] for row in rows]
+
+    engine = get_rate_engine()
+    prices = engine.price_matrix(
+        [row[1] for row in rows],
+        [row[2] for row in rows],
+        [float(row[3]) if row[3] is not None else np.inf for row in rows],
+    )
+    carriers, scores, costs, services = carrier_options(engine, prices, objective)
+    assignment = assign_greedy(scores, remaining_capacity(carriers, shipment_ids))
+
+    assigned = defaultdict(list)
+    results = []
+    unassigned = []
+    for parcel, shipment_id in enumerate(shipment_ids):
+        carrier = assignment[parcel]
+        if carrier < 0:
+            unassigned.append(shipment_id)
+            continue
+        assigned[carriers[carrier]].append(shipment_id)
+        results.append({
+            'shipment': shipment_id,
+            'carrier': carriers[carrier],
+            'service': engine.services[services[carrier, parcel]][1],
+            'cost': round(float(costs[carrier, parcel]), 2),
+        })
+
+    if apply:
+        for carrier, ids in assigned.items():
+            for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+                chunk = Shipment.objects.filter(id__in=ids[start:start + UPDATE_CHUNK_SIZE])
+                tracking_numbers = list(chunk.values_list('tracking_number', flat=True))
+                chunk.update(carrier=carrier)
+                # update() skips the post_save that refreshes public tracking
+                transaction.on_commit(lambda numbers=tracking_numbers: invalidate_tracking(numbers))
+
+    return {
+        'assignments': results,
+        'unassigned': unassigned,
+        'total_cost': round(sum(result['cost'] for result in results), 2),
+        'by_carrier': {carrier: len(ids) for carrier, ids in assigned.items()},
+    }
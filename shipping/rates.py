@@ -0,0 +1,162 @@
+"""
+Shipping rate engine.
+
+Rate tables and zone mappings are loaded once per process into NumPy arrays:
+
+* a zone matrix (warehouse x postal prefix) giving the zone of every lane,
+* the union of all weight breaks, and
+* a price cube (service x zone x weight break) holding, for each break, the
+  price of the service's smallest own break that covers it (inf if none).
+
+A batch of parcels is then rated against every service with a handful of
+vectorized lookups. Edits to rate tables or zones bump a version key in the
+cache; each process reloads its arrays when it sees a new version.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import RateBreak, RateTable, ZoneMapping
+
+VERSION_KEY = 'shipping:rates:version'
+DEFAULT_POSTAL_PREFIX_LENGTH = 3
+
+
+def postal_prefix(postal_code):
+    length = getattr(settings, 'SHIPPING_POSTAL_PREFIX_LENGTH', DEFAULT_POSTAL_PREFIX_LENGTH)
+    return postal_code.replace(' ', '').upper()[:length]
+
+
+class RateEngine:
+    def __init__(self, version, services, warehouses, prefixes, zone_matrix, weight_breaks, prices):
+        self.version = version
+        # [(carrier, service, currency, transit_days, dim_divisor)] in price cube order
+        self.services = services
+        self.carriers = np.array([service[0] for service in services], dtype=object)
+        self.transit_days = np.array([service[3] for service in services], dtype=float)
+        self.dim_divisors = np.array([service[4] for service in services], dtype=float)
+        self.warehouse_index = {warehouse_id: row for row, warehouse_id in enumerate(warehouses)}
+        self.prefix_index = {prefix: col for col, prefix in enumerate(prefixes)}
+        self.zone_matrix = zone_matrix
+        self.weight_breaks = weight_breaks
+        self.prices = prices
+
+    @classmethod
+    def load(cls, version=None):
+        tables = list(RateTable.objects.filter(is_active=True).order_by('carrier', 'service').values_list(
+            'id', 'carrier', 'service', 'currency', 'transit_days', 'dim_divisor'
+        ))
+        breaks = list(RateBreak.objects.filter(rate_table__is_active=True).values_list(
+            'rate_table_id', 'zone', 'max_weight', 'price'
+        ))
+        mappings = list(ZoneMapping.objects.values_list('warehouse_id', 'postal_prefix', 'zone'))
+
+        warehouses = sorted({warehouse_id for warehouse_id, _, _ in mappings})
+        prefixes = sorted({postal_prefix(prefix) for _, prefix, _ in mappings})
+        zone_matrix = np.full((len(warehouses), len(prefixes)), -1, dtype=np.int16)
+        warehouse_rows = {warehouse_id: row for row, warehouse_id in enumerate(warehouses)}
+        prefix_cols = {prefix: col for col, prefix in enumerate(prefixes)}
+        for warehouse_id, prefix, zone in mappings:
+            zone_matrix[warehouse_rows[warehouse_id], prefix_cols[postal_prefix(prefix)]] = zone
+
+        table_index = {table[0]: index for index, table in enumerate(tables)}
+        zone_count = max([zone for _, zone, _, _ in breaks] + [int(zone_matrix.max(initial=-1))] + [-1]) + 1
+        weight_breaks = np.unique(np.array([float(max_weight) for _, _, max_weight, _ in breaks], dtype=float))
+        prices = np.full((len(tables), zone_count, len(weight_breaks)), np.inf)
+
+        # Own breaks per (service, zone), then priced at every break of the union
+        own = {}
+        for table_id, zone, max_weight, price in breaks:
+            own.setdefault((table_index[table_id], zone), []).append((float(max_weight), float(price)))
+        for (service, zone), service_breaks in own.items():
+            service_breaks.sort()
+            own_weights = np.array([weight for weight, _ in service_breaks])
+            own_prices = np.append([price for _, price in service_breaks], np.inf)
+            prices[service, zone] = own_prices[np.searchsorted(own_weights, weight_breaks, side='left')]
+
+        return cls(
+            version,
+            [table[1:] for table in tables],
+            warehouses,
+            prefixes,
+            zone_matrix,
+            weight_breaks,
+            prices,
+        )
+
+    def zones(self, warehouse_ids, postal_codes):
+        """Zone of each (warehouse, destination) lane, -1 where no zone is mapped"""
+        rows = np.array([self.warehouse_index.get(warehouse_id, -1) for warehouse_id in warehouse_ids], dtype=np.intp)
+        cols = np.array([self.prefix_index.get(postal_prefix(code), -1) for code in postal_codes], dtype=np.intp)
+        known = (rows >= 0) & (cols >= 0)
+        zones = np.full(len(rows), -1, dtype=np.intp)
+        if self.zone_matrix.size:
+            zones[known] = self.zone_matrix[rows[known], cols[known]]
+        return zones
+
+    def price_matrix(self, warehouse_ids, postal_codes, weights, volumes=None):
+        """Prices as a (service x parcel) array; inf where a service cannot carry a parcel"""
+        count = len(weights)
+        if not self.services or not len(self.weight_breaks) or not count:
+            return np.full((len(self.services), count), np.inf)
+
+        zones = self.zones(warehouse_ids, postal_codes)
+        weights = np.asarray(weights, dtype=float)
+        volumes = np.zeros(count) if volumes is None else np.asarray(volumes, dtype=float)
+
+        # Billable weight is the larger of actual and dimensional weight, per service divisor
+        billable = np.maximum(weights[None, :], volumes[None, :] / self.dim_divisors[:, None])
+        breaks = np.searchsorted(self.weight_breaks, billable, side='left')
+        in_range = breaks < len(self.weight_breaks)
+
+        services = np.arange(len(self.services))[:, None]
+        prices = self.prices[services, np.maximum(zones, 0)[None, :], np.minimum(breaks, len(self.weight_breaks) - 1)]
+        prices[~in_range | (zones < 0)[None, :]] = np.inf
+        return prices
+
+    def quote(self, warehouse_ids, postal_codes, weights, volumes=None, carriers=None):
+        """Available services for each parcel, cheapest first"""
+        prices = self.price_matrix(warehouse_ids, postal_codes, weights, volumes)
+        if carriers:
+            allowed = np.isin(self.carriers, list(carriers))
+            prices[~allowed] = np.inf
+
+        order = np.argsort(prices, axis=0, kind='stable')
+        quotes = []
+        for parcel in range(prices.shape[1]):
+            parcel_quotes = []
+            for service in order[:, parcel]:
+                cost = prices[service, parcel]
+                if not np.isfinite(cost):
+                    break
+                carrier, name, currency, transit_days, _ = self.services[service]
+                parcel_quotes.append({
+                    'carrier': carrier,
+                    'service': name,
+                    'cost': round(float(cost), 2),
+                    'currency': currency,
+                    'transit_days': transit_days,
+                })
+            quotes.append(parcel_quotes)
+        return quotes
+
+
+_engine = None
+
+
+def get_rate_engine():
+    """The process-wide engine, reloaded when rate tables or zones have changed"""
+    global _engine
+    version = cache.get_or_set(VERSION_KEY, 1, timeout=None)
+    if _engine is None or _engine.version != version:
+        _engine = RateEngine.load(version)
+    return _engine
+
+
+def invalidate_rate_engine():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # No version stored yet, so no process has loaded the tables
+        pass
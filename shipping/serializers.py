@@ -1,28 +1,157 @@
+from django.db.models import Sum
 from rest_framework import serializers
-from .models import Shipment
+from .fulfillment import FINAL_ORDER_STATUSES
+from .models import Shipment, ShipmentLine
+
+class ShipmentLineSerializer(serializers.ModelSerializer):
+    order = serializers.IntegerField(source='order_item.order_id', read_only=True)
+    product_sku = serializers.CharField(source='order_item.product_sku', read_only=True)
+
+    class Meta:
+        model = ShipmentLine
+        fields = ['order_item', 'order', 'product_sku', 'quantity']
 
 class ShipmentSerializer(serializers.ModelSerializer):
     order_number = serializers.CharField(source='order.order_number', read_only=True)
     customer_name = serializers.CharField(source='order.customer.get_full_name', read_only=True)
+    lines = ShipmentLineSerializer(many=True, read_only=True)
 
     class Meta:
         model = Shipment
         fields = [
             'id', 'order', 'order_number', 'customer_name', 'tracking_number',
-            'carrier', 'status', 'shipped_at', 'delivered_at'
+            'carrier', 'status', 'weight', 'postal_code', 'shipped_at', 'delivered_at', 'lines'
         ]
         read_only_fields = ['id', 'shipped_at', 'delivered_at']
 
 class ShipmentCreateSerializer(serializers.ModelSerializer):
+    """
+    Create a shipment for some or all of an order's lines. Lines may also come
+    from other orders to ship them consolidated in one box; without lines the
+    shipment takes every unit of the order that has not shipped yet.
+    """
+    lines = ShipmentLineSerializer(many=True, required=False)
+
     class Meta:
         model = Shipment
-        fields = ['order', 'tracking_number', 'carrier']
+        fields = ['order', 'tracking_number', 'carrier', 'weight', 'postal_code', 'lines']
+
+    def validate_lines(self, value):
+        order_item_ids = [line['order_item'].id for line in value]
+        if len(order_item_ids) != len(set(order_item_ids)):
+            raise serializers.ValidationError("Each order item may appear only once per shipment")
 
-    def validate_order(self, value):
-        if hasattr(value, 'shipment'):
-            raise serializers.ValidationError("Order already has a shipment")
+        shipped = dict(
+            ShipmentLine.objects.filter(order_item_id__in=order_item_ids).values('order_item_id').annotate(
+                total=Sum('quantity')
+            ).values_list('order_item_id', 'total')
+        )
+        for line in value:
+            item = line['order_item']
+            if line['quantity'] > item.quantity - shipped.get(item.id, 0):
+                raise serializers.ValidationError(f"Order item {item.id} has fewer unshipped units than requested")
         return value
 
+    def validate(self, attrs):
+        from .fulfillment import unshipped_lines
+
+        lines = attrs.get('lines')
+        if lines is None:
+            if not unshipped_lines(attrs['order']):
+                raise serializers.ValidationError({'order': "Every unit of this order has already shipped"})
+        elif not lines:
+            raise serializers.ValidationError({'lines': "A shipment needs at least one line"})
+        return attrs
+
+    def create(self, validated_data):
+        from .fulfillment import unshipped_lines
+
+        lines_data = validated_data.pop('lines', None)
+        shipment = Shipment.objects.create(**validated_data)
+        if lines_data is None:
+            lines_data = [
+                {'order_item': item, 'quantity': quantity}
+                for item, quantity in unshipped_lines(shipment.order)
+            ]
+        ShipmentLine.objects.bulk_create([ShipmentLine(shipment=shipment, **line) for line in lines_data])
+        return shipment
+
+class BulkShipmentEntrySerializer(serializers.Serializer):
+    order = serializers.IntegerField()
+    carrier = serializers.CharField(max_length=50)
+    tracking_number = serializers.CharField(max_length=100, required=False)
+    weight = serializers.DecimalField(max_digits=8, decimal_places=3, required=False)
+    postal_code = serializers.CharField(max_length=20, required=False)
+
+class BulkShipmentCreateSerializer(serializers.Serializer):
+    shipments = BulkShipmentEntrySerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_shipments(self, value):
+        from orders.models import Order
+        order_ids = [entry['order'] for entry in value]
+        if len(order_ids) != len(set(order_ids)):
+            raise serializers.ValidationError("Each order may appear only once per batch")
+        statuses = dict(Order.objects.filter(id__in=order_ids).values_list('id', 'status'))
+        missing = set(order_ids) - set(statuses)
+        if missing:
+            raise serializers.ValidationError(f"Orders not found: {sorted(missing)}")
+        closed = [order_id for order_id, order_status in statuses.items() if order_status in FINAL_ORDER_STATUSES]
+        if closed:
+            raise serializers.ValidationError(f"Orders are cancelled or refunded: {sorted(closed)}")
+        numbers = [entry['tracking_number'] for entry in value if entry.get('tracking_number')]
+        if len(numbers) != len(set(numbers)):
+            raise serializers.ValidationError("Tracking numbers must be unique")
+        taken = list(Shipment.objects.filter(tracking_number__in=numbers).values_list('tracking_number', flat=True))
+        if taken:
+            raise serializers.ValidationError(f"Tracking numbers already in use: {sorted(taken)}")
+        return value
+
+class TrackingEventInputSerializer(serializers.Serializer):
+    tracking_number = serializers.CharField(max_length=100)
+    carrier = serializers.CharField(max_length=50, required=False)
+    event_code = serializers.CharField(max_length=30)
+    status = serializers.ChoiceField(choices=Shipment._meta.get_field('status').choices, required=False)
+    description = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    location = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    occurred_at = serializers.DateTimeField()
+
+class TrackingEventIngestSerializer(serializers.Serializer):
+    events = TrackingEventInputSerializer(many=True, allow_empty=False, max_length=5000)
+
+class ParcelSerializer(serializers.Serializer):
+    warehouse = serializers.IntegerField()
+    postal_code = serializers.CharField(max_length=20)
+    weight = serializers.FloatField(min_value=0)
+    # Dimensions in cm, used for dimensional weight
+    length = serializers.FloatField(min_value=0, required=False)
+    width = serializers.FloatField(min_value=0, required=False)
+    height = serializers.FloatField(min_value=0, required=False)
+
+class RateQuoteSerializer(serializers.Serializer):
+    parcels = ParcelSerializer(many=True, allow_empty=False, max_length=10000)
+    carriers = serializers.ListField(child=serializers.CharField(max_length=50), required=False)
+
+class CarrierAssignmentSerializer(serializers.Serializer):
+    shipments = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=20000)
+    wave = serializers.IntegerField(required=False)
+    objective = serializers.ChoiceField(choices=['cheapest', 'fastest'], default='cheapest')
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if not data.get('shipments') and not data.get('wave'):
+            raise serializers.ValidationError("Pass shipments or a pick wave")
+        return data
+
+class LabelBatchSerializer(serializers.Serializer):
+    shipments = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=20000)
+    wave = serializers.IntegerField(required=False)
+    format = serializers.ChoiceField(choices=['pdf', 'zpl'], default='pdf')
+
+    def validate(self, data):
+        if not data.get('shipments') and not data.get('wave'):
+            raise serializers.ValidationError("Pass shipments or a pick wave")
+        return data
+
 class ShipmentTrackingUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=[
         ('pending', 'Pending'),
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_tracking
+from .models import RateBreak, RateTable, Shipment, ZoneMapping
+from .rates import invalidate_rate_engine
+
+
+@receiver(post_save, sender=Shipment)
+@receiver(post_delete, sender=Shipment)
+def shipment_changed(sender, instance, **kwargs):
+    invalidate_tracking([instance.tracking_number])
+
+
+@receiver(post_save, sender=RateTable)
+@receiver(post_delete, sender=RateTable)
+@receiver(post_save, sender=RateBreak)
+@receiver(post_delete, sender=RateBreak)
+@receiver(post_save, sender=ZoneMapping)
+@receiver(post_delete, sender=ZoneMapping)
+def rates_changed(sender, instance, **kwargs):
+    invalidate_rate_engine()
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from .labels import save_label_document
+from .tracking import poll_shipments
+
+
+@shared_task
+def poll_carrier_tracking(carriers=None):
+    """Fetch tracking updates for all active shipments"""
+    return poll_shipments(carriers=carriers)
+
+
+@shared_task
+def render_label_document(shipment_ids, label_format, name):
+    """Render a large label batch off the web workers and store the merged document"""
+    return save_label_document(shipment_ids, label_format, name)
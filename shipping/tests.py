@@ -1,3 +1,445 @@
-from django.test import TestCase
+import uuid
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from marketplace.models import Product, Category
+from orders.models import Order, OrderItem
+from shipping.fulfillment import create_shipments_bulk
+from shipping.models import Shipment, ShipmentLine
+from users.models import User
 
-# Create your tests here.
+class ShippingTestMixin:
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', user_type='admin'
+        )
+        category = Category.objects.create(name='Test Category')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', sku=f'SKU{i}', description='', price=5.00,
+                category=category, brand='Brand', images=[], attributes={}
+            )
+            for i in range(2)
+        ]
+        self.client.force_authenticate(self.admin)
+
+    def create_order(self, quantities=(1, 2)):
+        order = Order.objects.create(
+            customer=self.admin, status='processing', total_amount=15.00,
+            shipping_address='A', billing_address='B', payment_method='card',
+            shipping_method='standard'
+        )
+        for product, quantity in zip(self.products, quantities):
+            OrderItem.objects.create(
+                order=order, product=product, quantity=quantity, unit_price=5.00, total_price=5.00 * quantity
+            )
+        return order
+
+class SplitShipmentTest(ShippingTestMixin, APITestCase):
+    def create_shipment(self, order, tracking_number, lines=None):
+        data = {'order': order.id, 'tracking_number': tracking_number, 'carrier': 'ups'}
+        if lines is not None:
+            data['lines'] = lines
+        response = self.client.post(reverse('shipment-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return Shipment.objects.get(tracking_number=tracking_number)
+
+    def test_split_shipments_drive_order_status(self):
+        order = self.create_order()
+        first_item, second_item = order.items.order_by('id')
+
+        first = self.create_shipment(order, 'TRK1', [{'order_item': first_item.id, 'quantity': 1}])
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'processing')
+
+        second = self.create_shipment(order, 'TRK2')
+        self.assertEqual(list(second.lines.values_list('order_item', 'quantity')), [(second_item.id, 2)])
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'shipped')
+
+        for shipment in (first, second):
+            self.client.put(reverse('shipment-track', args=[shipment.pk]), {'status': 'delivered'}, format='json')
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'delivered')
+
+        # A return after delivery does not move the order backwards
+        response = self.client.put(
+            reverse('shipment-track', args=[first.pk]), {'status': 'returned'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'delivered')
+
+    def test_cannot_ship_more_than_ordered(self):
+        order = self.create_order()
+        first_item = order.items.order_by('id').first()
+        response = self.client.post(reverse('shipment-list'), {
+            'order': order.id, 'tracking_number': 'TRK1', 'carrier': 'ups',
+            'lines': [{'order_item': first_item.id, 'quantity': 5}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shipment_without_units_left_is_rejected(self):
+        order = self.create_order()
+        self.create_shipment(order, 'TRK1')
+        for payload in ({}, {'lines': []}):
+            response = self.client.post(reverse('shipment-list'), dict(
+                {'order': order.id, 'tracking_number': 'TRK2', 'carrier': 'ups'}, **payload
+            ), format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Shipment.objects.filter(tracking_number='TRK2').exists())
+
+    def test_consolidated_shipment_covers_several_orders(self):
+        orders = [self.create_order(), self.create_order()]
+        lines = [
+            {'order_item': item.id, 'quantity': item.quantity}
+            for order in orders for item in order.items.all()
+        ]
+        self.create_shipment(orders[0], 'BOX1', lines)
+        self.assertEqual(ShipmentLine.objects.count(), 4)
+        self.assertEqual(
+            set(Order.objects.values_list('status', flat=True)), {'shipped'}
+        )
+
+class BulkShipmentTest(ShippingTestMixin, APITestCase):
+    def test_bulk_create_ships_whole_batch(self):
+        orders = [self.create_order() for _ in range(3)]
+        already_shipped = self.create_order()
+        shipment = Shipment.objects.create(order=already_shipped, tracking_number='OLD1', carrier='ups')
+        ShipmentLine.objects.bulk_create([
+            ShipmentLine(shipment=shipment, order_item=item, quantity=item.quantity)
+            for item in already_shipped.items.all()
+        ])
+
+        response = self.client.post(reverse('shipment-bulk-create'), {'shipments': [
+            {'order': orders[0].id, 'carrier': 'ups', 'tracking_number': 'UPS123'},
+            {'order': orders[1].id, 'carrier': 'fedex'},
+            {'order': orders[2].id, 'carrier': 'dhl'},
+            {'order': already_shipped.id, 'carrier': 'ups'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        created = response.data['created']
+        self.assertEqual(len(created), 3)
+        self.assertEqual(created[0]['tracking_number'], 'UPS123')
+        self.assertTrue(created[1]['tracking_number'].startswith('FED'))
+        self.assertEqual(response.data['skipped_orders'], [already_shipped.id])
+
+        self.assertFalse(Shipment.objects.filter(shipped_at__isnull=True).exclude(pk=shipment.pk).exists())
+        self.assertEqual(ShipmentLine.objects.filter(shipment_id__in=[s['id'] for s in created]).count(), 6)
+        self.assertEqual(
+            set(Order.objects.filter(id__in=[o.id for o in orders]).values_list('status', flat=True)), {'shipped'}
+        )
+
+    def test_unknown_orders_are_rejected(self):
+        response = self.client.post(reverse('shipment-bulk-create'), {'shipments': [
+            {'order': 999, 'carrier': 'ups'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Shipment.objects.exists())
+
+    def test_final_orders_are_not_shipped_and_orders_never_move_back(self):
+        cancelled = self.create_order()
+        Order.objects.filter(pk=cancelled.pk).update(status='cancelled')
+        response = self.client.post(reverse('shipment-bulk-create'), {'shipments': [
+            {'order': cancelled.id, 'carrier': 'ups'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        delivered = self.create_order()
+        Order.objects.filter(pk=delivered.pk).update(status='delivered')
+        shipments, skipped = create_shipments_bulk([
+            {'order': cancelled.id, 'carrier': 'ups'}, {'order': delivered.id, 'carrier': 'ups'},
+        ])
+        self.assertEqual(([shipment.order_id for shipment in shipments], skipped), ([delivered.id], [cancelled.id]))
+        self.assertFalse(Shipment.objects.filter(order=cancelled).exists())
+        self.assertEqual(
+            dict(Order.objects.filter(id__in=[cancelled.id, delivered.id]).values_list('id', 'status')),
+            {cancelled.id: 'cancelled', delivered.id: 'delivered'}
+        )
+
+class TrackingPollerTest(ShippingTestMixin, APITestCase):
+    def test_poller_applies_carrier_updates_in_bulk(self):
+        from functools import partial
+        from shipping.carriers import FakeCarrierAdapter, FakeCarrierServer
+        from shipping.tracking import poll_shipments
+
+        orders = [self.create_order() for _ in range(5)]
+        response = self.client.post(reverse('shipment-bulk-create'), {'shipments': [
+            {'order': order.id, 'carrier': 'ups'} for order in orders
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        server = FakeCarrierServer(latency=0.01, return_rate=0)
+        factory = partial(FakeCarrierAdapter, server=server, batch_size=2, max_connections=2, rate_limit=1000)
+
+        summary = poll_shipments(adapter_factory=factory)
+        self.assertEqual((summary['polled'], summary['updated']), (5, 5))
+        self.assertEqual(server.requests, 3)
+        self.assertLessEqual(server.peak_active, 2)
+        self.assertEqual(set(Shipment.objects.values_list('status', flat=True)), {'in_transit'})
+
+        poll_shipments(adapter_factory=factory)
+        self.assertFalse(Shipment.objects.filter(delivered_at__isnull=True).exists())
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'delivered'})
+
+        self.assertEqual(
+            sorted(Shipment.objects.first().events.values_list('event_code', flat=True)), ['DELIVERED', 'IN_TRANSIT']
+        )
+
+        # Delivered shipments are no longer polled
+        self.assertEqual(poll_shipments(adapter_factory=factory)['polled'], 0)
+
+class CarrierAdapterTest(SimpleTestCase):
+    def test_malformed_records_are_skipped(self):
+        from datetime import datetime, timezone as dt_timezone
+        from shipping.carriers import HTTPCarrierAdapter
+
+        adapter = HTTPCarrierAdapter('ups')
+        updates = [adapter.parse_result(result) for result in [
+            {'tracking_number': 'TRK1', 'status': 'delivered', 'occurred_at': '2026-10-01T12:00:00'},
+            {'tracking_number': 'TRK2', 'status': 'in_transit', 'occurred_at': '2026-10-01T12:00:00+02:00'},
+            {'status': 'delivered', 'occurred_at': '2026-10-01T12:00:00'},
+            {'tracking_number': 'TRK3', 'status': 'delivered', 'occurred_at': 'yesterday'},
+            {'tracking_number': 'TRK4', 'status': 'lost', 'occurred_at': '2026-10-01T12:00:00'},
+            'TRK5',
+        ]]
+        self.assertEqual([update and update.tracking_number for update in updates],
+                         ['TRK1', 'TRK2', None, None, None, None])
+        self.assertEqual(updates[0].occurred_at, datetime(2026, 10, 1, 12, tzinfo=dt_timezone.utc))
+        self.assertEqual(updates[1].occurred_at.utcoffset().total_seconds(), 7200)
+
+    def test_http_adapter_posts_batches_over_httpx(self):
+        import asyncio
+        import json
+        import httpx
+        from shipping.carriers import CarrierError, HTTPCarrierAdapter
+
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            numbers = json.loads(request.content)['tracking_numbers']
+            if numbers == ['DOWN']:
+                return httpx.Response(503)
+            return httpx.Response(200, json={'results': [
+                {'tracking_number': number, 'status': 'in_transit', 'occurred_at': '2026-10-01T12:00:00Z'}
+                for number in numbers
+            ] + [{'tracking_number': 'BAD'}]})
+
+        async def run():
+            adapter = HTTPCarrierAdapter(
+                'ups', endpoint='https://carrier.test/track', api_key='secret', transport=httpx.MockTransport(handler)
+            )
+            await adapter.open()
+            try:
+                updates = await adapter.fetch(['TRK1', 'TRK2'])
+                with self.assertRaises(CarrierError):
+                    await adapter.fetch(['DOWN'])
+            finally:
+                await adapter.close()
+            return updates
+
+        updates = asyncio.run(run())
+        self.assertEqual([update.tracking_number for update in updates], ['TRK1', 'TRK2'])
+        self.assertEqual(requests[0].headers['Authorization'], 'Bearer secret')
+
+class TrackingEventTest(ShippingTestMixin, APITestCase):
+    def test_ingest_deduplicates_and_timeline_is_ordered(self):
+        shipment = Shipment.objects.create(
+            order=self.create_order(), tracking_number='TRK1', carrier='ups', status='in_transit'
+        )
+        events = [
+            {'tracking_number': 'TRK1', 'event_code': 'PU', 'occurred_at': '2026-01-01T08:00:00Z', 'location': 'Leeds'},
+            {'tracking_number': 'TRK1', 'event_code': 'AR', 'occurred_at': '2026-01-02T09:00:00Z', 'location': 'York'},
+            {'tracking_number': 'NOPE', 'event_code': 'PU', 'occurred_at': '2026-01-01T08:00:00Z'},
+        ]
+        url = reverse('tracking-event-ingest')
+        response = self.client.post(url, {'events': events}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data, {'accepted': 2, 'unknown': 1})
+
+        # Replayed webhooks do not duplicate scans
+        self.client.post(url, {'events': list(reversed(events))}, format='json')
+        self.assertEqual(shipment.events.count(), 2)
+
+        response = self.client.get(reverse('shipment-timeline', args=[shipment.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event[1] for event in response.data['events']], ['PU', 'AR'])
+        self.assertEqual(response.data['events'][1][3], 'York')
+
+class PublicTrackingTest(ShippingTestMixin, APITestCase):
+    def test_lookup_is_public_and_revalidates_by_etag(self):
+        shipment = Shipment.objects.create(
+            order=self.create_order(), tracking_number='TRK1', carrier='ups', status='in_transit'
+        )
+        self.client.force_authenticate(None)
+        url = reverse('shipment-public-track', args=['TRK1'])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'in_transit')
+        self.assertNotIn('order', response.data)
+        self.assertIn('public', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A status change produces a new representation
+        shipment.status = 'delivered'
+        shipment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'delivered')
+        self.assertNotEqual(response['ETag'], etag)
+
+        self.assertEqual(self.client.get(reverse('shipment-public-track', args=['NOPE'])).status_code, 404)
+
+class RateTablesMixin(ShippingTestMixin):
+    def setUp(self):
+        super().setUp()
+        from warehouse.models import Warehouse
+        from shipping.models import RateTable, RateBreak, ZoneMapping
+        self.warehouse = Warehouse.objects.create(name='Main', address='Address', capacity=1000)
+        ZoneMapping.objects.create(warehouse=self.warehouse, postal_prefix='100', zone=1)
+        ZoneMapping.objects.create(warehouse=self.warehouse, postal_prefix='900', zone=2)
+        ground = RateTable.objects.create(carrier='ups', service='ground', transit_days=5)
+        express = RateTable.objects.create(carrier='fedex', service='express', transit_days=1)
+        for zone, prices in [(1, (5, 8)), (2, (7, 11))]:
+            RateBreak.objects.create(rate_table=ground, zone=zone, max_weight=1, price=prices[0])
+            RateBreak.objects.create(rate_table=ground, zone=zone, max_weight=5, price=prices[1])
+            RateBreak.objects.create(rate_table=express, zone=zone, max_weight=2, price=prices[1] + 10)
+
+class RateEngineTest(RateTablesMixin, APITestCase):
+    def test_batch_quote_rates_every_parcel(self):
+        parcels = [
+            {'warehouse': self.warehouse.id, 'postal_code': '10001', 'weight': 0.5},
+            {'warehouse': self.warehouse.id, 'postal_code': '900 10', 'weight': 1.5},
+            # Dimensional weight (40 x 30 x 30 / 5000 = 7.2kg) is beyond every break
+            {'warehouse': self.warehouse.id, 'postal_code': '10001', 'weight': 1,
+             'length': 40, 'width': 30, 'height': 30},
+            {'warehouse': self.warehouse.id, 'postal_code': '55555', 'weight': 1},
+        ]
+        response = self.client.post(reverse('shipping-rates'), {'parcels': parcels}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quotes = response.data['quotes']
+        self.assertEqual(
+            [(quote['carrier'], quote['cost']) for quote in quotes[0]], [('ups', 5.0), ('fedex', 18.0)]
+        )
+        self.assertEqual(
+            [(quote['carrier'], quote['cost']) for quote in quotes[1]], [('ups', 11.0), ('fedex', 21.0)]
+        )
+        self.assertEqual(quotes[2], [])
+        self.assertEqual(quotes[3], [])
+
+        response = self.client.post(
+            reverse('shipping-rates'), {'parcels': parcels[:1], 'carriers': ['fedex']}, format='json'
+        )
+        self.assertEqual([quote['service'] for quote in response.data['quotes'][0]], ['express'])
+
+class CarrierOptimizationTest(RateTablesMixin, APITestCase):
+    def test_applied_assignment_refreshes_public_tracking(self):
+        from django.core.cache import cache
+        from shipping.optimizer import optimize_carriers
+        cache.clear()
+        order = self.create_order()
+        Order.objects.filter(pk=order.pk).update(warehouse=self.warehouse)
+        shipment = Shipment.objects.create(
+            order=order, tracking_number='OPT1', carrier='fedex', status='pending', postal_code='10001', weight=0.5
+        )
+        url = reverse('shipment-public-track', args=['OPT1'])
+        self.assertEqual(self.client.get(url).data['carrier'], 'fedex')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = optimize_carriers([shipment.id])
+        self.assertEqual(result['by_carrier'], {'ups': 1})
+        self.assertEqual(self.client.get(url).data['carrier'], 'ups')
+
+class CarrierAssignmentTest(SimpleTestCase):
+    def test_greedy_respects_capacity_and_regret(self):
+        import numpy as np
+        from shipping.optimizer import assign_greedy
+        scores = np.array([
+            [1.0, 1.0, 1.0],
+            [2.0, 9.0, np.inf],
+        ])
+        # Parcel 2 has no alternative and parcel 1 the largest regret, so parcel 0 moves
+        self.assertEqual(list(assign_greedy(scores, [2, np.inf])), [1, 0, 0])
+        self.assertEqual(list(assign_greedy(scores, [0, 1])), [-1, 1, -1])
+
+class CarrierOptimizerTest(RateTablesMixin, APITestCase):
+    def create_shipments(self, count):
+        orders = [self.create_order() for _ in range(count)]
+        Order.objects.filter(id__in=[order.id for order in orders]).update(warehouse=self.warehouse)
+        response = self.client.post(reverse('shipment-bulk-create'), {'shipments': [
+            {'order': order.id, 'carrier': 'unassigned', 'weight': '0.5', 'postal_code': '10001'}
+            for order in orders
+        ]}, format='json')
+        return [shipment['id'] for shipment in response.data['created']]
+
+    def test_cheapest_assignment_within_capacity(self):
+        from shipping.models import CarrierCapacity
+        ids = self.create_shipments(3)
+        CarrierCapacity.objects.create(carrier='ups', daily_limit=2)
+
+        response = self.client.post(reverse('shipment-assign-carriers'), {'shipments': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['by_carrier'], {'ups': 2, 'fedex': 1})
+        self.assertEqual(response.data['total_cost'], 28.0)
+        self.assertEqual(
+            sorted(Shipment.objects.filter(id__in=ids).values_list('carrier', flat=True)), ['fedex', 'ups', 'ups']
+        )
+
+    def test_fastest_prefers_short_transit(self):
+        ids = self.create_shipments(2)
+        response = self.client.post(reverse('shipment-assign-carriers'), {
+            'shipments': ids, 'objective': 'fastest', 'dry_run': True
+        }, format='json')
+        self.assertEqual(response.data['by_carrier'], {'fedex': 2})
+        self.assertEqual(set(Shipment.objects.values_list('carrier', flat=True)), {'unassigned'})
+
+class LabelRenderingTest(ShippingTestMixin, APITestCase):
+    def create_shipments(self, count):
+        orders = [self.create_order() for _ in range(count)]
+        response = self.client.post(reverse('shipment-bulk-create'), {'shipments': [
+            {'order': order.id, 'carrier': 'ups', 'weight': '1.2', 'postal_code': '10001'} for order in orders
+        ]}, format='json')
+        return [shipment['id'] for shipment in response.data['created']]
+
+    def test_small_batch_streams_merged_pdf(self):
+        ids = self.create_shipments(3)
+        response = self.client.post(reverse('shipping-labels'), {'shipments': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        document = b''.join(response.streaming_content)
+        self.assertTrue(document.startswith(b'%PDF-1.4'))
+        self.assertIn(b'/Count 3', document)
+        self.assertTrue(document.rstrip().endswith(b'%%EOF'))
+        tracking_number = Shipment.objects.get(id=ids[0]).tracking_number.encode()
+        self.assertIn(b'(' + tracking_number + b') Tj', document)
+
+    def test_labels_are_restricted_to_warehouse_staff(self):
+        ids = self.create_shipments(1)
+        customer = User.objects.create_user(username='customer', email='c@example.com', password='testpass123')
+        self.client.force_authenticate(customer)
+        response = self.client.post(reverse('shipping-labels'), {'shipments': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse('shipping-label-document', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_zpl_labels_and_pool_rendering_keep_order(self):
+        from shipping.label_templates import render_zpl_label
+        from shipping.labels import render_labels
+
+        label = {'tracking_number': 'TRK^1', 'carrier': 'UPS', 'recipient_address': 'Line 1\nLine 2'}
+        zpl = render_zpl_label(label).decode()
+        self.assertTrue(zpl.startswith('^XA') and zpl.rstrip().endswith('^XZ'))
+        self.assertIn('^FDTRK 1^FS', zpl)
+        self.assertIn('Line 1\\&Line 2', zpl)
+
+        labels = [dict(label, tracking_number=f'TRK{i}') for i in range(250)]
+        rendered = render_labels('zpl', labels * 5, workers=2)[:250]
+        self.assertEqual(len(rendered), 250)
+        self.assertIn(b'^FDTRK249^FS', rendered[-1])
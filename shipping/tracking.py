@@ -0,0 +1,183 @@
+"""
+Carrier tracking poller.
+
+Active shipments are grouped by carrier and looked up concurrently with
+asyncio: each carrier gets its own connection limit and request rate (from its
+adapter), and all carriers are polled at the same time. Status changes are
+written back with one UPDATE per status and chunk, recorded as TrackingEvents,
+and the affected orders are re-derived with sync_order_statuses.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidate_tracking
+from .carriers import CarrierError, get_carrier_adapter
+from .events import record_status_events
+from .fulfillment import sync_order_statuses
+from .models import Shipment, ShipmentLine
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_SHIPMENT_STATUSES = ['pending', 'in_transit']
+# Shipment statuses a tracking update may move to from each active status
+ALLOWED_TRANSITIONS = {
+    'pending': {'in_transit', 'delivered', 'returned'},
+    'in_transit': {'delivered', 'returned'},
+}
+UPDATE_CHUNK_SIZE = 500
+
+
+class RateLimiter:
+    """Spaces out calls so no more than rate happen per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = asyncio.get_running_loop().time()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+
+async def poll_carrier(adapter, tracking_numbers):
+    """Look up tracking numbers in batches within the adapter's connection and rate limits"""
+    semaphore = asyncio.Semaphore(adapter.max_connections)
+    limiter = RateLimiter(adapter.rate_limit)
+    failed = 0
+
+    async def fetch_batch(batch):
+        nonlocal failed
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                return await adapter.fetch(batch)
+            except CarrierError as exc:
+                failed += 1
+                logger.warning('Tracking batch of %s for %s failed: %s', len(batch), adapter.carrier, exc)
+                return []
+
+    await adapter.open()
+    try:
+        results = await asyncio.gather(*[
+            fetch_batch(tracking_numbers[start:start + adapter.batch_size])
+            for start in range(0, len(tracking_numbers), adapter.batch_size)
+        ])
+    finally:
+        await adapter.close()
+    return [update for batch in results for update in batch], failed
+
+
+async def _poll_carriers(adapters, tracking_numbers):
+    results = await asyncio.gather(*[
+        poll_carrier(adapters[carrier], numbers) for carrier, numbers in tracking_numbers.items()
+    ])
+    return dict(zip(tracking_numbers, results))
+
+
+def load_active_shipments(carriers=None):
+    """Active shipments as {carrier: {tracking_number: (id, status)}}"""
+    queryset = Shipment.objects.filter(status__in=ACTIVE_SHIPMENT_STATUSES, shipped_at__isnull=False)
+    if carriers:
+        queryset = queryset.filter(carrier__in=carriers)
+    shipments = defaultdict(dict)
+    for shipment_id, carrier, tracking_number, status in queryset.values_list(
+        'id', 'carrier', 'tracking_number', 'status'
+    ).iterator(chunk_size=5000):
+        shipments[carrier][tracking_number] = (shipment_id, status)
+    return shipments
+
+
+def apply_tracking_updates(changes):
+    """
+    Write status changes ({shipment_id: TrackingUpdate}) back in bulk.
+
+    Returns the number of shipments updated.
+    """
+    by_status = defaultdict(list)
+    for shipment_id, update in changes.items():
+        by_status[update.status].append(shipment_id)
+
+    now = timezone.now()
+    shipment_ids = list(changes)
+    with transaction.atomic():
+        for status, ids in by_status.items():
+            for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+                chunk = ids[start:start + UPDATE_CHUNK_SIZE]
+                fields = {'status': status}
+                if status == 'in_transit':
+                    fields['shipped_at'] = Coalesce(F('shipped_at'), Value(now))
+                elif status == 'delivered':
+                    fields['delivered_at'] = Case(
+                        *[When(id=shipment_id, then=Value(changes[shipment_id].occurred_at))
+                          for shipment_id in chunk],
+                        output_field=DateTimeField()
+                    )
+                Shipment.objects.filter(id__in=chunk).update(**fields)
+        record_status_events(changes)
+        transaction.on_commit(lambda: invalidate_tracking([update.tracking_number for update in changes.values()]))
+
+        for start in range(0, len(shipment_ids), UPDATE_CHUNK_SIZE):
+            chunk = shipment_ids[start:start + UPDATE_CHUNK_SIZE]
+            order_ids = set(Shipment.objects.filter(id__in=chunk).values_list('order_id', flat=True))
+            order_ids.update(
+                ShipmentLine.objects.filter(shipment_id__in=chunk).values_list('order_item__order_id', flat=True)
+            )
+            sync_order_statuses(order_ids)
+
+    if by_status.get('returned'):
+        # Open RMAs so the returned goods are inspected and restocked
+        from returns.restock import create_rma_for_shipment
+        for shipment in Shipment.objects.filter(id__in=by_status['returned']).select_related('order'):
+            create_rma_for_shipment(shipment)
+
+    return len(changes)
+
+
+def poll_shipments(carriers=None, adapter_factory=get_carrier_adapter):
+    """
+    Poll every active shipment's carrier and apply the status changes.
+
+    adapter_factory maps a carrier code to a CarrierAdapter (or None to skip
+    the carrier). Returns a summary of the run.
+    """
+    shipments = load_active_shipments(carriers)
+    adapters = {}
+    for carrier in shipments:
+        adapter = adapter_factory(carrier)
+        if adapter is None:
+            logger.info('No tracking adapter configured for carrier %s', carrier)
+            continue
+        adapters[carrier] = adapter
+
+    tracking_numbers = {carrier: list(shipments[carrier]) for carrier in adapters}
+    results = asyncio.run(_poll_carriers(adapters, tracking_numbers)) if tracking_numbers else {}
+
+    changes = {}
+    failed_batches = 0
+    for carrier, (updates, failed) in results.items():
+        failed_batches += failed
+        for update in updates:
+            known = shipments[carrier].get(update.tracking_number)
+            if known is None:
+                continue
+            shipment_id, status = known
+            if update.status in ALLOWED_TRANSITIONS.get(status, ()):
+                changes[shipment_id] = update
+
+    return {
+        'polled': sum(len(numbers) for numbers in tracking_numbers.values()),
+        'updated': apply_tracking_updates(changes) if changes else 0,
+        'failed_batches': failed_batches,
+    }
@@ -5,4 +5,12 @@ urlpatterns = [
     path('', views.ShipmentListCreateView.as_view(), name='shipment-list'),
     path('<int:pk>/', views.ShipmentDetailView.as_view(), name='shipment-detail'),
     path('<int:pk>/track/', views.update_shipment_tracking, name='shipment-track'),
+    path('<int:pk>/timeline/', views.shipment_events, name='shipment-timeline'),
+    path('events/', views.ingest_events, name='tracking-event-ingest'),
+    path('track/<str:tracking_number>/', views.track_shipment, name='shipment-public-track'),
+    path('rates/', views.quote_rates, name='shipping-rates'),
+    path('assign-carriers/', views.assign_carriers, name='shipment-assign-carriers'),
+    path('labels/', views.generate_labels, name='shipping-labels'),
+    path('labels/<uuid:document>/', views.label_document_download, name='shipping-label-document'),
+    path('shipments/bulk/', views.bulk_create_shipments, name='shipment-bulk-create'),
 ]
\ No newline at end of file
@@ -1,11 +1,52 @@
+import uuid
+
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.throttling import SimpleRateThrottle
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.utils import timezone
-from .models import Shipment
-from .serializers import ShipmentSerializer, ShipmentCreateSerializer, ShipmentTrackingUpdateSerializer
+from users.permissions import IsWarehouseStaffOrAdmin
+from .models import Shipment, ShipmentLine
+from .cache import get_tracking, invalidate_tracking, tracking_max_age
+from .events import ingest_tracking_events, shipment_timeline
+from .fulfillment import sync_order_statuses, create_shipments_bulk
+from .labels import CONTENT_TYPES, LABEL_FORMATS, get_label_storage, label_document
+from .optimizer import optimize_carriers
+from .rates import get_rate_engine
+from .serializers import (
+    ShipmentSerializer, ShipmentCreateSerializer, ShipmentTrackingUpdateSerializer,
+    BulkShipmentCreateSerializer, TrackingEventIngestSerializer, RateQuoteSerializer,
+    CarrierAssignmentSerializer, LabelBatchSerializer
+)
+
+class TrackingLookupThrottle(SimpleRateThrottle):
+    """Per-client limit on public tracking lookups"""
+    scope = 'tracking_lookup'
+
+    def get_rate(self):
+        return getattr(settings, 'SHIPPING_TRACKING_LOOKUP_RATE', '60/min')
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+def batch_shipments(data):
+    """Shipments selected by an explicit id list or by pick wave"""
+    if data.get('wave'):
+        return Shipment.objects.filter(order__pick_wave_entry__wave_id=data['wave'])
+    return Shipment.objects.filter(id__in=data['shipments'])
+
+def shipment_order_ids(shipment):
+    """Ids of every order with lines in the shipment, including its primary order"""
+    order_ids = set(ShipmentLine.objects.filter(shipment=shipment).values_list('order_item__order_id', flat=True))
+    order_ids.add(shipment.order_id)
+    return order_ids
 
 class ShipmentListCreateView(generics.ListCreateAPIView):
     serializer_class = ShipmentSerializer
@@ -17,7 +58,7 @@ class ShipmentListCreateView(generics.ListCreateAPIView):
     ordering = ['-shipped_at']
 
     def get_queryset(self):
-        return Shipment.objects.select_related('order__customer')
+        return Shipment.objects.select_related('order__customer').prefetch_related('lines__order_item')
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -25,16 +66,12 @@ class ShipmentListCreateView(generics.ListCreateAPIView):
         return ShipmentSerializer
 
     def perform_create(self, serializer):
-        shipment = serializer.save()
-        # Update order status to shipped
-        order = shipment.order
-        order.status = 'shipped'
-        order.save()
-        shipment.shipped_at = timezone.now()
-        shipment.save()
+        shipment = serializer.save(shipped_at=timezone.now())
+        # Orders are shipped once all their units are in shipments
+        sync_order_statuses(shipment_order_ids(shipment))
 
 class ShipmentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Shipment.objects.select_related('order__customer')
+    queryset = Shipment.objects.select_related('order__customer').prefetch_related('lines__order_item')
     serializer_class = ShipmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -53,8 +90,13 @@ def update_shipment_tracking(request, pk):
     new_status = serializer.validated_data['status']
 
     # Update shipment details
-    if 'tracking_number' in serializer.validated_data:
-        shipment.tracking_number = serializer.validated_data['tracking_number']
+    tracking_number = serializer.validated_data.get('tracking_number')
+    if tracking_number and tracking_number != shipment.tracking_number:
+        if Shipment.objects.filter(tracking_number=tracking_number).exists():
+            return Response({'tracking_number': ['A shipment with this tracking number already exists']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        invalidate_tracking([shipment.tracking_number])
+        shipment.tracking_number = tracking_number
     if 'carrier' in serializer.validated_data:
         shipment.carrier = serializer.validated_data['carrier']
 
@@ -63,11 +105,157 @@ def update_shipment_tracking(request, pk):
         shipment.shipped_at = timezone.now()
     elif new_status == 'delivered' and shipment.status != 'delivered':
         shipment.delivered_at = timezone.now()
-        # Update order status
-        shipment.order.status = 'delivered'
-        shipment.order.save()
 
+    became_returned = new_status == 'returned' and shipment.status != 'returned'
     shipment.status = new_status
     shipment.save()
+    sync_order_statuses(shipment_order_ids(shipment))
+
+    if became_returned:
+        # Open an RMA per order so the returned goods are inspected and restocked
+        from returns.restock import create_rma_for_shipment
+        create_rma_for_shipment(shipment)
 
     return Response(ShipmentSerializer(shipment).data)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_create_shipments(request):
+    serializer = BulkShipmentCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        shipments, skipped = create_shipments_bulk(serializer.validated_data['shipments'])
+
+    return Response({
+        'created': [
+            {
+                'id': shipment.id,
+                'order': shipment.order_id,
+                'carrier': shipment.carrier,
+                'tracking_number': shipment.tracking_number,
+            }
+            for shipment in shipments
+        ],
+        'skipped_orders': skipped,
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def ingest_events(request):
+    serializer = TrackingEventIngestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    accepted, unknown = ingest_tracking_events(serializer.validated_data['events'])
+    return Response({'accepted': accepted, 'unknown': unknown}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def shipment_events(request, pk):
+    shipment = Shipment.objects.filter(pk=pk).values('tracking_number', 'carrier', 'status').first()
+    if shipment is None:
+        return Response({'error': 'Shipment not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    # Events are returned as [occurred_at, event_code, status, location, description] rows
+    shipment['events'] = shipment_timeline(pk)
+    return Response(shipment)
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+@throttle_classes([TrackingLookupThrottle])
+def track_shipment(request, tracking_number):
+    tracking = get_tracking(tracking_number)
+    if tracking is None:
+        return Response({'error': 'Tracking number not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    payload, etag = tracking
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(payload)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=tracking_max_age())
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def quote_rates(request):
+    serializer = RateQuoteSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    parcels = serializer.validated_data['parcels']
+    quotes = get_rate_engine().quote(
+        [parcel['warehouse'] for parcel in parcels],
+        [parcel['postal_code'] for parcel in parcels],
+        [parcel['weight'] for parcel in parcels],
+        volumes=[
+            parcel.get('length', 0) * parcel.get('width', 0) * parcel.get('height', 0)
+            for parcel in parcels
+        ],
+        carriers=serializer.validated_data.get('carriers')
+    )
+    return Response({'quotes': quotes})
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def assign_carriers(request):
+    serializer = CarrierAssignmentSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    with transaction.atomic():
+        result = optimize_carriers(batch_shipments(data), objective=data['objective'], apply=not data['dry_run'])
+    return Response(result)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsWarehouseStaffOrAdmin])
+def generate_labels(request):
+    serializer = LabelBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    label_format = serializer.validated_data['format']
+    shipment_ids = list(batch_shipments(serializer.validated_data).values_list('id', flat=True))
+    if not shipment_ids:
+        return Response({'error': 'No shipments found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if len(shipment_ids) <= getattr(settings, 'SHIPPING_LABEL_SYNC_LIMIT', 100):
+        response = StreamingHttpResponse(
+            label_document(Shipment.objects.filter(id__in=shipment_ids), label_format),
+            content_type=CONTENT_TYPES[label_format]
+        )
+        response['Content-Disposition'] = f'inline; filename="labels.{label_format}"'
+        return response
+
+    # Large batches are rendered by a Celery worker and fetched from storage
+    from .tasks import render_label_document
+    document = uuid.uuid4()
+    render_label_document.delay(shipment_ids, label_format, f'{document.hex}.{label_format}')
+    return Response({
+        'document': document.hex,
+        'labels': len(shipment_ids),
+        'url': reverse('shipping-label-document', args=[document]),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsWarehouseStaffOrAdmin])
+def label_document_download(request, document):
+    storage = get_label_storage()
+    for label_format in LABEL_FORMATS:
+        name = f'{document.hex}.{label_format}'
+        if storage.exists(name):
+            return FileResponse(storage.open(name), content_type=CONTENT_TYPES[label_format], filename=name)
+    return Response({'error': 'Label document not found or still rendering'}, status=status.HTTP_404_NOT_FOUND)
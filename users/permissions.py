@@ -9,6 +9,13 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             return True
         return request.user and request.user.user_type == 'admin'
 
+class IsAdmin(permissions.BasePermission):
+    """
+    Custom permission to only allow admins, including for reads.
+    """
+    def has_permission(self, request, view):
+        return request.user and request.user.user_type == 'admin'
+
 class IsOwnerOrAdmin(permissions.BasePermission):
     """
     Custom permission to only allow owners of an object or admins to edit it.
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_initial'),
+        ('orders', '0006_order_warehouse'),
+        ('warehouse', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PickWave',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shipping_method', models.CharField(max_length=50)),
+                ('cutoff', models.TimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('picking', 'Picking'), ('completed', 'Completed')], default='open', max_length=20)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('sku_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pick_waves', to='warehouse.warehouse')),
+            ],
+            options={
+                'ordering': ['cutoff', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PickWaveOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pick_wave_entry', to='orders.order')),
+                ('wave', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wave_orders', to='warehouse.pickwave')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PickListLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('order_count', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='marketplace.product')),
+                ('wave', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pick_lines', to='warehouse.pickwave')),
+            ],
+            options={
+                'unique_together': {('wave', 'product')},
+            },
+        ),
+    ]
@@ -22,3 +22,37 @@ class Warehouse(models.Model):
             total=models.Sum('quantity')
         )['total'] or 0
         return total
+
+class PickWave(models.Model):
+    """A batch of orders picked together in one warehouse walk (see warehouse.waves)"""
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='pick_waves')
+    shipping_method = models.CharField(max_length=50)
+    cutoff = models.TimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, default='open', choices=[
+        ('open', 'Open'),
+        ('picking', 'Picking'),
+        ('completed', 'Completed')
+    ])
+    order_count = models.PositiveIntegerField(default=0)
+    sku_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Wave {self.id} - {self.warehouse.name}"
+
+    class Meta:
+        ordering = ['cutoff', 'id']
+
+class PickWaveOrder(models.Model):
+    wave = models.ForeignKey(PickWave, on_delete=models.CASCADE, related_name='wave_orders')
+    order = models.OneToOneField('orders.Order', on_delete=models.CASCADE, related_name='pick_wave_entry')
+
+class PickListLine(models.Model):
+    """Quantity of one product to pick for a wave, summed over its orders"""
+    wave = models.ForeignKey(PickWave, on_delete=models.CASCADE, related_name='pick_lines')
+    product = models.ForeignKey('marketplace.Product', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    order_count = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('wave', 'product')
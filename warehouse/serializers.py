@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Warehouse
+from .models import Warehouse, PickWave, PickListLine
 
 class WarehouseSerializer(serializers.ModelSerializer):
     manager_name = serializers.CharField(source='manager.get_full_name', read_only=True)
@@ -13,4 +13,31 @@ class WarehouseSerializer(serializers.ModelSerializer):
             'capacity', 'is_active', 'current_inventory_count',
             'total_inventory_quantity'
         ]
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+class PickListLineSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    product_sku = serializers.CharField(source='product.sku', read_only=True)
+
+    class Meta:
+        model = PickListLine
+        fields = ['product', 'product_name', 'product_sku', 'quantity', 'order_count']
+
+class PickWaveSerializer(serializers.ModelSerializer):
+    pick_lines = PickListLineSerializer(many=True, read_only=True)
+    order_ids = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PickWave
+        fields = [
+            'id', 'warehouse', 'shipping_method', 'cutoff', 'status',
+            'order_count', 'sku_count', 'order_ids', 'pick_lines', 'created_at'
+        ]
+        read_only_fields = fields
+
+    def get_order_ids(self, obj):
+        return [entry.order_id for entry in obj.wave_orders.all()]
+
+class WavePlanSerializer(serializers.Serializer):
+    max_orders = serializers.IntegerField(min_value=1, max_value=1000, default=200)
+    max_skus = serializers.IntegerField(min_value=1, max_value=1000, default=150)
@@ -1,3 +1,87 @@
-from django.test import TestCase
+import importlib
+from collections import Counter
+from django.apps import apps
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from inventory.models import Inventory
+from orders.models import Order, OrderItem
+from marketplace.models import Product, Category
+from users.models import User
+from warehouse.models import Warehouse, PickWave, PickListLine
+from warehouse.waves import group_into_waves
 
-# Create your tests here.
+class WaveGroupingTest(SimpleTestCase):
+    def test_orders_sharing_skus_are_grouped(self):
+        orders = {
+            1: Counter({10: 1}),
+            2: Counter({20: 1}),
+            3: Counter({10: 2}),
+            4: Counter({20: 1, 30: 1}),
+        }
+        waves = group_into_waves(orders, max_orders=2)
+        self.assertEqual(sorted(sorted(wave) for wave in waves), [[1, 3], [2, 4]])
+
+    def test_sku_limit_starts_new_wave(self):
+        orders = {1: Counter({10: 1, 11: 1}), 2: Counter({12: 1, 13: 1})}
+        waves = group_into_waves(orders, max_orders=10, max_skus=3)
+        self.assertEqual(len(waves), 2)
+
+class WavePlanningAPITest(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username='picker',
+            email='picker@example.com',
+            password='testpass123',
+            user_type='warehouse_staff'
+        )
+        self.warehouse = Warehouse.objects.create(name='Main', address='Address', capacity=1000)
+        category = Category.objects.create(name='Test Category')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', sku=f'SKU{i}', description='', price=5.00,
+                category=category, brand='Brand', images=[], attributes={}
+            )
+            for i in range(2)
+        ]
+        for shipping_method in ['express', 'standard', 'standard']:
+            order = Order.objects.create(
+                customer=self.staff, status='confirmed', total_amount=10.00,
+                shipping_address='A', billing_address='B', payment_method='card',
+                shipping_method=shipping_method, warehouse=self.warehouse
+            )
+            for product in self.products:
+                OrderItem.objects.create(
+                    order=order, product=product, quantity=2, unit_price=5.00, total_price=10.00
+                )
+
+    def test_plan_creates_waves_with_consolidated_pick_lists(self):
+        self.client.force_authenticate(self.staff)
+        url = reverse('warehouse-wave-plan', args=[self.warehouse.pk])
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([wave['shipping_method'] for wave in response.data], ['express', 'standard'])
+
+        standard = PickWave.objects.get(shipping_method='standard')
+        self.assertEqual(standard.order_count, 2)
+        line = PickListLine.objects.get(wave=standard, product=self.products[0])
+        self.assertEqual((line.quantity, line.order_count), (4, 2))
+        self.assertFalse(Order.objects.filter(status='confirmed').exists())
+
+        # Planned orders are not planned again
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.data, [])
+
+    def test_existing_orders_are_backfilled_with_a_warehouse(self):
+        migration = importlib.import_module('orders.migrations.0011_backfill_order_warehouse')
+        order = Order.objects.create(
+            customer=self.staff, status='confirmed', total_amount=10.00,
+            shipping_address='A', billing_address='B', payment_method='card', shipping_method='standard'
+        )
+        OrderItem.objects.create(order=order, product=self.products[1], quantity=1, unit_price=5.00, total_price=5.00)
+        Inventory.objects.create(product=self.products[1], warehouse=self.warehouse, quantity=10)
+
+        migration.backfill_warehouse(apps, None)
+        order.refresh_from_db()
+        self.assertEqual(order.warehouse_id, self.warehouse.id)
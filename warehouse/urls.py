@@ -5,4 +5,7 @@ urlpatterns = [
     path('', views.WarehouseListCreateView.as_view(), name='warehouse-list'),
     path('<int:pk>/', views.WarehouseDetailView.as_view(), name='warehouse-detail'),
     path('<int:pk>/inventory/', views.warehouse_inventory, name='warehouse-inventory'),
+    path('<int:pk>/waves/plan/', views.plan_pick_waves, name='warehouse-wave-plan'),
+    path('waves/', views.PickWaveListView.as_view(), name='pick-wave-list'),
+    path('waves/<int:pk>/', views.PickWaveDetailView.as_view(), name='pick-wave-detail'),
 ]
\ No newline at end of file
@@ -3,8 +3,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Warehouse
-from .serializers import WarehouseSerializer
+from .models import Warehouse, PickWave
+from .serializers import WarehouseSerializer, PickWaveSerializer, WavePlanSerializer
+from .waves import plan_waves
 from inventory.models import Inventory
 from inventory.serializers import InventorySerializer
 from users.permissions import IsWarehouseStaffOrAdmin
@@ -35,3 +36,38 @@ def warehouse_inventory(request, pk):
     inventory_items = Inventory.objects.filter(warehouse=warehouse).select_related('product')
     serializer = InventorySerializer(inventory_items, many=True)
     return Response(serializer.data)
+
+
+class PickWaveListView(generics.ListAPIView):
+    serializer_class = PickWaveSerializer
+    permission_classes = [permissions.IsAuthenticated, IsWarehouseStaffOrAdmin]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['warehouse', 'status', 'shipping_method']
+    ordering_fields = ['cutoff', 'created_at']
+    ordering = ['cutoff', 'id']
+
+    def get_queryset(self):
+        return PickWave.objects.prefetch_related('wave_orders', 'pick_lines__product')
+
+class PickWaveDetailView(generics.RetrieveAPIView):
+    queryset = PickWave.objects.prefetch_related('wave_orders', 'pick_lines__product')
+    serializer_class = PickWaveSerializer
+    permission_classes = [permissions.IsAuthenticated, IsWarehouseStaffOrAdmin]
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsWarehouseStaffOrAdmin])
+def plan_pick_waves(request, pk):
+    try:
+        warehouse = Warehouse.objects.get(pk=pk)
+    except Warehouse.DoesNotExist:
+        return Response({'error': 'Warehouse not found'}, status=404)
+
+    serializer = WavePlanSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+
+    waves = plan_waves(warehouse, **serializer.validated_data)
+    waves = PickWave.objects.filter(
+        id__in=[wave.id for wave in waves]
+    ).prefetch_related('wave_orders', 'pick_lines__product')
+    return Response(PickWaveSerializer(waves, many=True).data, status=201)
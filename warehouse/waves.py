@@ -0,0 +1,133 @@
+"""
+Wave planning for fulfillment.
+
+Confirmed orders of one warehouse are selected over the (warehouse, status,
+created_at) order index and locked, skipping orders another planner holds,
+so concurrent planners take disjoint sets. Their lines are loaded in one
+query, grouped by carrier cutoff, and packed into waves so that orders
+sharing SKUs are picked together. Each wave gets a consolidated pick list
+with one line per SKU, and its orders move to 'processing' in the same
+transaction so they are not planned twice.
+"""
+
+from collections import Counter, defaultdict
+from datetime import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from orders.cache import invalidate_order_histories
+from orders.models import Order, OrderItem
+from .models import PickWave, PickWaveOrder, PickListLine
+
+DEFAULT_MAX_ORDERS = 200
+DEFAULT_MAX_SKUS = 150
+
+# Latest time an order can leave the warehouse for each shipping method
+DEFAULT_CARRIER_CUTOFFS = {
+    'express': '12:00',
+    'standard': '16:00',
+}
+DEFAULT_CUTOFF = '17:00'
+
+
+def carrier_cutoff(shipping_method):
+    cutoffs = getattr(settings, 'FULFILLMENT_CARRIER_CUTOFFS', DEFAULT_CARRIER_CUTOFFS)
+    return time.fromisoformat(cutoffs.get(shipping_method, DEFAULT_CUTOFF))
+
+
+def _lock_open_orders(warehouse):
+    """Ids of the warehouse's confirmed orders, locked for the current transaction"""
+    orders = Order.objects.filter(warehouse=warehouse, status='confirmed').order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        # Orders held by a concurrent planner are left to it
+        orders = orders.select_for_update(skip_locked=True)
+    return list(orders.values_list('id', flat=True))
+
+
+def _load_open_orders(order_ids):
+    """Return {order_id: (shipping_method, Counter(product_id -> quantity))} in one query"""
+    rows = OrderItem.objects.filter(order_id__in=order_ids).values_list('order_id', 'order__shipping_method', 'product_id', 'quantity')
+
+    orders = {}
+    for order_id, shipping_method, product_id, quantity in rows.iterator(chunk_size=5000):
+        if order_id not in orders:
+            orders[order_id] = (shipping_method, Counter())
+        orders[order_id][1][product_id] += quantity
+    return orders
+
+
+def group_into_waves(orders, max_orders=DEFAULT_MAX_ORDERS, max_skus=DEFAULT_MAX_SKUS):
+    """
+    Pack orders ({order_id: Counter(product_id -> quantity)}) into waves.
+
+    Orders are sorted by their SKUs ranked by popularity, which places orders
+    sharing the busiest SKUs next to each other, and then cut into waves of at
+    most max_orders orders and max_skus distinct SKUs. Runs in O(n log n).
+    """
+    popularity = Counter()
+    for products in orders.values():
+        popularity.update(products.keys())
+
+    def signature(order_id):
+        products = orders[order_id]
+        return tuple(sorted((-popularity[p], p) for p in products))
+
+    waves = []
+    current, current_skus = [], set()
+    for order_id in sorted(orders, key=signature):
+        skus = orders[order_id].keys()
+        new_skus = current_skus.union(skus)
+        if current and (len(current) >= max_orders or len(new_skus) > max_skus):
+            waves.append(current)
+            current, new_skus = [], set(skus)
+        current.append(order_id)
+        current_skus = new_skus
+    if current:
+        waves.append(current)
+    return waves
+
+
+def plan_waves(warehouse, max_orders=DEFAULT_MAX_ORDERS, max_skus=DEFAULT_MAX_SKUS):
+    """Plan pick waves for every confirmed order of warehouse and return the created waves"""
+    with transaction.atomic():
+        orders = _load_open_orders(_lock_open_orders(warehouse))
+
+        by_method = defaultdict(dict)
+        for order_id, (shipping_method, products) in orders.items():
+            by_method[shipping_method][order_id] = products
+
+        planned = []
+        for shipping_method in sorted(by_method, key=carrier_cutoff):
+            group = by_method[shipping_method]
+            for order_ids in group_into_waves(group, max_orders, max_skus):
+                totals, counts = Counter(), Counter()
+                for order_id in order_ids:
+                    totals.update(group[order_id])
+                    counts.update(group[order_id].keys())
+                planned.append((shipping_method, order_ids, totals, counts))
+
+        waves = PickWave.objects.bulk_create([
+            PickWave(
+                warehouse=warehouse,
+                shipping_method=shipping_method,
+                cutoff=carrier_cutoff(shipping_method),
+                order_count=len(order_ids),
+                sku_count=len(totals),
+            )
+            for shipping_method, order_ids, totals, counts in planned
+        ])
+        wave_orders, pick_lines = [], []
+        for wave, (shipping_method, order_ids, totals, counts) in zip(waves, planned):
+            wave_orders.extend(PickWaveOrder(wave=wave, order_id=order_id) for order_id in order_ids)
+            pick_lines.extend(
+                PickListLine(wave=wave, product_id=product_id, quantity=quantity, order_count=counts[product_id])
+                for product_id, quantity in totals.items()
+            )
+        PickWaveOrder.objects.bulk_create(wave_orders, batch_size=1000)
+        PickListLine.objects.bulk_create(pick_lines, batch_size=1000)
+        planned_orders = Order.objects.filter(id__in=list(orders), status='confirmed')
+        invalidate_order_histories(planned_orders)
+        planned_orders.update(status='processing')
+
+    return waves